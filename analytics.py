@@ -0,0 +1,208 @@
+"""Материализованная сводка для дашборда (GET /api/v1/analytics/summary).
+
+Сводка хранит накопленные счетчики (полеты по часам, дням и регионам, суммы
+длительностей), идентификатор хранилища и номер последней учтенной строки. После загрузки
+читаются только новые строки, готовый ответ в формате DataState (ui/types.ts)
+пересчитывается из счетчиков и отдается без обращения к данным.
+Состояние сохраняется в JSON рядом с хранилищем, поэтому после перезапуска
+также дочитываются только новые строки.
+"""
+import copy
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import shapely
+
+from geojson_converter import RegionResolver
+from geometry_cache import feature_shapes
+
+SUMMARY_COLUMNS = ["center", "dep_date", "dep_time", "duration"]
+EARTH_RADIUS_KM = 6371.0088
+
+
+def js_round(value):
+    """Округление как Math.round во фронтенде (половина — вверх)."""
+    return math.floor(value + 0.5)
+
+
+# Как standardizeRegionName в dataSlice.ts: без нечеткого сопоставления
+_region_resolver = RegionResolver()
+
+
+def summary_region_name(center):
+    # Пустой центр во фронтенде дает ''
+    if not center:
+        return ""
+    return _region_resolver.resolve(center)
+
+
+def _sinusoidal(coords):
+    # Синусоидальная проекция равновелика, поэтому площадь в ней — площадь на сфере
+    lon = np.radians(coords[:, 0])
+    lat = np.radians(coords[:, 1])
+    return np.column_stack([EARTH_RADIUS_KM * lon * np.cos(lat), EARTH_RADIUS_KM * lat])
+
+
+def geojson_region_areas(geojson, geometries=None):
+    """{region_name: площадь в км²} по геометриям GeoJSON регионов (geometries — готовые геометрии shapely)."""
+    areas = {}
+    for feature, geometry in zip(*feature_shapes(geojson, geometries)):
+        name = feature["properties"]["region_name"]
+        area = shapely.transform(geometry, _sinusoidal).area
+        areas[name] = areas.get(name, 0) + area
+    return areas
+
+
+def _median(values):
+    if not values:
+        return 0
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2 == 0:
+        return (values[mid - 1] + values[mid]) / 2
+    return values[mid]
+
+
+def _percent_change(counts_by_month):
+    """Изменение числа полетов в последнем месяце относительно предыдущего, в процентах."""
+    months = sorted(counts_by_month)
+    if len(months) < 2 or not counts_by_month[months[-2]]:
+        return 0
+    current, previous = counts_by_month[months[-1]], counts_by_month[months[-2]]
+    return round((current - previous) / previous * 100, 1)
+
+
+def _by_month(daily):
+    months = {}
+    for date, count in daily.items():
+        months[date[:7]] = months.get(date[:7], 0) + count
+    return months
+
+
+def _empty_state(store_id=None):
+    return {"store_id": store_id, "rows": 0, "total": 0, "duration_sum": 0, "hourly": [0] * 24, "daily": {}, "regions": {}}
+
+
+class AnalyticsSummary:
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = self._load()
+        self._region_areas = {}
+        self._summary = self._render()
+
+    def _load(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Analytics summary state is unreadable, rebuilding: {e}")
+        return _empty_state()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def rows(self):
+        return self._state["rows"]
+
+    def copy(self):
+        """Копия для перезагрузки репозитория: счетчики копируются, так как refresh дописывает их на месте."""
+        with self._lock:
+            summary = AnalyticsSummary()
+            summary.path = self.path
+            summary._state = copy.deepcopy(self._state)
+            summary._region_areas = self._region_areas
+            summary._summary = self._summary
+        return summary
+
+    def refresh(self, store):
+        """Учитывает строки хранилища, добавленные после последнего обновления. Возвращает их число."""
+        with self._lock:
+            if self._state.get("store_id") != store.store_id or self._state["rows"] > store.count():
+                # Хранилище пересоздано — накопленные счетчики больше не соответствуют данным
+                self._state = _empty_state(store.store_id)
+            if self._state["rows"] == store.count():
+                return 0
+            table = store.read_tail(self._state["rows"], SUMMARY_COLUMNS)
+            self._apply(table.to_pydict())
+            self._state["rows"] += table.num_rows
+            self._save()
+            self._summary = self._render()
+            return table.num_rows
+
+    def set_region_areas(self, region_areas):
+        """Площади регионов (км²) для плотности полетов; обновляются при перезагрузке GeoJSON."""
+        with self._lock:
+            self._region_areas = dict(region_areas)
+            self._summary = self._render()
+
+    def _apply(self, columns):
+        state = self._state
+        hourly = state["hourly"]
+        daily = state["daily"]
+        regions = state["regions"]
+        for center, date, time, duration in zip(
+                columns["center"], columns["dep_date"], columns["dep_time"], columns["duration"]):
+            duration = duration or 0
+            state["total"] += 1
+            state["duration_sum"] += duration
+            if time:
+                hour = time[:2]
+                if hour.isdigit() and int(hour) < 24:
+                    hourly[int(hour)] += 1
+
+            region = regions.setdefault(summary_region_name(center), {"flights": 0, "duration": 0, "daily": {}})
+            region["flights"] += 1
+            region["duration"] += duration
+            if date:
+                daily[date] = daily.get(date, 0) + 1
+                region["daily"][date] = region["daily"].get(date, 0) + 1
+
+    def _render(self):
+        """Собирает ответ в формате DataState из накопленных счетчиков."""
+        state = self._state
+        total = state["total"]
+        daily = state["daily"]
+        daily_counts = list(daily.values())
+        hourly = state["hourly"]
+
+        regions = []
+        for index, (name, region) in enumerate(state["regions"].items()):
+            area = self._region_areas.get(name, 0)
+            regions.append({
+                "id": name,
+                "name": name,
+                "flights": region["flights"],
+                "avgDuration": js_round(region["duration"] / region["flights"]) if region["flights"] else 0,
+                "change": _percent_change(_by_month(region["daily"])),
+                # Условные координаты в viewBox 1000x600, как во фронтенде
+                "coords": {"x": 100 + (index * 50) % 800, "y": 100 + (index * 70) % 400},
+                "area": area,
+                "flightDensity": region["flights"] / area * 1000 if area else 0,
+                "zeroFlightDays": len(daily) - len(region["daily"]),
+            })
+
+        return {
+            "regions": regions,
+            "timeSeries": [{"date": date, "flights": count} for date, count in daily.items()],
+            "hourlyDistribution": [{"hour": f"{hour:02d}", "flights": count} for hour, count in enumerate(hourly)],
+            "totalFlights": total,
+            "avgFlightDuration": js_round(state["duration_sum"] / total) if total else 0,
+            "peakLoad": max(hourly),
+            "avgDailyFlights": js_round(sum(daily_counts) / len(daily_counts)) if daily_counts else 0,
+            "medianDailyFlights": _median(daily_counts),
+            "monthlyChange": _percent_change(_by_month(daily)),
+        }
+
+    def summary(self):
+        return self._summary
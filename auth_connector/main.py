@@ -1,6 +1,6 @@
+from functools import lru_cache
 from fastapi import APIRouter, Depends
 from starlette.requests import Request
-from authlib.integrations.starlette_client import OAuth
 from .config import KEYCLOAK_CLIENT_ID, KEYCLOAK_CLIENT_SECRET, KEYCLOAK_DISCOVERY_URL
 
 router = APIRouter(
@@ -8,20 +8,25 @@ router = APIRouter(
     tags=["Auth Connector (OIDC)"],
 )
 
-# Создаем OAuth клиент
-oauth = OAuth()
+@lru_cache(maxsize=None)
+def get_oauth():
+    """OAuth клиент создается при первом обращении: authlib не загружается, пока коннектор не используется."""
+    from authlib.integrations.starlette_client import OAuth
 
-# Регистрируем OIDC-провайдера (Keycloak)
-# В реальном приложении это нужно делать на старте FastAPI
-oauth.register(
-    name='keycloak',
-    client_id=KEYCLOAK_CLIENT_ID,
-    client_secret=KEYCLOAK_CLIENT_SECRET,
-    server_metadata_url=KEYCLOAK_DISCOVERY_URL,
-    client_kwargs={
-        'scope': 'openid email profile'
-    }
-)
+    # Создаем OAuth клиент
+    oauth = OAuth()
+
+    # Регистрируем OIDC-провайдера (Keycloak)
+    oauth.register(
+        name='keycloak',
+        client_id=KEYCLOAK_CLIENT_ID,
+        client_secret=KEYCLOAK_CLIENT_SECRET,
+        server_metadata_url=KEYCLOAK_DISCOVERY_URL,
+        client_kwargs={
+            'scope': 'openid email profile'
+        }
+    )
+    return oauth
 
 @router.get("/login", summary="Перенаправление на страницу входа OIDC-провайдера (демо)")
 async def login(request: Request):
@@ -31,7 +36,7 @@ async def login(request: Request):
     """
     redirect_uri = request.url_for('auth_callback')
     # В реальном приложении здесь был бы редирект:
-    # return await oauth.keycloak.authorize_redirect(request, redirect_uri)
+    # return await get_oauth().keycloak.authorize_redirect(request, redirect_uri)
     return {
         "message": "Это эндпоинт для OIDC-аутентификации. Коннектор готов к работе.",
         "description": "В реальном приложении здесь был бы редирект на страницу логина Keycloak.",
@@ -45,7 +50,7 @@ async def auth_callback(request: Request):
     Обрабатывает редирект от OIDC-провайдера после успешного входа.
     """
     # В реальном приложении здесь будет обмен кода на токен:
-    # token = await oauth.keycloak.authorize_access_token(request)
+    # token = await get_oauth().keycloak.authorize_access_token(request)
     # user = token.get('userinfo')
     return {
         "message": "Это эндпоинт для обработки колбэка от OIDC. Коннектор готов к работе.",
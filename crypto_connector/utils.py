@@ -1,17 +1,31 @@
+import threading
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 
-# В реальной системе ключи должны безопасно храниться и управляться (например, в HSM или Vault)
-_private_key = rsa.generate_private_key(
-    public_exponent=65537,
-    key_size=2048,
-)
+_key = None
+_key_lock = threading.Lock()
 
-_public_key = _private_key.public_key()
+def _private_key():
+    """Демонстрационный ключ генерируется при первом обращении, а не при импорте модуля (это замедляло запуск)."""
+    global _key
+    if _key is None:
+        # Первые запросы приходят одновременно из пула потоков — ключ должен создать только один из них,
+        # иначе зашифрованное одним ключом не расшифруется другим
+        with _key_lock:
+            if _key is None:
+                # В реальной системе ключи должны безопасно храниться и управляться (например, в HSM или Vault)
+                _key = rsa.generate_private_key(
+                    public_exponent=65537,
+                    key_size=2048,
+                )
+    return _key
+
+def _public_key():
+    return _private_key().public_key()
 
 def get_public_key_pem() -> str:
     """Возвращает публичный ключ в формате PEM для демонстрации."""
-    pem = _public_key.public_bytes(
+    pem = _public_key().public_bytes(
         encoding=serialization.Encoding.PEM,
         format=serialization.PublicFormat.SubjectPublicKeyInfo
     )
@@ -22,7 +36,7 @@ def encrypt_message(message: str) -> bytes:
     Шифрует сообщение с использованием публичного ключа (демонстрация).
     Использует RSA с OAEP-padding, что является современной практикой.
     """
-    encrypted = _public_key.encrypt(
+    encrypted = _public_key().encrypt(
         message.encode('utf-8'),
         padding.OAEP(
             mgf=padding.MGF1(algorithm=hashes.SHA256()),
@@ -36,7 +50,7 @@ def decrypt_message(encrypted_message: bytes) -> str:
     """
     Дешифрует сообщение с использованием приватного ключа (демонстрация).
     """
-    original_message = _private_key.decrypt(
+    original_message = _private_key().decrypt(
         encrypted_message,
         padding.OAEP(
             mgf=padding.MGF1(algorithm=hashes.SHA256()),
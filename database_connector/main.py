@@ -1,18 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from . import models
-from .database import get_db, engine
 
 # Создаем таблицы в БД (если их нет). В реальном приложении лучше использовать Alembic.
-# models.Base.metadata.create_all(bind=engine)
+# from . import models
+# from .database import get_engine
+# models.Base.metadata.create_all(bind=get_engine())
 
 router = APIRouter(
     prefix="/api/v2/db",
     tags=["Database Connector"],
 )
 
+def get_db():
+    """Сессия БД для эндпоинтов. SQLAlchemy, GeoAlchemy2 и драйвер загружаются при первом запросе к коннектору."""
+    from .database import get_db as database_get_db
+    yield from database_get_db()
+
 @router.get("/flights", summary="Получить список полетов из БД (демо)")
-def get_flights_from_db(db: Session = Depends(get_db)):
+def get_flights_from_db(db=Depends(get_db)):
     """
     Демонстрационный эндпоинт.
     В реальной реализации здесь будет запрос к БД для получения списка полетов.
@@ -28,7 +32,7 @@ def get_flights_from_db(db: Session = Depends(get_db)):
     }
 
 @router.get("/flights/{sid}", summary="Получить полет по SID из БД (демо)")
-def get_flight_by_sid_from_db(sid: str, db: Session = Depends(get_db)):
+def get_flight_by_sid_from_db(sid: str, db=Depends(get_db)):
     """
     Демонстрационный эндпоинт.
     В реальной реализации здесь будет запрос к БД для получения одного полета.
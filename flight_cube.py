@@ -0,0 +1,195 @@
+"""Многомерный куб полетов для срезов дашборда.
+
+Измерения: центр ЕС ОрВД, дата вылета, час вылета, тип ВС (TYP) и слой высот
+(как в selectAltitudeDistribution). Каждая строка хранилища кодируется номерами
+категорий, куб хранится разреженно: отсортированные номера занятых ячеек
+(ravel_multi_index по осям) и счетчики, слияние — через np.unique и bincount.
+После загрузки учитываются только новые строки, новые категории дописываются в конец
+оси. Запрос (срез + свертка) — фильтр и группировка по занятым ячейкам,
+исходные записи при этом не читаются.
+"""
+import threading
+
+import numpy as np
+
+CUBE_COLUMNS = ["center", "dep_date", "dep_time", "aircraft_type", "altitude_max"]
+DIMENSIONS = ("center", "date", "hour", "type", "altitude_band")
+
+HOURS = [f"{hour:02d}" for hour in range(24)] + [None]
+ALTITUDE_BANDS = ["0-50 м", "51-150 м", "151-500 м", "> 500 м", "Неизвестно"]
+
+
+class InvalidCubeQuery(ValueError):
+    pass
+
+
+def altitude_band(max_m):
+    """Слой высот по максимальной высоте маршрута, как во фронтенде."""
+    if max_m is None:
+        return "Неизвестно"
+    if max_m <= 50:
+        return "0-50 м"
+    if max_m <= 150:
+        return "51-150 м"
+    if max_m <= 500:
+        return "151-500 м"
+    return "> 500 м"
+
+
+def hour_label(time):
+    if time and time[:2].isdigit() and int(time[:2]) < 24:
+        return time[:2]
+    return None
+
+
+def _shape(categories, dims=DIMENSIONS):
+    return tuple(len(categories[dim]) for dim in dims)
+
+
+class _CubeState:
+    """Неизменяемое состояние: категории осей, ключи занятых ячеек и счетчики заменяются вместе."""
+
+    def __init__(self, categories, keys, counts, rows):
+        self.categories = categories
+        self.codes = {dim: {label: code for code, label in enumerate(labels)} for dim, labels in categories.items()}
+        self.keys = keys
+        self.counts = counts
+        self.rows = rows
+
+    @property
+    def shape(self):
+        return _shape(self.categories)
+
+    def indices(self):
+        """Номера категорий занятых ячеек по каждой оси."""
+        if not len(self.keys):
+            return tuple(np.empty(0, dtype=np.int64) for _ in DIMENSIONS)
+        return np.unravel_index(self.keys, self.shape)
+
+
+def _empty_state():
+    categories = {"center": [], "date": [], "hour": list(HOURS), "type": [], "altitude_band": list(ALTITUDE_BANDS)}
+    return _CubeState(categories, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 0)
+
+
+class FlightCube:
+    def __init__(self):
+        self._state = _empty_state()
+        self._store_id = None
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self):
+        return self._state.rows
+
+    def copy(self):
+        """Копия для перезагрузки репозитория: состояние неизменяемо, поэтому используется совместно."""
+        with self._lock:
+            cube = FlightCube()
+            cube._state, cube._store_id = self._state, self._store_id
+        return cube
+
+    @property
+    def nbytes(self):
+        state = self._state
+        return state.keys.nbytes + state.counts.nbytes
+
+    def refresh(self, store):
+        """Добавляет в куб строки хранилища, появившиеся после последнего обновления."""
+        with self._lock:
+            state = self._state
+            if self._store_id != store.store_id or state.rows > store.count():
+                # Хранилище пересоздано — счетчики строятся заново
+                state = _empty_state()
+                self._store_id = store.store_id
+            if state.rows == store.count():
+                return 0
+            table = store.read_tail(state.rows, CUBE_COLUMNS)
+            columns = table.to_pydict()
+            labels = {
+                "center": columns["center"],
+                "date": columns["dep_date"],
+                "hour": [hour_label(time) for time in columns["dep_time"]],
+                "type": columns["aircraft_type"],
+                "altitude_band": [altitude_band(value) for value in columns["altitude_max"]],
+            }
+            self._state = self._add(state, labels, table.num_rows)
+            return table.num_rows
+
+    def _add(self, state, labels, rows):
+        categories = {dim: list(values) for dim, values in state.categories.items()}
+        codes = {}
+        for dim in DIMENSIONS:
+            mapping = dict(state.codes[dim])
+            dim_codes = np.empty(rows, dtype=np.int64)
+            for i, label in enumerate(labels[dim]):
+                code = mapping.get(label)
+                if code is None:
+                    code = mapping[label] = len(categories[dim])
+                    categories[dim].append(label)
+                dim_codes[i] = code
+            codes[dim] = dim_codes
+
+        shape = _shape(categories)
+        keys = state.keys
+        if len(keys) and shape != state.shape:
+            # Новые категории дописываются в конец оси, поэтому пересчет ключей под новую форму
+            # сохраняет их порядок
+            keys = np.ravel_multi_index(state.indices(), shape)
+        new_keys = np.ravel_multi_index([codes[dim] for dim in DIMENSIONS], shape)
+        # Старые и новые ключи сливаются одним unique, счетчики суммируются через bincount
+        merged, inverse = np.unique(np.concatenate([keys, new_keys]), return_inverse=True)
+        weights = np.concatenate([state.counts, np.ones(rows, dtype=np.int64)])
+        counts = np.bincount(inverse, weights=weights, minlength=len(merged)).astype(np.int64)
+        return _CubeState(categories, merged, counts, state.rows + rows)
+
+    def query(self, group_by=(), filters=None, date_from=None, date_to=None):
+        """
+        Срез и свертка куба.
+        group_by — измерения, по которым группируется результат (остальные суммируются),
+        filters — {измерение: список значений}, date_from/date_to — границы дат (включительно).
+        Возвращает {"group_by", "rows": [{измерение: значение, ..., "flights": n}], "total"}; нулевые ячейки не возвращаются.
+        """
+        state = self._state
+        filters = filters or {}
+        group_by = list(group_by)
+        for dim in list(group_by) + list(filters):
+            if dim not in DIMENSIONS:
+                raise InvalidCubeQuery(f"Unknown cube dimension: {dim}")
+        if len(set(group_by)) != len(group_by):
+            raise InvalidCubeQuery("Duplicate dimension in group_by")
+
+        selected = {}
+        for dim, values in filters.items():
+            selected[dim] = np.array([state.codes[dim][v] for v in values if v in state.codes[dim]], dtype=np.int64)
+        if date_from or date_to:
+            dates = state.categories["date"]
+            candidates = selected.get("date", range(len(dates)))
+            selected["date"] = np.array([
+                code for code in candidates
+                if dates[code] and (not date_from or dates[code] >= date_from) and (not date_to or dates[code] <= date_to)
+            ], dtype=np.int64)
+
+        # Срез и свертка идут только по занятым ячейкам
+        indices = dict(zip(DIMENSIONS, state.indices()))
+        mask = np.ones(len(state.keys), dtype=bool)
+        for dim, codes in selected.items():
+            mask &= np.isin(indices[dim], codes)
+        counts = state.counts[mask]
+
+        rows = []
+        if group_by and len(counts):
+            # Ключ группы строится в порядке group_by, поэтому строки упорядочены по нему
+            group_shape = _shape(state.categories, group_by)
+            group_keys = np.ravel_multi_index([indices[dim][mask] for dim in group_by], group_shape)
+            groups, inverse = np.unique(group_keys, return_inverse=True)
+            flights = np.bincount(inverse, weights=counts, minlength=len(groups)).astype(np.int64)
+            for cell, value in zip(zip(*np.unravel_index(groups, group_shape)), flights):
+                row = {dim: state.categories[dim][i] for dim, i in zip(group_by, cell)}
+                row["flights"] = int(value)
+                rows.append(row)
+        return {"group_by": group_by, "rows": rows, "total": int(counts.sum())}
+
+    def dimensions(self):
+        """Значения каждой оси (для построения фильтров во фронтенде)."""
+        return {dim: list(labels) for dim, labels in self._state.categories.items()}
@@ -0,0 +1,71 @@
+"""Потоковая выгрузка полетов из хранилища: NDJSON и JSON-массив по частям.
+
+Записи сериализуются порциями прямо из сегментов Parquet, поэтому первая порция
+уходит клиенту до того, как прочитан весь набор данных. `parsed_data` уже хранится
+в виде JSON и вставляется в ответ как есть, без повторного разбора; остальные поля
+кодируются через orjson.
+"""
+import orjson
+
+from flight_store import RECORD_COLUMNS
+
+EXPORT_BATCH_SIZE = 1000
+
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+# Начало каждого поля записи в порядке RECORD_COLUMNS
+_PREFIXES = [
+    '{"Центр ЕС ОрВД":'.encode("utf-8"),
+    b',"SHR_raw":',
+    b',"DEP_raw":',
+    b',"ARR_raw":',
+    b',"parsed_data":',
+]
+
+
+def _encode_batch(batch):
+    """Возвращает список JSON-записей (bytes) для одного RecordBatch."""
+    columns = [batch.column(name).to_pylist() for name in RECORD_COLUMNS]
+    center, shr, dep, arr, parsed = _PREFIXES
+    encoded = []
+    for values in zip(*columns):
+        encoded.append(b"".join((
+            center, orjson.dumps(values[0]),
+            shr, orjson.dumps(values[1]),
+            dep, orjson.dumps(values[2]),
+            arr, orjson.dumps(values[3]),
+            parsed, values[4].encode("utf-8"),
+            b"}",
+        )))
+    return encoded
+
+
+def iter_ndjson(store, batch_size=EXPORT_BATCH_SIZE):
+    """Одна запись на строку, по одному чанку на порцию записей."""
+    for batch in store.iter_batches(RECORD_COLUMNS, batch_size):
+        if batch.num_rows:
+            yield b"\n".join(_encode_batch(batch)) + b"\n"
+
+
+def iter_json_array(store, batch_size=EXPORT_BATCH_SIZE):
+    """JSON-массив, который отдается частями: '[', порции записей через ',', ']'."""
+    yield b"["
+    first = True
+    for batch in store.iter_batches(RECORD_COLUMNS, batch_size):
+        if not batch.num_rows:
+            continue
+        chunk = b",".join(_encode_batch(batch))
+        yield chunk if first else b"," + chunk
+        first = False
+    yield b"]"
+
+
+def iter_export(store, stream_format, batch_size=EXPORT_BATCH_SIZE):
+    if stream_format == "ndjson":
+        return iter_ndjson(store, batch_size)
+    if stream_format == "json":
+        return iter_json_array(store, batch_size)
+    raise ValueError(f"Unknown stream format: {stream_format}")
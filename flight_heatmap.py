@@ -0,0 +1,177 @@
+"""Тепловая карта плотности полетов (GET /api/v1/analytics/heatmap).
+
+Точки полетов (вылет, иначе прибытие, иначе центр зоны — колонки point_lat/point_lon)
+раскладываются по ячейкам квадратной или шестиугольной сетки заданного шага (в градусах).
+Номера ячеек считаются векторно для всех точек, счетчики хранятся разреженно:
+отсортированные ключи ячеек и число полетов в каждой. Сетки кэшируются по (форма, шаг),
+после загрузки в каждую кэшированную сетку добавляются только новые точки.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from region_locator import read_points
+
+HEATMAP_SHAPES = ("square", "hex")
+MIN_RESOLUTION = 0.01
+MAX_RESOLUTION = 10.0
+HEATMAP_MAX_GRIDS = int(os.environ.get("HEATMAP_MAX_GRIDS", 16))
+# Номера ячеек по двум осям упаковываются в один int64
+_KEY_OFFSET = 2 ** 30
+_KEY_BASE = 2 ** 31
+_SQRT3 = math.sqrt(3)
+
+
+class InvalidHeatmapQuery(ValueError):
+    pass
+
+
+def parse_bbox(value):
+    """'min_lon,min_lat,max_lon,max_lat' -> кортеж чисел."""
+    try:
+        bbox = tuple(float(part) for part in value.split(","))
+    except ValueError:
+        raise InvalidHeatmapQuery(f"Invalid bbox: {value}")
+    if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise InvalidHeatmapQuery(f"Invalid bbox: {value}")
+    return bbox
+
+
+def _bin(shape, resolution, lats, lons):
+    """Номера ячеек (a, b) для массивов координат."""
+    if shape == "square":
+        return np.floor(lons / resolution).astype(np.int64), np.floor(lats / resolution).astype(np.int64)
+    # Шестиугольники с вершиной вверху, расстояние между центрами соседей по долготе — resolution.
+    # Осевые координаты (q, r) округляются через кубические координаты
+    size = resolution / _SQRT3
+    q = (_SQRT3 / 3 * lons - lats / 3) / size
+    r = (2 / 3 * lats) / size
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+def _centers(shape, resolution, a, b):
+    """Центры ячеек (долготы, широты)."""
+    if shape == "square":
+        return (a + 0.5) * resolution, (b + 0.5) * resolution
+    size = resolution / _SQRT3
+    return size * _SQRT3 * (a + b / 2), size * 1.5 * b
+
+
+def _pack(a, b):
+    return (a + _KEY_OFFSET) * _KEY_BASE + (b + _KEY_OFFSET)
+
+
+def _unpack(keys):
+    return keys // _KEY_BASE - _KEY_OFFSET, keys % _KEY_BASE - _KEY_OFFSET
+
+
+class _Grid:
+    """Разреженная сетка: отсортированные ключи ячеек и счетчики."""
+
+    def __init__(self, shape, resolution):
+        self.shape = shape
+        self.resolution = resolution
+        # Ключи и счетчики подменяются вместе, чтобы запрос не увидел их разной длины
+        self.cells = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    def add(self, lats, lons):
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        if not valid.any():
+            return
+        keys, counts = self.cells
+        new_keys = _pack(*_bin(self.shape, self.resolution, lats[valid], lons[valid]))
+        # Старые и новые ключи сливаются одним unique, счетчики суммируются через bincount
+        merged, inverse = np.unique(np.concatenate([keys, new_keys]), return_inverse=True)
+        weights = np.concatenate([counts, np.ones(len(new_keys), dtype=np.int64)])
+        self.cells = (merged, np.bincount(inverse, weights=weights, minlength=len(merged)).astype(np.int64))
+
+
+class FlightHeatmap:
+    def __init__(self, max_grids=HEATMAP_MAX_GRIDS):
+        self.max_grids = max_grids
+        self._lock = threading.Lock()
+        self._lats = np.empty(0)
+        self._lons = np.empty(0)
+        self._grids = OrderedDict()
+        self._store_id = None
+
+    @property
+    def rows(self):
+        return len(self._lats)
+
+    def copy(self):
+        """Копия для перезагрузки репозитория: точки и ячейки сеток общие, refresh заменяет их, а не меняет."""
+        with self._lock:
+            heatmap = FlightHeatmap(self.max_grids)
+            heatmap._lats, heatmap._lons, heatmap._store_id = self._lats, self._lons, self._store_id
+            for key, grid in self._grids.items():
+                heatmap._grids[key] = _Grid(grid.shape, grid.resolution)
+                heatmap._grids[key].cells = grid.cells
+        return heatmap
+
+    def refresh(self, store):
+        """Дописывает точки новых строк хранилища во все кэшированные сетки."""
+        with self._lock:
+            if self._store_id != store.store_id or len(self._lats) > store.count():
+                self._lats, self._lons = np.empty(0), np.empty(0)
+                self._grids.clear()
+                self._store_id = store.store_id
+            if len(self._lats) == store.count():
+                return 0
+            lats, lons = read_points(store, len(self._lats))
+            for grid in self._grids.values():
+                grid.add(lats, lons)
+            self._lats = np.concatenate([self._lats, lats])
+            self._lons = np.concatenate([self._lons, lons])
+            return len(lats)
+
+    def _grid(self, shape, resolution):
+        with self._lock:
+            key = (shape, resolution)
+            grid = self._grids.get(key)
+            if grid is None:
+                grid = self._grids[key] = _Grid(shape, resolution)
+                grid.add(self._lats, self._lons)
+                while len(self._grids) > self.max_grids:
+                    self._grids.popitem(last=False)
+            self._grids.move_to_end(key)
+            return grid
+
+    def query(self, shape="square", resolution=0.5, bbox=None):
+        """
+        Ненулевые ячейки сетки: {"shape", "resolution", "bbox", "cells": [[долгота центра, широта центра, полетов]],
+        "max_count", "total"}. bbox — (min_lon, min_lat, max_lon, max_lat), ячейки отбираются по центру.
+        """
+        if shape not in HEATMAP_SHAPES:
+            raise InvalidHeatmapQuery(f"Unknown heatmap shape: {shape}")
+        if not MIN_RESOLUTION <= resolution <= MAX_RESOLUTION:
+            raise InvalidHeatmapQuery(f"Resolution must be between {MIN_RESOLUTION} and {MAX_RESOLUTION} degrees")
+        grid = self._grid(shape, resolution)
+        keys, counts = grid.cells
+        lons, lats = _centers(shape, resolution, *_unpack(keys))
+        if bbox is not None:
+            inside = (lons >= bbox[0]) & (lats >= bbox[1]) & (lons <= bbox[2]) & (lats <= bbox[3])
+            lons, lats, counts = lons[inside], lats[inside], counts[inside]
+        cells = np.column_stack([np.round(lons, 6), np.round(lats, 6), counts]).tolist()
+        return {
+            "shape": shape,
+            "resolution": resolution,
+            "bbox": list(bbox) if bbox is not None else None,
+            "cells": [[lon, lat, int(count)] for lon, lat, count in cells],
+            "max_count": int(counts.max()) if len(counts) else 0,
+            "total": int(counts.sum()),
+        }
+
+    def cached_grids(self):
+        return [{"shape": shape, "resolution": resolution, "cells": len(grid.cells[0])}
+                for (shape, resolution), grid in self._grids.items()]
@@ -0,0 +1,162 @@
+"""Индексы для постраничной выдачи /api/flights.
+
+Индекс строится один раз для версии хранилища (FlightStore.version) из колонок
+center, sid, dep_date и duration. Фильтры по центру и SID ищут подстроку среди
+различных значений, фильтр по дате — бинарный поиск по отсортированным датам.
+Сортировка и курсор (keyset) используют заранее посчитанные перестановки строк,
+поэтому в JSON разбираются только записи одной страницы.
+"""
+import base64
+import json
+
+import numpy as np
+
+from flight_store import RECORD_COLUMNS, row_to_record
+
+SORT_KEYS = ("date", "duration", "atc")
+SORT_DIRECTIONS = ("asc", "desc")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _group_rows(values):
+    """{значение в нижнем регистре: массив номеров строк}."""
+    groups = {}
+    for row_id, value in enumerate(values):
+        groups.setdefault((value or "").lower(), []).append(row_id)
+    return {value: np.array(rows, dtype=np.int64) for value, rows in groups.items()}
+
+
+def _sorted_order(keys):
+    # Стабильная сортировка: при равных ключах строки идут в порядке хранилища
+    order = np.argsort(keys, kind="stable")
+    return order, keys[order]
+
+
+def encode_cursor(sort, direction, key, row_id):
+    payload = json.dumps([sort, direction, key, row_id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, sort, direction):
+    try:
+        cursor_sort, cursor_direction, key, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+    if (cursor_sort, cursor_direction) != (sort, direction):
+        raise InvalidCursor("Cursor was issued for a different sort order")
+    return key, int(row_id)
+
+
+class FlightIndex:
+    def __init__(self, store):
+        self.version = store.version
+        table = store.read_table(RECORD_COLUMNS + ["sid", "dep_date", "duration"])
+        # parsed_data хранится строкой JSON и разбирается только для строк выдаваемой страницы
+        self._records = table.select(RECORD_COLUMNS)
+        self.size = table.num_rows
+
+        centers = table.column("center").to_pylist()
+        sids = table.column("sid").to_pylist()
+        dates = np.array([date or "" for date in table.column("dep_date").to_pylist()], dtype=object)
+        durations = np.array([d or 0 for d in table.column("duration").to_pylist()], dtype=np.int64)
+
+        self._by_center = _group_rows(centers)
+        self._by_sid = _group_rows(sids)
+        self._dates_order, self._dates_sorted = _sorted_order(dates)
+        # Ключи сортировки совпадают с фронтендом: пустая дата — '', пустая длительность — 0
+        self._sort_keys = {
+            "date": dates,
+            "duration": durations,
+            "atc": np.array([center or "" for center in centers], dtype=object),
+        }
+        self._orders = {}
+        for name, keys in self._sort_keys.items():
+            self._orders[name] = _sorted_order(keys)
+
+    @property
+    def nbytes(self):
+        return self._records.nbytes
+
+    def records(self):
+        """Все записи в порядке хранилища (для выдачи без параметров)."""
+        return [row_to_record(row) for row in self._records.to_pylist()]
+
+    # --- Фильтры --- #
+
+    def _substring_mask(self, groups, needle):
+        mask = np.zeros(self.size, dtype=bool)
+        needle = needle.lower()
+        for value, rows in groups.items():
+            if needle in value:
+                mask[rows] = True
+        return mask
+
+    def filter_mask(self, atc=None, sid=None, date_from=None, date_to=None):
+        mask = np.ones(self.size, dtype=bool)
+        if atc:
+            mask &= self._substring_mask(self._by_center, atc)
+        if sid:
+            mask &= self._substring_mask(self._by_sid, sid)
+        if date_from or date_to:
+            lo = np.searchsorted(self._dates_sorted, date_from, side="left") if date_from else 0
+            hi = np.searchsorted(self._dates_sorted, date_to, side="right") if date_to else self.size
+            in_range = np.zeros(self.size, dtype=bool)
+            in_range[self._dates_order[lo:hi]] = True
+            # Полеты без даты в диапазон не попадают
+            in_range[self._sort_keys["date"] == ""] = False
+            mask &= in_range
+        return mask
+
+    # --- Страница --- #
+
+    def _cursor_position(self, sort, key, row_id):
+        """Границы (left, right) позиции курсора в отсортированной по возрастанию перестановке."""
+        order, keys = self._orders[sort]
+        lo = np.searchsorted(keys, key, side="left")
+        hi = np.searchsorted(keys, key, side="right")
+        # Внутри группы равных ключей номера строк возрастают (сортировка стабильная)
+        ties = order[lo:hi]
+        return (lo + np.searchsorted(ties, row_id, side="left"),
+                lo + np.searchsorted(ties, row_id, side="right"))
+
+    def page(self, atc=None, sid=None, date_from=None, date_to=None,
+             sort="date", direction="desc", limit=DEFAULT_PAGE_SIZE, cursor=None):
+        """Возвращает {"items", "total", "next_cursor"} для одной страницы."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        if direction not in SORT_DIRECTIONS:
+            raise ValueError(f"Unknown sort direction: {direction}")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        mask = self.filter_mask(atc, sid, date_from, date_to)
+        order, _ = self._orders[sort]
+        if cursor is None:
+            candidates = order if direction == "asc" else order[::-1]
+        else:
+            key, row_id = decode_cursor(cursor, sort, direction)
+            if sort == "duration":
+                key = int(key)
+            left, right = self._cursor_position(sort, key, row_id)
+            candidates = order[right:] if direction == "asc" else order[:left][::-1]
+
+        selected = candidates[mask[candidates]][:limit + 1]
+        has_more = len(selected) > limit
+        selected = selected[:limit]
+
+        next_cursor = None
+        if has_more:
+            last = int(selected[-1])
+            key = self._sort_keys[sort][last]
+            next_cursor = encode_cursor(sort, direction, key.item() if hasattr(key, "item") else key, last)
+
+        rows = self._records.take(selected).to_pylist()
+        return {
+            "items": [row_to_record(row) for row in rows],
+            "total": int(mask.sum()),
+            "next_cursor": next_cursor,
+        }
@@ -0,0 +1,331 @@
+"""Общий для процесса репозиторий данных в памяти.
+
+Полеты, индекс для постраничной выдачи, GeoJSON регионов и статистика по регионам
+загружаются один раз и отдаются всем эндпоинтам из памяти. Перед выдачей проверяются
+только отпечатки источников (mtime и размер файла, версия хранилища полетов).
+Если отпечаток изменился, а SHA-256 содержимого — нет, перезагрузки не происходит.
+Новое состояние, включая производные компоненты (сводку, куб, тепловую карту и т.д.),
+собирается вне блокировки снимка и подменяет старое одной операцией присваивания,
+поэтому запрос всегда видит согласованный снимок. Пока один поток перезагружает данные,
+остальные запросы получают предыдущий снимок и не ждут.
+"""
+import hashlib
+import json
+import os
+import resource
+import threading
+import time
+
+from analytics import AnalyticsSummary, geojson_region_areas
+from flight_cube import FlightCube
+from flight_heatmap import FlightHeatmap
+from flight_index import FlightIndex
+from flight_trajectories import FlightTrajectories
+from geojson_converter import RegionResolver, build_geometry_levels, count_vertices
+from geometry_cache import cache_path, load_geometry_cache, write_geometry_cache
+from ingest import iter_xlsx_rows
+from region_locator import RegionAssignment, RegionLocator
+from vector_tiles import TileSource
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+# Производные компоненты снимка, которые дочитывают новые строки хранилища
+COMPONENTS = ("analytics", "cube", "region_assignment", "heatmap", "trajectories", "tiles")
+
+
+def file_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def current_rss_bytes():
+    """Текущий RSS процесса (Linux), иначе пиковый RSS из getrusage."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS отдает байты, Linux — килобайты
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class FileSource:
+    """Отслеживает изменения файла: сначала по (mtime, size), затем по хэшу содержимого."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fingerprint = None
+        self.hash = None
+        self.loaded_at = None
+        self.reloads = 0
+
+    def changed(self):
+        fingerprint = file_fingerprint(self.path)
+        if fingerprint == self.fingerprint and self.loaded_at is not None:
+            return False
+        new_hash = file_hash(self.path) if fingerprint is not None else None
+        self.fingerprint = fingerprint
+        if new_hash == self.hash and self.loaded_at is not None:
+            # Файл перезаписан тем же содержимым (например, touch) — перезагрузка не нужна
+            return False
+        self.hash = new_hash
+        return True
+
+    def mark_loaded(self):
+        self.loaded_at = time.time()
+        self.reloads += 1
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "exists": self.fingerprint is not None,
+            "size": self.fingerprint[1] if self.fingerprint else None,
+            "sha256": self.hash,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+        }
+
+
+class RepositorySnapshot:
+    def __init__(self, store_version=None, flights=None, index=None, geojson=None, region_stats=None,
+                 spatial_counts=None, geo_regions=None, geometry_levels=None, geo_region_levels=None,
+                 data_version=None, analytics=None, cube=None, region_assignment=None, heatmap=None,
+                 trajectories=None, tiles=None):
+        self.store_version = store_version
+        self.flights = flights if flights is not None else []
+        self.index = index
+        self.geojson = geojson
+        self.region_stats = region_stats if region_stats is not None else {}
+        self.spatial_counts = spatial_counts if spatial_counts is not None else {}
+        self.geo_regions = geo_regions
+        # Упрощенные уровни геометрии (0 — исходная) и те же уровни со счетчиками полетов
+        self.geometry_levels = geometry_levels if geometry_levels is not None else []
+        self.geo_region_levels = geo_region_levels if geo_region_levels is not None else []
+        # Версия данных снимка — ключ кэшей ответов и тайлов
+        self.data_version = data_version
+        # Сводка для дашборда дочитывает только новые строки хранилища
+        self.analytics = analytics
+        # Куб для срезов дашборда строится в памяти и дополняется новыми строками
+        self.cube = cube
+        # Привязка полетов к регионам по координатам (STRtree по полигонам GeoJSON)
+        self.region_assignment = region_assignment
+        # Сетки плотности полетов для тепловой карты
+        self.heatmap = heatmap
+        # Траектории полетов с индексом по SID
+        self.trajectories = trajectories
+        # Регионы и точки полетов для векторных тайлов
+        self.tiles = tiles
+
+    def replace(self, **changes):
+        values = dict(self.__dict__)
+        values.update(changes)
+        return RepositorySnapshot(**values)
+
+
+class FlightRepository:
+    def __init__(self, store, geojson_path, regions_xlsx_path):
+        self.store = store
+        self.manifest = FileSource(store.manifest_path)
+        self.geojson = FileSource(geojson_path)
+        self.regions_xlsx = FileSource(regions_xlsx_path)
+        self.flights_loaded_at = None
+        self.flights_reloads = 0
+        self.last_reload = None
+        self._snapshot = RepositorySnapshot(
+            analytics=AnalyticsSummary(os.path.join(store.directory, "analytics_summary.json")),
+            cube=FlightCube(),
+            region_assignment=RegionAssignment(),
+            heatmap=FlightHeatmap(),
+            trajectories=FlightTrajectories(),
+            tiles=TileSource(),
+        )
+        # _lock — только подмена снимка; _reload_lock — перезагрузку выполняет один поток
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def get(self, wait=False):
+        """
+        Возвращает актуальный снимок, при необходимости перезагружая изменившиеся источники.
+        Если перезагрузку уже выполняет другой поток, сразу возвращается текущий снимок;
+        wait=True (после загрузки полетов) и первый вызов ждут ее окончания.
+        """
+        if not self._reload_lock.acquire(blocking=wait or self._snapshot.index is None):
+            return self._snapshot
+        try:
+            return self._reload()
+        finally:
+            self._reload_lock.release()
+
+    def _reload(self):
+        snapshot = self._snapshot
+        # Манифест мог быть переписан другим процессом — подтягиваем его версию
+        if self.manifest.changed():
+            self.store.refresh()
+            self.manifest.mark_loaded()
+
+        changes = {}
+        # Компоненты меняются в копиях: запросы к текущему снимку их изменений не видят
+        components = {}
+
+        def component(name):
+            if name not in components:
+                components[name] = getattr(snapshot, name).copy()
+            return components[name]
+
+        geojson_changed = self.geojson.changed()
+        if geojson_changed:
+            geojson, geometries = self._load_geojson()
+            changes["geojson"] = geojson
+            self.geojson.mark_loaded()
+            component("analytics").set_region_areas(geojson_region_areas(geojson, geometries) if geojson is not None else {})
+            component("region_assignment").set_locator(RegionLocator(geojson, geometries) if geojson is not None else None)
+            changes["geometry_levels"] = self._build_geometry_levels(geojson, geometries)
+
+        flights_changed = snapshot.index is None or snapshot.store_version != self.store.version
+        if flights_changed:
+            changes.update(self._load_flights([component(name) for name in ("analytics", "cube", "tiles", "trajectories", "heatmap")]))
+        if flights_changed or geojson_changed:
+            component("region_assignment").refresh(self.store)
+            changes["spatial_counts"] = component("region_assignment").counts()
+
+        if self.regions_xlsx.changed() or geojson_changed:
+            geojson = changes.get("geojson", snapshot.geojson)
+            changes["region_stats"] = self._load_region_stats(geojson)
+            self.regions_xlsx.mark_loaded()
+        if {"geojson", "region_stats", "spatial_counts"} & set(changes):
+            region_stats = changes.get("region_stats", snapshot.region_stats)
+            spatial_counts = changes.get("spatial_counts", snapshot.spatial_counts)
+            changes["geo_region_levels"] = [
+                build_geo_regions(level, region_stats, spatial_counts)
+                for level in changes.get("geometry_levels", snapshot.geometry_levels)
+            ]
+            changes["geo_regions"] = changes["geo_region_levels"][0] if changes["geo_region_levels"] else None
+            component("tiles").set_regions(changes["geo_region_levels"])
+
+        if changes:
+            self.last_reload = {"at": time.time(), "sources": sorted(changes)}
+            changes["data_version"] = self._data_version(changes.get("store_version", snapshot.store_version))
+            new_snapshot = snapshot.replace(**changes, **components)
+            with self._lock:
+                self._snapshot = new_snapshot
+        return self._snapshot
+
+    def _load_flights(self, components):
+        started = time.perf_counter()
+        version = self.store.version
+        index = FlightIndex(self.store)
+        flights = index.records()
+        for component in components:
+            component.refresh(self.store)
+        self.flights_loaded_at = time.time()
+        self.flights_reloads += 1
+        print(f"Flight repository: loaded {len(flights)} flights (store version {version}) "
+              f"in {time.perf_counter() - started:.3f}s")
+        return {"store_version": version, "flights": flights, "index": index}
+
+    def _load_geojson(self):
+        """GeoJSON регионов и геометрии shapely его объектов: из бинарного кэша, если он построен по этому файлу."""
+        if self.geojson.fingerprint is None:
+            return None, None
+        path = cache_path(self.geojson.path)
+        cached = load_geometry_cache(path, self.geojson.hash)
+        if cached is not None:
+            return cached.to_geojson(), cached.geometries
+        with open(self.geojson.path, "r", encoding="utf-8") as f:
+            geojson = json.load(f)
+        try:
+            geometries = write_geometry_cache(geojson, path, self.geojson.hash)
+        except Exception as e:
+            # Кэш — только ускорение: без него геометрии строятся из GeoJSON (например, для
+            # сочетаний типов геометрий, которые не укладываются в формат кэша)
+            print(f"Geometry cache is not written: {e}")
+            geometries = None
+        return geojson, geometries
+
+    def _build_geometry_levels(self, geojson, geometries):
+        if geojson is None:
+            return []
+        started = time.perf_counter()
+        levels = build_geometry_levels(geojson, geometries=geometries)
+        print(f"Flight repository: built {len(levels)} geometry levels in {time.perf_counter() - started:.3f}s")
+        return levels
+
+    def _load_region_stats(self, geojson):
+        if self.regions_xlsx.fingerprint is None:
+            return {}
+        # Получаем список всех GeoJSON регионов для нечеткого сопоставления
+        geojson_region_names = []
+        if geojson is not None:
+            geojson_region_names = [feature["properties"]["region_name"] for feature in geojson["features"]]
+
+        # Названия центров повторяются, поэтому разрешаются только различные значения
+        centers = [row.get("Центр ЕС ОрВД") for index, row in iter_xlsx_rows(self.regions_xlsx.path, columns=("Центр ЕС ОрВД",))]
+        resolver = RegionResolver(geojson_region_names)
+        region_flight_counts = {}
+        for region_name, standardized_region_name in zip(centers, resolver.resolve_many(centers)):
+            if region_name:
+                region_flight_counts[standardized_region_name] = region_flight_counts.get(standardized_region_name, 0) + 1
+        return region_flight_counts
+
+    def _data_version(self, store_version):
+        """Версия данных для кэшей ответов и тайлов: меняется с загрузкой полетов, GeoJSON или XLSX регионов."""
+        source = f"{store_version}:{self.geojson.hash}:{self.regions_xlsx.hash}"
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+    def data_version(self):
+        return self._snapshot.data_version
+
+    def diagnostics(self):
+        snapshot = self._snapshot
+        return {
+            "rss_bytes": current_rss_bytes(),
+            "flights": {
+                "count": len(snapshot.flights),
+                "store_version": snapshot.store_version,
+                "table_bytes": snapshot.index.nbytes if snapshot.index is not None else 0,
+                "cube_bytes": snapshot.cube.nbytes,
+                "trajectory_bytes": snapshot.trajectories.nbytes,
+                "heatmap_grids": snapshot.heatmap.cached_grids(),
+                "loaded_at": self.flights_loaded_at,
+                "reloads": self.flights_reloads,
+            },
+            "sources": {
+                "manifest": self.manifest.stats(),
+                "geojson": self.geojson.stats(),
+                "regions_xlsx": self.regions_xlsx.stats(),
+            },
+            "geometry_levels": [
+                {"level": number, "vertices": count_vertices(level)}
+                for number, level in enumerate(snapshot.geometry_levels)
+            ],
+            "last_reload": self.last_reload,
+        }
+
+
+def build_geo_regions(geojson, region_stats, spatial_counts=None):
+    """
+    GeoJSON регионов с количеством полетов в свойствах (ответ /api/geo/regions).
+    flight_count — по названию центра ЕС ОрВД, spatial_flight_count — по координатам полетов хранилища.
+    """
+    spatial_counts = spatial_counts or {}
+    if geojson is None:
+        return None
+    features = []
+    for feature in geojson["features"]:
+        region_name = feature["properties"]["region_name"]
+        properties = dict(feature["properties"])
+        properties["flight_count"] = region_stats.get(region_name, 0)
+        properties["has_flights"] = region_stats.get(region_name, 0) > 0
+        properties["spatial_flight_count"] = spatial_counts.get(region_name, 0)
+        features.append(dict(feature, properties=properties))
+    return dict(geojson, features=features)
@@ -0,0 +1,495 @@
+"""Колоночное хранилище полетов на Parquet.
+
+Каждая загрузка дописывается отдельным сегментом, старые данные не перезаписываются.
+Строки, которые уже есть в хранилище (совпадают SHR, DEP и ARR), при загрузке пропускаются,
+поэтому повторная загрузка пересекающихся выгрузок не дублирует полеты.
+Список сегментов хранится в manifest.json и заменяется атомарно. Когда сегментов
+становится много, фоновая компактизация сливает их в один.
+Помимо исходных строк и `parsed_data` (JSON) хранятся производные колонки
+(SID, дата, длительность и т.д.), поэтому запросы читают только нужные колонки.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FLIGHT_STORE_COMPACT_THRESHOLD = int(os.environ.get("FLIGHT_STORE_COMPACT_THRESHOLD", 8))
+FLIGHT_STORE_ROW_GROUP_SIZE = int(os.environ.get("FLIGHT_STORE_ROW_GROUP_SIZE", 2000))
+
+SCHEMA = pa.schema([
+    ("center", pa.string()),
+    ("shr_raw", pa.string()),
+    ("dep_raw", pa.string()),
+    ("arr_raw", pa.string()),
+    # Ключ содержимого строки (row_key) для пропуска повторно загруженных полетов
+    ("row_key", pa.string()),
+    ("sid", pa.string()),
+    ("dep_date", pa.string()),
+    ("dep_time", pa.string()),
+    ("duration", pa.int64()),
+    ("aircraft_type", pa.string()),
+    ("altitude_max", pa.int64()),
+    ("point_lat", pa.float64()),
+    ("point_lon", pa.float64()),
+    # Траектория DEP -> точки маршрута -> ARR (широты и долготы вершин)
+    ("track_lat", pa.list_(pa.float64())),
+    ("track_lon", pa.list_(pa.float64())),
+    ("parsed_data", pa.string()),
+])
+RECORD_COLUMNS = ["center", "shr_raw", "dep_raw", "arr_raw", "parsed_data"]
+
+
+def _as_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    # Пустые ячейки, прочитанные pandas, приходят как NaN
+    if isinstance(value, float) and value != value:
+        return None
+    return str(value)
+
+
+def row_key(shr_raw, dep_raw, arr_raw):
+    """
+    Ключ содержимого строки выгрузки: SHA-256 текстов SHR, DEP и ARR (как ключ кэша разбора,
+    но без версии парсера, чтобы ключ не менялся при обновлении разбора).
+    """
+    payload = json.dumps([_as_text(shr_raw), _as_text(dep_raw), _as_text(arr_raw)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _lat_lon(coordinates):
+    if isinstance(coordinates, dict) and coordinates.get("latitude") is not None and coordinates.get("longitude") is not None:
+        return coordinates["latitude"], coordinates["longitude"]
+    return None
+
+
+def flight_point(parsed):
+    """Точка полета для пространственной привязки: координаты вылета, иначе прибытия, иначе центр зоны."""
+    for key in ("DEP", "ARR"):
+        point = _lat_lon((parsed.get(key) or {}).get("coordinates"))
+        if point:
+            return point
+    route = (parsed.get("SHR") or {}).get("Маршрут")
+    zona = route.get("zona") if isinstance(route, dict) else None
+    if not isinstance(zona, dict):
+        return None, None
+    if zona.get("type") == "radius":
+        return _lat_lon(zona.get("center")) or (None, None)
+    if zona.get("type") == "polygon":
+        points = [point for point in map(_lat_lon, zona.get("coordinates") or []) if point]
+        if points:
+            return (sum(lat for lat, _ in points) / len(points), sum(lon for _, lon in points) / len(points))
+    return None, None
+
+
+def flight_track(parsed):
+    """Вершины траектории полета: вылет, точки маршрута SHR, прибытие. Возвращает (широты, долготы)."""
+    route = (parsed.get("SHR") or {}).get("Маршрут")
+    waypoints = route.get("waypoints") if isinstance(route, dict) else None
+    points = [
+        _lat_lon((parsed.get("DEP") or {}).get("coordinates")),
+        *map(_lat_lon, waypoints or []),
+        _lat_lon((parsed.get("ARR") or {}).get("coordinates")),
+    ]
+    points = [point for point in points if point]
+    return [lat for lat, _ in points], [lon for _, lon in points]
+
+
+def record_to_row(record):
+    """Превращает запись о полете в строку хранилища с производными колонками."""
+    parsed = record.get("parsed_data") or {}
+    shr = parsed.get("SHR") or {}
+    other = shr.get("Прочая информация") or {}
+    dep = parsed.get("DEP") or {}
+    typ = other.get("TYP")
+    route = shr.get("Маршрут") or {}
+    altitude = route.get("altitude") if isinstance(route, dict) else None
+    duration = parsed.get("flight_duration_minutes")
+    point_lat, point_lon = flight_point(parsed)
+    track_lat, track_lon = flight_track(parsed)
+    return {
+        "center": _as_text(record.get("Центр ЕС ОрВД")),
+        "shr_raw": _as_text(record.get("SHR_raw")),
+        "dep_raw": _as_text(record.get("DEP_raw")),
+        "arr_raw": _as_text(record.get("ARR_raw")),
+        "row_key": row_key(record.get("SHR_raw"), record.get("DEP_raw"), record.get("ARR_raw")),
+        # SID берется так же, как во фронтенде: из поля 18 SHR, иначе из DEP
+        "sid": _as_text(other.get("SID") or dep.get("sid")),
+        "dep_date": dep.get("date"),
+        "dep_time": dep.get("time"),
+        "duration": duration if isinstance(duration, int) else None,
+        "aircraft_type": typ.get("type") if isinstance(typ, dict) else None,
+        "altitude_max": altitude.get("max_m") if isinstance(altitude, dict) else None,
+        "point_lat": point_lat,
+        "point_lon": point_lon,
+        "track_lat": track_lat,
+        "track_lon": track_lon,
+        "parsed_data": json.dumps(parsed, ensure_ascii=False),
+    }
+
+
+def row_to_record(row):
+    return {
+        "Центр ЕС ОрВД": row["center"],
+        "SHR_raw": row["shr_raw"],
+        "DEP_raw": row["dep_raw"],
+        "ARR_raw": row["arr_raw"],
+        "parsed_data": json.loads(row["parsed_data"]),
+    }
+
+
+class SegmentWriter:
+    """
+    Пишет новый сегмент порциями (row groups). Сегмент становится видимым только после commit().
+    С dedupe=True строки, ключ которых уже есть в хранилище или в этом сегменте, пропускаются
+    (их число — skipped); такие загрузки выполняются по одной, чтобы две загрузки
+    не записали одну и ту же строку.
+    """
+
+    def __init__(self, store, name, dedupe=False):
+        self._store = store
+        self.name = name
+        self._existing = None
+        self.dedupe = dedupe
+        if dedupe:
+            store._upload_lock.acquire()
+        try:
+            if dedupe:
+                self._existing = store.row_keys()
+            self._tmp_path = store.segment_path(name) + ".tmp"
+            self._writer = pq.ParquetWriter(self._tmp_path, SCHEMA)
+        except Exception:
+            # Писатель не создан, и abort() вызвать некому — блокировка загрузок снимается здесь
+            self._release()
+            raise
+        self._buffer = []
+        self._keys = set()
+        self.count = 0
+        self.skipped = 0
+
+    def write(self, record):
+        row = record_to_row(record)
+        if self.dedupe and (row["row_key"] in self._existing or row["row_key"] in self._keys):
+            self.skipped += 1
+            return False
+        self._keys.add(row["row_key"])
+        self._buffer.append(row)
+        self.count += 1
+        if len(self._buffer) >= FLIGHT_STORE_ROW_GROUP_SIZE:
+            self._flush()
+        return True
+
+    def write_table(self, table):
+        """Дописывает готовую таблицу (используется компактизацией)."""
+        self._flush()
+        self._writer.write_table(table.cast(SCHEMA))
+        self.count += table.num_rows
+
+    def _flush(self):
+        if self._buffer:
+            self._writer.write_table(pa.Table.from_pylist(self._buffer, schema=SCHEMA))
+            self._buffer = []
+
+    def finish(self):
+        """Закрывает файл и переносит его на место сегмента, не регистрируя в манифесте."""
+        self._flush()
+        self._writer.close()
+        if self.count == 0:
+            os.remove(self._tmp_path)
+            return False
+        os.replace(self._tmp_path, self._store.segment_path(self.name))
+        return True
+
+    def commit(self):
+        try:
+            if not self.finish():
+                return None
+            self._store._add_segment(self.name, self.count, self._keys)
+            return self.name
+        finally:
+            self._release()
+
+    def abort(self):
+        try:
+            self._writer.close()
+            os.remove(self._tmp_path)
+        finally:
+            self._release()
+
+    def _release(self):
+        if self.dedupe:
+            self.dedupe = False
+            self._store._upload_lock.release()
+
+
+class FlightStore:
+    def __init__(self, directory, compact_threshold=FLIGHT_STORE_COMPACT_THRESHOLD):
+        self.directory = directory
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._compaction_lock = threading.Lock()
+        self._upload_lock = threading.Lock()
+        # Ключи строк хранилища, читаются при первой загрузке с пропуском повторов
+        self._row_keys = None
+        # Число читателей каждого сегмента: файлы, замененные компактизацией, удаляются после последнего
+        self._readers = {}
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        self._manifest = self._load_manifest()
+        if "id" not in self._manifest:
+            # Манифесты прежних версий получают идентификатор один раз, при первом открытии
+            self._save_manifest(dict(self._manifest, id=uuid.uuid4().hex))
+        self._remove_obsolete()
+
+    # --- Манифест --- #
+
+    def _load_manifest(self):
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {"id": uuid.uuid4().hex, "version": 0, "next_id": 1, "segments": [], "obsolete": []}
+
+    def _save_manifest(self, manifest):
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._manifest_path)
+        self._manifest = manifest
+
+    def _remove_obsolete(self):
+        # Файлы, замененные компактизацией, удаляются, когда их больше никто не читает
+        with self._lock:
+            obsolete = self._manifest.get("obsolete", [])
+            busy = [name for name in obsolete if name in self._readers]
+            for name in obsolete:
+                path = self.segment_path(name)
+                if name not in busy and os.path.exists(path):
+                    os.remove(path)
+            if len(busy) != len(obsolete):
+                self._save_manifest(dict(self._manifest, obsolete=busy))
+
+    @contextlib.contextmanager
+    def _pinned(self):
+        """Сегменты текущего манифеста; пока читатель их держит, компактизация не удаляет их файлы."""
+        with self._lock:
+            segments = self._manifest["segments"]
+            for segment in segments:
+                self._readers[segment["name"]] = self._readers.get(segment["name"], 0) + 1
+        try:
+            yield segments
+        finally:
+            with self._lock:
+                for segment in segments:
+                    self._readers[segment["name"]] -= 1
+                    if not self._readers[segment["name"]]:
+                        del self._readers[segment["name"]]
+            self._remove_obsolete()
+
+    def refresh(self):
+        """Перечитывает манифест с диска (например, после записи другим процессом). Возвращает True, если версия изменилась."""
+        with self._lock:
+            previous = self._manifest["version"]
+            self._manifest = self._load_manifest()
+            if self._manifest["version"] != previous:
+                self._row_keys = None
+            return self._manifest["version"] != previous
+
+    @property
+    def manifest_path(self):
+        return self._manifest_path
+
+    def segment_path(self, name):
+        return os.path.join(self.directory, name)
+
+    @property
+    def store_id(self):
+        """Идентификатор хранилища: меняется, только если хранилище пересоздано."""
+        return self._manifest["id"]
+
+    @property
+    def version(self):
+        """Версия данных: увеличивается при каждом добавлении сегмента."""
+        return self._manifest["version"]
+
+    def segments(self):
+        return [segment["name"] for segment in self._manifest["segments"]]
+
+    def count(self):
+        return sum(segment["rows"] for segment in self._manifest["segments"])
+
+    # --- Запись --- #
+
+    def open_segment(self, dedupe=False):
+        """Новый сегмент; dedupe=True — пропускать строки, которые уже есть в хранилище."""
+        with self._lock:
+            manifest = dict(self._manifest)
+            name = f"segment-{manifest['next_id']:06d}.parquet"
+            manifest["next_id"] += 1
+            self._save_manifest(manifest)
+        return SegmentWriter(self, name, dedupe)
+
+    def _add_segment(self, name, rows, keys=None):
+        with self._lock:
+            manifest = dict(self._manifest)
+            manifest["segments"] = manifest["segments"] + [{"name": name, "rows": rows, "created": time.time()}]
+            manifest["version"] += 1
+            self._save_manifest(manifest)
+            if keys is None:
+                self._row_keys = None
+            elif self._row_keys is not None:
+                self._row_keys |= keys
+        if len(manifest["segments"]) > self.compact_threshold:
+            self.compact_in_background()
+
+    def row_keys(self):
+        """Множество ключей содержимого (row_key) всех строк хранилища."""
+        with self._lock:
+            if self._row_keys is None:
+                table = self.read_table(["row_key", "shr_raw", "dep_raw", "arr_raw"])
+                keys = table.column("row_key").to_pylist()
+                if None in keys:
+                    # Сегменты, записанные до появления колонки row_key, — ключ считается по исходным текстам
+                    raw = zip(*(table.column(name).to_pylist() for name in ("shr_raw", "dep_raw", "arr_raw")))
+                    keys = [key if key is not None else row_key(*texts) for key, texts in zip(keys, raw)]
+                self._row_keys = set(keys)
+            return self._row_keys
+
+    def append(self, records, dedupe=False):
+        """
+        Добавляет записи новым сегментом. Возвращает имя сегмента или None, если записей нет.
+        dedupe=True — строки, которые уже есть в хранилище, пропускаются.
+        """
+        return self.write_records(records, dedupe).commit()
+
+    def write_records(self, records, dedupe=False):
+        """Пишет записи в новый сегмент и возвращает его SegmentWriter (для commit() и счетчиков count/skipped)."""
+        writer = self.open_segment(dedupe)
+        try:
+            for record in records:
+                writer.write(record)
+        except Exception:
+            writer.abort()
+            raise
+        return writer
+
+    # --- Чтение --- #
+
+    def read_table(self, columns=None, segments=None):
+        """Читает выбранные колонки из выбранных сегментов в одну таблицу pyarrow."""
+        with self._pinned() as current:
+            return self._read_segments(columns, [s["name"] for s in current] if segments is None else segments)
+
+    def _read_segments(self, columns, names):
+        columns = columns or SCHEMA.names
+        schema = pa.schema([SCHEMA.field(name) for name in columns])
+        tables = [pq.read_table(self.segment_path(name), columns=columns, schema=schema) for name in names]
+        if not tables:
+            return schema.empty_table()
+        return pa.concat_tables(tables)
+
+    @staticmethod
+    def _tail_segments(segments, offset):
+        """Сегменты со строками начиная с `offset` и число строк, пропускаемых в каждом из них."""
+        tail = []
+        start = 0
+        for segment in segments:
+            end = start + segment["rows"]
+            if end > offset:
+                tail.append((segment, max(offset - start, 0)))
+            start = end
+        return tail
+
+    def read_tail(self, offset, columns=None):
+        """Читает строки, начиная с порядкового номера `offset` (порядок строк не меняется при компактизации)."""
+        with self._pinned() as current:
+            tail = self._tail_segments(current, offset)
+            table = self._read_segments(columns, [segment["name"] for segment, _ in tail])
+        return table.slice(tail[0][1] if tail else 0)
+
+    def legacy_rows(self, offset, column):
+        """
+        Номера строк, начиная с `offset` (0 — строка offset), из сегментов старого формата без колонки `column`.
+        Проверяется только схема файлов, сами данные не читаются.
+        """
+        rows = []
+        start = 0
+        with self._pinned() as current:
+            for segment, skip in self._tail_segments(current, offset):
+                count = segment["rows"] - skip
+                if column not in pq.read_schema(self.segment_path(segment["name"])).names:
+                    rows.extend(range(start, start + count))
+                start += count
+        return rows
+
+    def iter_batches(self, columns=None, batch_size=FLIGHT_STORE_ROW_GROUP_SIZE):
+        """
+        Последовательно отдает RecordBatch выбранных колонок, не загружая сегменты целиком.
+        Сегменты берутся из манифеста на момент начала чтения и не удаляются компактизацией до его конца.
+        """
+        columns = columns or SCHEMA.names
+        with self._pinned() as current:
+            for segment in current:
+                yield from pq.ParquetFile(self.segment_path(segment["name"])).iter_batches(batch_size=batch_size, columns=columns)
+
+    def read_records(self, segments=None):
+        """Восстанавливает записи в исходном формате API."""
+        table = self.read_table(RECORD_COLUMNS, segments)
+        return [row_to_record(row) for row in table.to_pylist()]
+
+    # --- Компактизация --- #
+
+    def compact_in_background(self):
+        thread = threading.Thread(target=self.compact, name="flight-store-compaction", daemon=True)
+        thread.start()
+        return thread
+
+    def compact(self):
+        """Сливает все текущие сегменты в один. Новые сегменты, появившиеся во время работы, сохраняются."""
+        if not self._compaction_lock.acquire(blocking=False):
+            return None
+        try:
+            self._remove_obsolete()
+            merged = self.segments()
+            if len(merged) < 2:
+                return None
+            writer = self.open_segment()
+            for name in merged:
+                if set(SCHEMA.names) - set(pq.read_schema(self.segment_path(name)).names):
+                    # Сегмент старого формата: производные колонки пересчитываются из исходных записей,
+                    # иначе после слияния их пустые значения не отличить от отсутствующих данных
+                    rows = [record_to_row(record) for record in self.read_records([name])]
+                    writer.write_table(pa.Table.from_pylist(rows, schema=SCHEMA))
+                else:
+                    writer.write_table(self.read_table(segments=[name]))
+            writer.finish()
+
+            with self._lock:
+                manifest = dict(self._manifest)
+                remaining = [s for s in manifest["segments"] if s["name"] not in merged]
+                compacted = {"name": writer.name, "rows": writer.count, "created": time.time()}
+                manifest["segments"] = [compacted] + remaining
+                manifest["obsolete"] = manifest.get("obsolete", []) + merged
+                self._save_manifest(manifest)
+            self._remove_obsolete()
+            return writer.name
+        finally:
+            self._compaction_lock.release()
+
+    # --- Миграция --- #
+
+    def migrate_json(self, json_path):
+        """Импортирует старый base_data.json, если хранилище пустое. Файл переименовывается в *.migrated."""
+        if self.segments() or not os.path.exists(json_path):
+            return False
+        with open(json_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        self.append(records)
+        os.replace(json_path, json_path + ".migrated")
+        print(f"Migrated {len(records)} records from {json_path} to {self.directory}")
+        return True
@@ -0,0 +1,174 @@
+"""Траектории полетов для GET /api/v1/flights/{sid}/trajectory.
+
+Вершины траектории (вылет -> точки маршрута -> прибытие) записываются в хранилище
+при загрузке (колонки track_lat/track_lon). Здесь они собираются в общие массивы
+NumPy со смещениями по полетам; длина по большому кругу (haversine) и ограничивающий
+прямоугольник считаются векторно сразу для всех новых полетов. Поиск полета по SID —
+словарь SID -> номер строки, выдача — срез массивов.
+"""
+import json
+import threading
+
+import numpy as np
+
+from flight_store import flight_track
+
+TRAJECTORY_COLUMNS = ["sid", "aircraft_type", "track_lat", "track_lon"]
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Расстояние по большому кругу (км) между массивами точек."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _flat_tracks(store, table, offset):
+    """Вершины всех траекторий одним массивом и число вершин каждого полета."""
+    lat_column = table.column("track_lat").combine_chunks()
+    lon_column = table.column("track_lon").combine_chunks()
+    if lat_column.null_count == 0:
+        counts = np.asarray(lat_column.value_lengths().to_numpy(zero_copy_only=False), dtype=np.int64)
+        lats = np.asarray(lat_column.flatten().to_numpy(zero_copy_only=False), dtype=np.float64)
+        lons = np.asarray(lon_column.flatten().to_numpy(zero_copy_only=False), dtype=np.float64)
+        return lats, lons, counts
+    # Сегменты, записанные до появления колонок track_*, — траектория берется из parsed_data
+    lat_lists, lon_lists = lat_column.to_pylist(), lon_column.to_pylist()
+    missing = [i for i, value in enumerate(lat_lists) if value is None]
+    parsed = store.read_tail(offset, ["parsed_data"]).column("parsed_data").take(missing).to_pylist()
+    for i, value in zip(missing, parsed):
+        lat_lists[i], lon_lists[i] = flight_track(json.loads(value))
+    counts = np.array([len(value) for value in lat_lists], dtype=np.int64)
+    lats = np.fromiter((lat for value in lat_lists for lat in value), dtype=np.float64, count=int(counts.sum()))
+    lons = np.fromiter((lon for value in lon_lists for lon in value), dtype=np.float64, count=int(counts.sum()))
+    return lats, lons, counts
+
+
+def _lengths_and_bboxes(lats, lons, starts, counts):
+    """Длина (км) и bbox [min_lon, min_lat, max_lon, max_lat] каждого полета по общим массивам вершин."""
+    segments = haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:]) if len(lats) > 1 else np.empty(0)
+    # Отрезок между последней вершиной одного полета и первой следующего не считается
+    boundaries = starts[counts > 0] - 1
+    segments[boundaries[boundaries >= 0]] = 0
+    cumulative = np.concatenate([[0.0], np.cumsum(segments)])
+    lengths = np.zeros(len(counts))
+    has_segments = counts > 1
+    ends = starts + counts
+    lengths[has_segments] = cumulative[ends[has_segments] - 1] - cumulative[starts[has_segments]]
+
+    bboxes = np.full((len(counts), 4), np.nan)
+    nonempty = counts > 0
+    if nonempty.any():
+        bounds = starts[nonempty]
+        bboxes[nonempty] = np.column_stack([
+            np.minimum.reduceat(lons, bounds), np.minimum.reduceat(lats, bounds),
+            np.maximum.reduceat(lons, bounds), np.maximum.reduceat(lats, bounds),
+        ])
+    return lengths, bboxes
+
+
+class _TrajectoryState:
+    """Неизменяемое состояние: вершины, смещения и производные величины заменяются вместе."""
+
+    def __init__(self, lats, lons, offsets, lengths, bboxes, sids, types):
+        self.lats = lats
+        self.lons = lons
+        self.offsets = offsets
+        self.lengths = lengths
+        self.bboxes = bboxes
+        self.sids = sids
+        self.types = types
+
+    @property
+    def rows(self):
+        return len(self.offsets) - 1
+
+
+def _empty_state():
+    return _TrajectoryState(np.empty(0), np.empty(0), np.zeros(1, dtype=np.int64), np.empty(0), np.empty((0, 4)), [], [])
+
+
+class FlightTrajectories:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = _empty_state()
+        self._by_sid = {}
+        self._store_id = None
+
+    @property
+    def rows(self):
+        return self._state.rows
+
+    def copy(self):
+        """Копия для перезагрузки репозитория: массивы общие, индекс по SID копируется (refresh дописывает в него)."""
+        with self._lock:
+            trajectories = FlightTrajectories()
+            trajectories._state, trajectories._store_id = self._state, self._store_id
+            trajectories._by_sid = dict(self._by_sid)
+        return trajectories
+
+    @property
+    def nbytes(self):
+        state = self._state
+        return sum(array.nbytes for array in (state.lats, state.lons, state.offsets, state.lengths, state.bboxes))
+
+    def refresh(self, store):
+        """Дописывает траектории строк хранилища, появившихся после последнего обновления."""
+        with self._lock:
+            state, by_sid = self._state, self._by_sid
+            if self._store_id != store.store_id or state.rows > store.count():
+                state, by_sid = _empty_state(), {}
+                self._store_id = store.store_id
+            if state.rows == store.count():
+                return 0
+            table = store.read_tail(state.rows, TRAJECTORY_COLUMNS)
+            lats, lons, counts = _flat_tracks(store, table, state.rows)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+            lengths, bboxes = _lengths_and_bboxes(lats, lons, starts, counts)
+            sids = table.column("sid").to_pylist()
+            new_state = _TrajectoryState(
+                np.concatenate([state.lats, lats]),
+                np.concatenate([state.lons, lons]),
+                np.concatenate([state.offsets, state.offsets[-1] + np.cumsum(counts)]),
+                np.concatenate([state.lengths, lengths]),
+                np.concatenate([state.bboxes, bboxes]),
+                state.sids + sids,
+                state.types + table.column("aircraft_type").to_pylist(),
+            )
+            # Сначала подменяются массивы, затем индекс: читатель не получит номер строки, которой еще нет
+            self._state = new_state
+            for row, sid in enumerate(sids, start=state.rows):
+                if sid:
+                    # При повторе SID выдается последний загруженный полет
+                    by_sid[sid] = row
+            self._by_sid = by_sid
+            return table.num_rows
+
+    def trajectory(self, sid):
+        """GeoJSON Feature с LineString траектории полета или None, если SID не найден."""
+        state = self._state
+        row = self._by_sid.get(sid)
+        if row is None or row >= state.rows:
+            return None
+        start, end = state.offsets[row], state.offsets[row + 1]
+        coordinates = np.column_stack([state.lons[start:end], state.lats[start:end]]).tolist()
+        if len(coordinates) >= 2:
+            geometry = {"type": "LineString", "coordinates": coordinates}
+        elif coordinates:
+            geometry = {"type": "Point", "coordinates": coordinates[0]}
+        else:
+            geometry = None
+        feature = {
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": {
+                "sid": sid,
+                "aircraft_type": state.types[row],
+                "length_km": round(float(state.lengths[row]), 3),
+                "points": len(coordinates),
+            },
+        }
+        if coordinates:
+            feature["bbox"] = state.bboxes[row].tolist()
+        return feature
@@ -1,10 +1,163 @@
 import shapefile
+import hashlib
 import json
 import re
 import difflib # Добавляем импорт difflib
+import numpy as np
+import shapely
+from shapely.geometry import mapping, shape
+from geometry_cache import cache_path, feature_shapes, write_geometry_cache
 
-def standardize_region_name(name, geojson_region_names=None):
-    if not isinstance(name, str): return name
+# Специальные случаи маппинга
+# GeoJSON: санкт-петербург, Полеты: санкт-петербургский -> санкт-петербург
+# GeoJSON: ростовская, Полеты: ростовский -> ростовская
+# GeoJSON: московская, Полеты: московский -> московская
+# GeoJSON: свердловская, Полеты: екатеринбургский -> свердловская
+# GeoJSON: саха якутия, Полеты: якутский -> саха якутия
+# GeoJSON: крым, Полеты: симферопольский -> крым
+# GeoJSON: карачаево-черкесия, Полеты: карачаево-черкес -> карачаево-черкесия
+# GeoJSON: северная осетия - алания, Полеты: северная осетия - алани -> северная осетия - алания
+# GeoJSON: ханты-мансийский - югра, Полеты: ханты-мансийский - югр -> ханты-мансийский - югра
+# GeoJSON: еврейская автономная, Полеты: еврейская автономна -> еврейская автономная
+# GeoJSON: забайкальский, Полеты: забайкальск -> забайкальский
+# GeoJSON: приморский, Полеты: приморск -> приморский
+# GeoJSON: камчатский, Полеты: камчатск -> камчатский
+# GeoJSON: хабаровск": "хабаровский",
+# GeoJSON: магаданская, Полеты: магаданск -> магаданская
+# GeoJSON: иркутская, Полеты: иркутск -> иркутская
+# GeoJSON: тюменская, Полеты: тюменск -> тюменская
+# GeoJSON: самарская, Полеты: самарск -> самарская
+# GeoJSON: калининградская, Полеты: калининградск -> калининградская
+# GeoJSON: краснодарский, Полеты: краснодарск -> краснодарский
+# GeoJSON: красноярский, Полеты: красноярск -> красноярский
+# GeoJSON: мурманская, Полеты: мурманск -> мурманская
+# GeoJSON: новосибирская, Полеты: новосибирск -> новосибирская
+# GeoJSON: оренбургская, Полеты: оренбургск -> оренбургская
+# GeoJSON: пензенская, Полеты: пензенск -> пензенская
+# GeoJSON: пермский, Полеты: пермск -> пермский
+# GeoJSON: псковская, Полеты: псковск -> псковская
+# GeoJSON: рязанская, Полеты: рязанск -> рязанская
+# GeoJSON: саратовская, Полеты: саратовск -> саратовская
+# GeoJSON: сахалинская, Полеты: сахалинск -> сахалинская
+# GeoJSON: смоленская, Полеты: смоленск -> смоленская
+# GeoJSON: ставропольский, Полеты: ставропольск -> ставропольский
+# GeoJSON: тамбовская, Полеты: тамбовск -> тамбовская
+# GeoJSON: тверская, Полеты: тверск -> тверская
+# GeoJSON: томская, Полеты: томск -> томская
+# GeoJSON: тульская, Полеты: тульск -> тульская
+# GeoJSON: ульяновская, Полеты: ульяновск -> ульяновская
+# GeoJSON: чукотский, Полеты: чукотск -> чукотский
+# GeoJSON: волгоградская, Полеты: волгоградск -> волгоградская
+# GeoJSON: вологодская, Полеты: вологодск -> вологодская
+# GeoJSON: воронежская, Полеты: воронежск -> воронежская
+# GeoJSON: ярославская, Полеты: ярославск -> ярославская
+# GeoJSON: белгородская, Полеты: белгородск -> белгородская
+# GeoJSON: кировская, Полеты: кировск -> кировская
+# GeoJSON: липецкая, Полеты: липецк -> липецкая
+# GeoJSON: нижегородская, Полеты: нижегородск -> нижегородская
+# GeoJSON: новгородская, Полеты: новгородск -> новгородская
+# GeoJSON: омская, Полеты: омск -> омская
+# GeoJSON: орловская, Полеты: орловск -> орловская
+# GeoJSON: амурская, Полеты: амурск -> амурская
+# GeoJSON: адыгея, Полеты: адыге -> адыгея
+# GeoJSON: алтайский, Полеты: алтайск -> алтайский
+# GeoJSON: башкортостан, Полеты: башкортостан -> башкортостан
+# GeoJSON: бурятия, Полеты: бурят -> бурятия
+# GeoJSON: калмыкия, Полеты: калмыки -> калмыкия
+# GeoJSON: карелия, Полеты: карели -> карелия
+# GeoJSON: коми, Полеты: коми -> коми
+# GeoJSON: крым, Полеты: крым -> крым
+# GeoJSON: марий эл, Полеты: марий эл -> марий эл
+# GeoJSON: москва, Полеты: москва -> москва
+# GeoJSON: севастополь, Полеты: севастополь -> севастополь
+# GeoJSON: татарстан, Полеты: татарстан -> татарстан
+# GeoJSON: тыва, Полеты: тыва -> тыва
+# GeoJSON: удмуртия, Полеты: удмурти -> удмуртия
+# GeoJSON: чечня, Полеты: чечен -> чечня
+# GeoJSON: чувашия, Полеты: чуваш -> чувашия
+# GeoJSON: сумска, Полеты: сумск -> сумска
+# GeoJSON: алтай, Полеты: алтай -> алтай
+# GeoJSON: еврейская автономная, Полеты: еврейская автономная -> еврейская автономная
+# GeoJSON: ханты-мансийский - югра, Полеты: ханты-мансийский - югра -> ханты-мансийский - югра
+# GeoJSON: северная осетия - алания, Полеты: северная осетия - алания -> северная осетия - алания
+
+REGION_NAME_MAPPING = {
+    "санкт-петербург": "санкт-петербург",
+    "рост": "ростовская", # Добавлено
+    "новосибир": "новосибирская", # Добавлено
+    "моск": "московская", # Добавлено
+    "екатеринбург": "свердловская",
+    "якут": "саха якутия",
+    "симферополь": "крым",
+    "карачаево-черкес": "карачаево-черкесия",
+    "северная осетия - алани": "северная осетия - алания",
+    "ханты-мансийский - югр": "ханты-мансийский - югра",
+    "еврейская автономна": "еврейская автономная",
+    "забайкальск": "забайкальский",
+    "приморск": "приморский",
+    "камчатск": "камчатский",
+    "хабаровск": "хабаровский",
+    "магаданск": "магаданская",
+    "иркутск": "иркутская",
+    "тюменск": "тюменская",
+    "самарск": "самарская",
+    "калининградск": "калининградская",
+    "краснодарск": "краснодарский",
+    "красноярск": "красноярский",
+    "мурманск": "мурманская",
+    "новосибирск": "новосибирская",
+    "оренбургск": "оренбургская",
+    "пензенск": "пензенская",
+    "пермск": "пермский",
+    "псковск": "псковская",
+    "рязанск": "рязанская",
+    "саратовск": "саратовская",
+    "сахалинск": "сахалинская",
+    "смоленск": "смоленская",
+    "ставропольск": "ставропольский",
+    "тамбовск": "тамбовская",
+    "тверск": "тверская",
+    "томск": "томская",
+    "тульск": "тульская",
+    "ульяновск": "ульяновская",
+    "чукотск": "чукотский",
+    "волгоградск": "волгоградская",
+    "вологодск": "вологодская",
+    "воронежск": "воронежская",
+    "ярославск": "ярославская",
+    "белгородск": "белгородская",
+    "кировск": "кировская",
+    "липецк": "липецкая",
+    "нижегородск": "нижегородская",
+    "новгородск": "новгородская",
+    "омск": "омская",
+    "орловск": "орловская",
+    "амурск": "амурская",
+    "адыге": "адыгея",
+    "алтайск": "алтайский",
+    "башкортостан": "башкортостан",
+    "бурят": "бурятия",
+    "калмыки": "калмыкия",
+    "карели": "карелия",
+    "коми": "коми",
+    "крым": "крым",
+    "марий эл": "марий эл",
+    "москва": "москва",
+    "севастополь": "севастополь",
+    "татарстан": "татарстан",
+    "тыва": "тыва",
+    "удмуртия": "удмуртия",
+    "чечен": "чечня",
+    "чуваш": "чувашия",
+    "сумск": "сумска",
+    "алтай": "алтай",
+    "еврейская автономная": "еврейская автономная",
+    "ханты-мансийский - югра": "ханты-мансийский - югра",
+    "северная осетия - алания": "северная осетия - алания"
+}
+
+
+def normalize_region_name(name):
     name = name.lower()
     
     # Удаляем общие суффиксы и слова
@@ -12,156 +165,13 @@ def standardize_region_name(name, geojson_region_names=None):
     name = re.sub(r'(ый|ая|ий|ое|ые|овский|ский|ская|ская)', '', name) # Удаляем окончания
     name = re.sub(r'[^а-я0-9\s-]', '', name) # Удаляем все, кроме кириллицы, цифр, пробелов и дефисов
     name = re.sub(r'\s+', ' ', name).strip() # Удаляем лишние пробелы
+    return name
 
-    # Специальные случаи маппинга
-    # GeoJSON: санкт-петербург, Полеты: санкт-петербургский -> санкт-петербург
-    # GeoJSON: ростовская, Полеты: ростовский -> ростовская
-    # GeoJSON: московская, Полеты: московский -> московская
-    # GeoJSON: свердловская, Полеты: екатеринбургский -> свердловская
-    # GeoJSON: саха якутия, Полеты: якутский -> саха якутия
-    # GeoJSON: крым, Полеты: симферопольский -> крым
-    # GeoJSON: карачаево-черкесия, Полеты: карачаево-черкес -> карачаево-черкесия
-    # GeoJSON: северная осетия - алания, Полеты: северная осетия - алани -> северная осетия - алания
-    # GeoJSON: ханты-мансийский - югра, Полеты: ханты-мансийский - югр -> ханты-мансийский - югра
-    # GeoJSON: еврейская автономная, Полеты: еврейская автономна -> еврейская автономная
-    # GeoJSON: забайкальский, Полеты: забайкальск -> забайкальский
-    # GeoJSON: приморский, Полеты: приморск -> приморский
-    # GeoJSON: камчатский, Полеты: камчатск -> камчатский
-    # GeoJSON: хабаровск": "хабаровский",
-    # GeoJSON: магаданская, Полеты: магаданск -> магаданская
-    # GeoJSON: иркутская, Полеты: иркутск -> иркутская
-    # GeoJSON: тюменская, Полеты: тюменск -> тюменская
-    # GeoJSON: самарская, Полеты: самарск -> самарская
-    # GeoJSON: калининградская, Полеты: калининградск -> калининградская
-    # GeoJSON: краснодарский, Полеты: краснодарск -> краснодарский
-    # GeoJSON: красноярский, Полеты: красноярск -> красноярский
-    # GeoJSON: мурманская, Полеты: мурманск -> мурманская
-    # GeoJSON: новосибирская, Полеты: новосибирск -> новосибирская
-    # GeoJSON: оренбургская, Полеты: оренбургск -> оренбургская
-    # GeoJSON: пензенская, Полеты: пензенск -> пензенская
-    # GeoJSON: пермский, Полеты: пермск -> пермский
-    # GeoJSON: псковская, Полеты: псковск -> псковская
-    # GeoJSON: рязанская, Полеты: рязанск -> рязанская
-    # GeoJSON: саратовская, Полеты: саратовск -> саратовская
-    # GeoJSON: сахалинская, Полеты: сахалинск -> сахалинская
-    # GeoJSON: смоленская, Полеты: смоленск -> смоленская
-    # GeoJSON: ставропольский, Полеты: ставропольск -> ставропольский
-    # GeoJSON: тамбовская, Полеты: тамбовск -> тамбовская
-    # GeoJSON: тверская, Полеты: тверск -> тверская
-    # GeoJSON: томская, Полеты: томск -> томская
-    # GeoJSON: тульская, Полеты: тульск -> тульская
-    # GeoJSON: ульяновская, Полеты: ульяновск -> ульяновская
-    # GeoJSON: чукотский, Полеты: чукотск -> чукотский
-    # GeoJSON: волгоградская, Полеты: волгоградск -> волгоградская
-    # GeoJSON: вологодская, Полеты: вологодск -> вологодская
-    # GeoJSON: воронежская, Полеты: воронежск -> воронежская
-    # GeoJSON: ярославская, Полеты: ярославск -> ярославская
-    # GeoJSON: белгородская, Полеты: белгородск -> белгородская
-    # GeoJSON: кировская, Полеты: кировск -> кировская
-    # GeoJSON: липецкая, Полеты: липецк -> липецкая
-    # GeoJSON: нижегородская, Полеты: нижегородск -> нижегородская
-    # GeoJSON: новгородская, Полеты: новгородск -> новгородская
-    # GeoJSON: омская, Полеты: омск -> омская
-    # GeoJSON: орловская, Полеты: орловск -> орловская
-    # GeoJSON: амурская, Полеты: амурск -> амурская
-    # GeoJSON: адыгея, Полеты: адыге -> адыгея
-    # GeoJSON: алтайский, Полеты: алтайск -> алтайский
-    # GeoJSON: башкортостан, Полеты: башкортостан -> башкортостан
-    # GeoJSON: бурятия, Полеты: бурят -> бурятия
-    # GeoJSON: калмыкия, Полеты: калмыки -> калмыкия
-    # GeoJSON: карелия, Полеты: карели -> карелия
-    # GeoJSON: коми, Полеты: коми -> коми
-    # GeoJSON: крым, Полеты: крым -> крым
-    # GeoJSON: марий эл, Полеты: марий эл -> марий эл
-    # GeoJSON: москва, Полеты: москва -> москва
-    # GeoJSON: севастополь, Полеты: севастополь -> севастополь
-    # GeoJSON: татарстан, Полеты: татарстан -> татарстан
-    # GeoJSON: тыва, Полеты: тыва -> тыва
-    # GeoJSON: удмуртия, Полеты: удмурти -> удмуртия
-    # GeoJSON: чечня, Полеты: чечен -> чечня
-    # GeoJSON: чувашия, Полеты: чуваш -> чувашия
-    # GeoJSON: сумска, Полеты: сумск -> сумска
-    # GeoJSON: алтай, Полеты: алтай -> алтай
-    # GeoJSON: еврейская автономная, Полеты: еврейская автономная -> еврейская автономная
-    # GeoJSON: ханты-мансийский - югра, Полеты: ханты-мансийский - югра -> ханты-мансийский - югра
-    # GeoJSON: северная осетия - алания, Полеты: северная осетия - алания -> северная осетия - алания
-    
-    mapping = {
-        "санкт-петербург": "санкт-петербург",
-        "рост": "ростовская", # Добавлено
-        "новосибир": "новосибирская", # Добавлено
-        "моск": "московская", # Добавлено
-        "екатеринбург": "свердловская",
-        "якут": "саха якутия",
-        "симферополь": "крым",
-        "карачаево-черкес": "карачаево-черкесия",
-        "северная осетия - алани": "северная осетия - алания",
-        "ханты-мансийский - югр": "ханты-мансийский - югра",
-        "еврейская автономна": "еврейская автономная",
-        "забайкальск": "забайкальский",
-        "приморск": "приморский",
-        "камчатск": "камчатский",
-        "хабаровск": "хабаровский",
-        "магаданск": "магаданская",
-        "иркутск": "иркутская",
-        "тюменск": "тюменская",
-        "самарск": "самарская",
-        "калининградск": "калининградская",
-        "краснодарск": "краснодарский",
-        "красноярск": "красноярский",
-        "мурманск": "мурманская",
-        "новосибирск": "новосибирская",
-        "оренбургск": "оренбургская",
-        "пензенск": "пензенская",
-        "пермск": "пермский",
-        "псковск": "псковская",
-        "рязанск": "рязанская",
-        "саратовск": "саратовская",
-        "сахалинск": "сахалинская",
-        "смоленск": "смоленская",
-        "ставропольск": "ставропольский",
-        "тамбовск": "тамбовская",
-        "тверск": "тверская",
-        "томск": "томская",
-        "тульск": "тульская",
-        "ульяновск": "ульяновская",
-        "чукотск": "чукотский",
-        "волгоградск": "волгоградская",
-        "вологодск": "вологодская",
-        "воронежск": "воронежская",
-        "ярославск": "ярославская",
-        "белгородск": "белгородская",
-        "кировск": "кировская",
-        "липецк": "липецкая",
-        "нижегородск": "нижегородская",
-        "новгородск": "новгородская",
-        "омск": "омская",
-        "орловск": "орловская",
-        "амурск": "амурская",
-        "адыге": "адыгея",
-        "алтайск": "алтайский",
-        "башкортостан": "башкортостан",
-        "бурят": "бурятия",
-        "калмыки": "калмыкия",
-        "карели": "карелия",
-        "коми": "коми",
-        "крым": "крым",
-        "марий эл": "марий эл",
-        "москва": "москва",
-        "севастополь": "севастополь",
-        "татарстан": "татарстан",
-        "тыва": "тыва",
-        "удмуртия": "удмуртия",
-        "чечен": "чечня",
-        "чуваш": "чувашия",
-        "сумск": "сумска",
-        "алтай": "алтай",
-        "еврейская автономная": "еврейская автономная",
-        "ханты-мансийский - югра": "ханты-мансийский - югра",
-        "северная осетия - алания": "северная осетия - алания"
-    }
-    
-    for key, value in mapping.items():
+def standardize_region_name(name, geojson_region_names=None):
+    if not isinstance(name, str): return name
+    name = normalize_region_name(name)
+
+    for key, value in REGION_NAME_MAPPING.items():
         if name.startswith(key):
             return value
 
@@ -173,6 +183,149 @@ def standardize_region_name(name, geojson_region_names=None):
 
     return name
 
+class RegionResolver:
+    """
+    Индексированный аналог standardize_region_name для фиксированного списка GeoJSON регионов.
+    Префиксы маппинга собраны в trie, результаты для исходных и нормализованных названий
+    и результаты нечеткого поиска запоминаются. Результат совпадает с standardize_region_name.
+    """
+
+    def __init__(self, geojson_region_names=None, mapping=REGION_NAME_MAPPING):
+        self.geojson_region_names = list(geojson_region_names or [])
+        self._mapping = mapping
+        # Узел trie: {символ: узел}, в ключе None — порядковый номер префикса в маппинге
+        self._trie = {}
+        for order, key in enumerate(mapping):
+            node = self._trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node.setdefault(None, order)
+        self._values = list(mapping.values())
+        self._by_name = {}
+        self._by_normalized = {}
+
+    def _match_prefix(self, name):
+        # Из всех префиксов маппинга, с которых начинается name, выигрывает первый по порядку в словаре
+        node = self._trie
+        best = None
+        for char in name:
+            node = node.get(char)
+            if node is None:
+                break
+            order = node.get(None)
+            if order is not None and (best is None or order < best):
+                best = order
+        return self._values[best] if best is not None else None
+
+    def _resolve_normalized(self, name):
+        result = self._by_normalized.get(name)
+        if result is None:
+            # Пустой ключ маппинга не задан, поэтому trie не совпадает с пустой строкой
+            result = self._match_prefix(name)
+            if result is None and self.geojson_region_names:
+                close_matches = difflib.get_close_matches(name, self.geojson_region_names, n=1, cutoff=0.8)
+                if close_matches:
+                    result = close_matches[0]
+            if result is None:
+                result = name
+            self._by_normalized[name] = result
+        return result
+
+    def resolve(self, name):
+        if not isinstance(name, str): return name
+        result = self._by_name.get(name)
+        if result is None:
+            result = self._by_name[name] = self._resolve_normalized(normalize_region_name(name))
+        return result
+
+    def resolve_many(self, names):
+        """Разрешает только различные названия и раскладывает результат обратно по строкам."""
+        resolved = {}
+        result = []
+        for name in names:
+            if not isinstance(name, str):
+                result.append(name)
+                continue
+            if name not in resolved:
+                resolved[name] = self.resolve(name)
+            result.append(resolved[name])
+        return result
+
+# Уровни детализации геометрии регионов: (допуск упрощения в градусах, знаков после запятой в координатах).
+# Уровень 0 — исходная геометрия без изменений
+GEOMETRY_LEVELS = [
+    (0, None),
+    (0.005, 4),
+    (0.02, 3),
+    (0.1, 2),
+]
+TILE_SIZE = 256
+
+
+def _simplify_coverage(geometries, tolerance):
+    # Регионы — покрытие без перекрытий: общие границы соседей упрощаются одинаково,
+    # поэтому между регионами не появляется щелей и наложений
+    if hasattr(shapely, "coverage_simplify"):
+        try:
+            return shapely.coverage_simplify(geometries, tolerance)
+        except (TypeError, ValueError, shapely.errors.ShapelyError) as e:
+            # Покрытие из одних полигонов; с другими геометриями (например, GeometryCollection)
+            # регионы упрощаются по отдельности
+            print(f"Coverage simplification is not applicable, simplifying regions separately: {e}")
+    return shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+
+def _quantize(geometries, decimals):
+    grid = 10 ** -decimals
+    # set_precision привязывает вершины к сетке с сохранением корректности полигонов,
+    # округление дает короткую запись чисел в JSON
+    snapped = shapely.set_precision(geometries, grid)
+    return shapely.transform(snapped, lambda coords: np.round(coords, decimals))
+
+
+def build_geometry_levels(geojson, levels=GEOMETRY_LEVELS, geometries=None):
+    """
+    Упрощенные версии GeoJSON регионов для разных масштабов карты, список по номеру уровня.
+    Свойства регионов сохраняются, регионы, выродившиеся при упрощении, отбрасываются.
+    geometries — готовые геометрии shapely объектов (например, из бинарного кэша).
+    """
+    features, shapes = feature_shapes(geojson, geometries)
+    geometries = np.array(shapes, dtype=object)
+    result = []
+    for tolerance, decimals in levels:
+        if not tolerance:
+            result.append(geojson)
+            continue
+        simplified = _quantize(_simplify_coverage(geometries, tolerance), decimals)
+        level_features = [
+            dict(feature, geometry=mapping(geometry))
+            for feature, geometry in zip(features, simplified)
+            if not geometry.is_empty
+        ]
+        result.append(dict(geojson, features=level_features))
+    return result
+
+
+def geometry_level_for(zoom=None, tolerance=None, levels=GEOMETRY_LEVELS):
+    """
+    Самый грубый уровень, допуск которого не превышает запрошенный.
+    Для масштаба карты (zoom веб-меркатора) допуск — размер пикселя тайла в градусах.
+    """
+    if tolerance is None:
+        if zoom is None:
+            return 0
+        tolerance = 360 / (TILE_SIZE * 2 ** zoom)
+    level = 0
+    for number, (level_tolerance, _) in enumerate(levels):
+        if level_tolerance <= tolerance:
+            level = number
+    return level
+
+
+def count_vertices(geojson):
+    return int(sum(shapely.get_num_coordinates(shape(f["geometry"])) for f in geojson["features"] if f.get("geometry")))
+
+
 def convert_shapefile_to_geojson(shp_path, output_path):
     """Конвертирует shape-файл в GeoJSON."""
     try:
@@ -194,6 +347,7 @@ def convert_shapefile_to_geojson(shp_path, output_path):
         else:
             region_name_index = field_names.index(region_name_field)
 
+        resolver = RegionResolver()
         features = []
         for shape_rec in sf.iterShapeRecords():
             # print("--- New Record ---")
@@ -202,7 +356,7 @@ def convert_shapefile_to_geojson(shp_path, output_path):
             #     print(f"  Field {field_name}: {value}")
 
             original_region_name = shape_rec.record[region_name_index] if len(shape_rec.record) > region_name_index else 'N/A'
-            standardized_region_name = standardize_region_name(original_region_name)
+            standardized_region_name = resolver.resolve(original_region_name)
 
             feature = {
                 "type": "Feature",
@@ -220,8 +374,16 @@ def convert_shapefile_to_geojson(shp_path, output_path):
             "features": features
         }
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(geojson, f, ensure_ascii=False, indent=2)
+        # Без отступов: файл в несколько раз меньше, для чтения человеком он не предназначен
+        data = json.dumps(geojson, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        # Рядом пишется бинарный кэш геометрий, чтобы при загрузке не разбирать текст GeoJSON.
+        # GeoJSON уже записан, поэтому ошибка кэша не считается ошибкой конвертации
+        try:
+            write_geometry_cache(geojson, cache_path(output_path), hashlib.sha256(data).hexdigest())
+        except Exception as e:
+            print(f"Geometry cache is not written: {e}")
             
         print(f"Successfully converted {shp_path} to {output_path}")
         return True
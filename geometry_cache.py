@@ -0,0 +1,158 @@
+"""Бинарный кэш геометрий регионов.
+
+Рядом с GeoJSON (<файл>.geomcache/) хранятся координаты всех полигонов одним массивом
+и индексы смещений (кольца -> полигоны -> объекты) в формате shapely.to_ragged_array,
+а свойства объектов — в meta.json вместе с SHA-256 исходного GeoJSON.
+Массивы открываются через memory map, геометрии shapely собираются из них
+одним вызовом from_ragged_array, без разбора текста GeoJSON.
+"""
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import shapely
+from shapely.geometry import mapping, shape
+
+CACHE_SUFFIX = ".geomcache"
+CACHE_FORMAT = 1
+
+
+def cache_path(geojson_path):
+    return geojson_path + CACHE_SUFFIX
+
+
+def feature_shapes(geojson, geometries=None):
+    """
+    Объекты с геометрией и их геометрии shapely.
+    geometries — уже собранные геометрии (по одной на объект geojson["features"], None — без геометрии).
+    """
+    if geometries is None:
+        features = [feature for feature in geojson["features"] if feature.get("geometry")]
+        return features, [shape(feature["geometry"]) for feature in features]
+    pairs = [(feature, geometry) for feature, geometry in zip(geojson["features"], geometries) if geometry is not None]
+    return [feature for feature, _ in pairs], [geometry for _, geometry in pairs]
+
+
+class RegionGeometries:
+    """Свойства объектов GeoJSON и их геометрии shapely (None — объект без геометрии)."""
+
+    def __init__(self, properties, geometries, collection=None):
+        self.properties = properties
+        self.geometries = geometries
+        self.collection = collection or {"type": "FeatureCollection"}
+
+    def to_geojson(self):
+        features = [
+            {"type": "Feature", "geometry": mapping(geometry) if geometry is not None else None, "properties": properties}
+            for properties, geometry in zip(self.properties, self.geometries)
+        ]
+        return dict(self.collection, features=features)
+
+
+def write_geometry_cache(geojson, path, source_hash):
+    """
+    Записывает кэш геометрий GeoJSON (каталог кэша заменяется целиком).
+    Возвращает геометрии shapely по одной на объект (None — объект без геометрии).
+    """
+    features = geojson["features"]
+    types = [(feature.get("geometry") or {}).get("type") for feature in features]
+    present = [i for i, geometry_type in enumerate(types) if geometry_type]
+    geometries = [shape(features[i]["geometry"]) for i in present]
+    geometry_type, coords, offsets = shapely.to_ragged_array(geometries) if geometries else (None, np.empty((0, 2)), ())
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "coords.npy"), np.ascontiguousarray(coords, dtype=np.float64))
+    for level, offset in enumerate(offsets):
+        np.save(os.path.join(tmp_path, f"offsets_{level}.npy"), np.asarray(offset, dtype=np.int64))
+    meta = {
+        "format": CACHE_FORMAT,
+        "source_sha256": source_hash,
+        "geometry_type": int(geometry_type) if geometry_type is not None else None,
+        "offset_levels": len(offsets),
+        # Polygon и MultiPolygon хранятся вместе как MultiPolygon, исходный тип восстанавливается при чтении
+        "types": types,
+        "properties": [feature.get("properties") or {} for feature in features],
+        "collection": {key: value for key, value in geojson.items() if key != "features"},
+    }
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Старый кэш убирается в сторону до подмены, чтобы читатель не увидел смешанный каталог
+    old_path = f"{path}.{os.getpid()}.old"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    result = [None] * len(features)
+    for i, geometry in zip(present, geometries):
+        result[i] = geometry
+    return result
+
+
+def load_geometry_cache(path, source_hash=None):
+    """Читает кэш геометрий. None — кэша нет, он другого формата или построен по другому GeoJSON."""
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != CACHE_FORMAT or (source_hash is not None and meta.get("source_sha256") != source_hash):
+        return None
+
+    types = meta["types"]
+    geometries = np.full(len(types), None, dtype=object)
+    if meta["geometry_type"] is not None:
+        coords = np.load(os.path.join(path, "coords.npy"), mmap_mode="r")
+        offsets = [np.load(os.path.join(path, f"offsets_{level}.npy"), mmap_mode="r") for level in range(meta["offset_levels"])]
+        stored = shapely.from_ragged_array(shapely.GeometryType(meta["geometry_type"]), coords, offsets)
+        present = np.array([i for i, geometry_type in enumerate(types) if geometry_type], dtype=np.int64)
+        single = (np.array([types[i] for i in present]) == "Polygon") & \
+            (shapely.get_type_id(stored) == shapely.GeometryType.MULTIPOLYGON)
+        # Объекты, бывшие Polygon, отдаются как Polygon (первая и единственная часть MultiPolygon)
+        stored[single] = shapely.get_geometry(stored[single], 0)
+        geometries[present] = stored
+    return RegionGeometries(meta["properties"], list(geometries), meta["collection"])
+
+
+def _benchmark(geojson_path, repeat=5):
+    """Сравнение чтения GeoJSON (json.load + shape) с чтением бинарного кэша."""
+    from flight_repository import file_hash
+
+    source_hash = file_hash(geojson_path)
+    path = cache_path(geojson_path)
+    with open(geojson_path, "r", encoding="utf-8") as f:
+        write_geometry_cache(json.load(f), path, source_hash)
+
+    def best(func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def json_geometries():
+        with open(geojson_path, "r", encoding="utf-8") as f:
+            return feature_shapes(json.load(f))
+
+    def json_text():
+        with open(geojson_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    cache_bytes = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    print(f"GeoJSON: {os.path.getsize(geojson_path)} bytes, cache: {cache_bytes} bytes")
+    print(f"json.load:                    {best(json_text):.3f}s")
+    print(f"json.load + shapely shapes:   {best(json_geometries):.3f}s")
+    print(f"cache -> shapely geometries:  {best(lambda: load_geometry_cache(path, source_hash)):.3f}s")
+    print(f"cache -> GeoJSON dict:        {best(lambda: load_geometry_cache(path, source_hash).to_geojson()):.3f}s")
+
+
+if __name__ == '__main__':
+    # python geometry_cache.py <путь к GeoJSON>
+    _benchmark(sys.argv[1] if len(sys.argv) > 1 else "/Users/danil_ka88/Desktop/moscow/project/data/russia_regions.geojson")
@@ -0,0 +1,175 @@
+"""Кэш готовых HTTP-ответов для читающих эндпоинтов.
+
+Ответ сериализуется один раз для версии данных. В запросе тело сжимается только быстрым
+уровнем gzip, сильное сжатие gzip и brotli выполняется фоновым потоком и подменяет варианты,
+когда готово. Основные ответы собираются заранее (prepare) — при прогреве и после загрузки.
+Клиенту отдается подходящий по Accept-Encoding вариант с ETag (хэш тела). На
+If-None-Match с тем же ETag возвращается 304 без тела. Запись с устаревшей версией
+данных пересобирается при следующем запросе, после загрузки кэш очищается целиком.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него отдается gzip
+    brotli = None
+
+HTTP_CACHE_MAX_ENTRIES = int(os.environ.get("HTTP_CACHE_MAX_ENTRIES", 256))
+HTTP_CACHE_GZIP_LEVEL = int(os.environ.get("HTTP_CACHE_GZIP_LEVEL", 9))
+# Уровень gzip для ответа, собранного в запросе, пока не готово фоновое сжатие
+HTTP_CACHE_FAST_GZIP_LEVEL = int(os.environ.get("HTTP_CACHE_FAST_GZIP_LEVEL", 1))
+HTTP_CACHE_BROTLI_QUALITY = int(os.environ.get("HTTP_CACHE_BROTLI_QUALITY", 9))
+# Браузер хранит ответ, но перед использованием сверяет ETag: данные меняются с каждой загрузкой
+CACHE_CONTROL = "no-cache"
+# Порядок предпочтения при равных весах в Accept-Encoding
+ENCODINGS = ("br", "gzip", "identity")
+
+
+class CachedBody:
+    def __init__(self, version, body):
+        self.version = version
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=HTTP_CACHE_FAST_GZIP_LEVEL, mtime=0)}
+        self.compressed = False
+
+    def compress(self):
+        """Сильное сжатие gzip и brotli; варианты подменяются одним присваиванием, запросы отдают прежние до конца."""
+        if self.compressed:
+            return
+        body = self.bodies["identity"]
+        bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=HTTP_CACHE_GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body, quality=HTTP_CACHE_BROTLI_QUALITY)
+        self.bodies = bodies
+        self.compressed = True
+
+    @property
+    def nbytes(self):
+        return sum(len(body) for body in self.bodies.values())
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        # Для If-None-Match слабое сравнение: W/"x" совпадает с "x"
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Кодировка ответа по заголовку Accept-Encoding (с учетом q) среди доступных."""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = "identity", 0.0
+    for encoding in ENCODINGS:
+        if encoding == "identity" or encoding not in available:
+            continue
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class ResponseCache:
+    def __init__(self, max_entries=HTTP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._building = {}
+        # Один фоновый поток: сильное сжатие и заранее собираемые ответы не конкурируют с запросами за CPU
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="http-cache")
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def entry(self, key, version, build):
+        """Готовый ответ для ключа и версии данных; build() вызывается, только если его нет."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached.version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            build_lock = self._building.setdefault(key, threading.Lock())
+        # Одновременные промахи по одному ключу сериализуются: ответ собирается и сжимается один раз
+        try:
+            with build_lock:
+                with self._lock:
+                    cached = self._entries.get(key)
+                    if cached is not None and cached.version == version:
+                        self.hits += 1
+                        return cached
+                    self.misses += 1
+                cached = CachedBody(version, orjson.dumps(build()))
+                self._background.submit(cached.compress)
+                with self._lock:
+                    self._entries[key] = cached
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                return cached
+        finally:
+            # Блокировка нужна только на время сборки; иначе ключи с ошибкой (например, неверный курсор
+            # из запроса) копили бы блокировки без записей в кэше
+            with self._lock:
+                if self._building.get(key) is build_lock:
+                    del self._building[key]
+
+    def prepare(self, key, version, build):
+        """Собирает ответ в фоновом потоке заранее (прогрев, после загрузки), сжатые варианты готовятся следом."""
+        return self._background.submit(self.entry, key, version, build)
+
+    def wait(self):
+        """Ждет завершения фоновой работы, поставленной до вызова."""
+        self._background.submit(lambda: None).result()
+
+    def respond(self, request, key, version, build, media_type="application/json"):
+        cached = self.entry(key, version, build)
+        headers = {"ETag": cached.etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), cached.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), cached.bodies)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=cached.bodies[encoding], media_type=media_type, headers=headers)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._building.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(cached.nbytes for cached in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "compressed": sum(cached.compressed for cached in self._entries.values()),
+                "brotli": brotli is not None,
+            }
@@ -0,0 +1,329 @@
+"""Разбор строк выгрузки XLSX в записи о полетах.
+
+Поддерживает последовательный режим, параллельный режим на пуле процессов
+и потоковый режим с ограниченным потреблением памяти.
+Во всех случаях результаты и ошибки возвращаются в исходном порядке строк.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl import load_workbook
+
+from parsing import parse_shr, parse_dep_arr, calculate_duration
+
+# Режим разбора: "serial" (один поток вне event loop), "parallel" (пул процессов)
+# или "stream" (построчное чтение XLSX и запись результата без накопления в памяти)
+INGEST_MODE = os.environ.get("INGEST_MODE", "serial")
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", os.cpu_count() or 1))
+INGEST_CHUNK_SIZE = int(os.environ.get("INGEST_CHUNK_SIZE", 2000))
+# Разбор DEP/ARR: "vectorized" (по колонкам, parsing_vectorized.py) или "scalar" (построчно)
+INGEST_DEP_ARR_ENGINE = os.environ.get("INGEST_DEP_ARR_ENGINE", "vectorized")
+
+# Колонки выгрузки, которые нужны для разбора
+INGEST_COLUMNS = ("Центр ЕС ОрВД", "SHR", "DEP", "ARR")
+SPOOL_CHUNK_SIZE = 1024 * 1024
+PREVIEW_SIZE = 10
+
+_process_pool = None
+_process_pool_workers = None
+# Кэш разбора (parse_cache.ParseCache), подключается через configure_parse_cache
+_parse_cache = None
+
+
+def build_flight_record(row):
+    """Разбирает одну строку выгрузки (dict-подобный объект) в запись о полете."""
+    shr_parsed = parse_shr(row.get('SHR'))
+    dep_parsed = parse_dep_arr(row.get('DEP'))
+    arr_parsed = parse_dep_arr(row.get('ARR'))
+    return _assemble_record(row, shr_parsed, dep_parsed, arr_parsed, calculate_duration(dep_parsed, arr_parsed))
+
+
+def _assemble_record(row, shr_parsed, dep_parsed, arr_parsed, duration):
+    return _record_from_parsed(row, {
+        "SHR": shr_parsed,
+        "DEP": dep_parsed,
+        "ARR": arr_parsed,
+        "flight_duration_minutes": duration
+    })
+
+
+def _record_from_parsed(row, parsed_data):
+    return {
+        "Центр ЕС ОрВД": row.get("Центр ЕС ОрВД"),
+        "SHR_raw": row.get("SHR"),
+        "DEP_raw": row.get("DEP"),
+        "ARR_raw": row.get("ARR"),
+        "parsed_data": parsed_data
+    }
+
+
+def parse_rows(rows):
+    """Разбирает список пар (index, row) и возвращает (results, errors)."""
+    if INGEST_DEP_ARR_ENGINE == "vectorized":
+        return _parse_rows_vectorized(rows)
+
+    results = []
+    errors = []
+    for index, row in rows:
+        try:
+            results.append(build_flight_record(row))
+        except Exception as e:
+            errors.append({"row": index, "error": str(e), "data": row})
+    return results, errors
+
+
+def _parse_rows_vectorized(rows):
+    # pandas нужен только для разбора загрузок, поэтому не импортируется при запуске приложения
+    from parsing_vectorized import parse_dep_arr_columns
+
+    # DEP/ARR и длительность считаются сразу для всех строк, SHR — построчно
+    dep_parsed, arr_parsed, durations = parse_dep_arr_columns(
+        [row.get('DEP') for _, row in rows],
+        [row.get('ARR') for _, row in rows],
+    )
+    results = []
+    errors = []
+    for i, (index, row) in enumerate(rows):
+        try:
+            shr_parsed = parse_shr(row.get('SHR'))
+            results.append(_assemble_record(row, shr_parsed, dep_parsed[i], arr_parsed[i], durations[i]))
+        except Exception as e:
+            errors.append({"row": index, "error": str(e), "data": row})
+    return results, errors
+
+
+# --- Кэш разбора --- #
+
+def configure_parse_cache(cache):
+    """Подключает кэш разбора (или отключает, если передан None)."""
+    global _parse_cache
+    _parse_cache = cache
+
+
+def get_parse_cache():
+    return _parse_cache
+
+
+def _cache_lookup(rows):
+    """
+    Ищет строки в кэше. Возвращает (keys, cached, miss_rows): ключ для каждой строки,
+    найденные значения и строки, которые нужно разобрать (по одной на каждый новый ключ).
+    """
+    cache = _parse_cache
+    keys = [cache.make_key(row.get('SHR'), row.get('DEP'), row.get('ARR')) for _, row in rows]
+    cached = cache.get_many(set(keys))
+    miss_rows = []
+    seen = set()
+    for (index, row), key in zip(rows, keys):
+        if key not in cached and key not in seen:
+            seen.add(key)
+            miss_rows.append((index, row))
+    return keys, cached, miss_rows
+
+
+def _cache_merge(rows, keys, cached, miss_rows, miss_results, miss_errors):
+    """Сохраняет новые результаты в кэш и собирает (results, errors) в исходном порядке строк."""
+    cache = _parse_cache
+    key_by_index = {index: key for (index, _), key in zip(rows, keys)}
+    failed = {key_by_index[error["row"]]: error["error"] for error in miss_errors}
+    parsed = {}
+    records = iter(miss_results)
+    for index, _ in miss_rows:
+        key = key_by_index[index]
+        if key not in failed:
+            parsed[key] = next(records)["parsed_data"]
+    parsed_json = {key: json.dumps(value, ensure_ascii=False) for key, value in parsed.items()}
+    cache.put_many(parsed_json)
+
+    results = []
+    errors = []
+    used = set()
+    for (index, row), key in zip(rows, keys):
+        if key in failed:
+            errors.append({"row": index, "error": failed[key], "data": row})
+        elif key in parsed and key not in used:
+            # Первая строка с новым ключом получает уже разобранный объект без копирования
+            used.add(key)
+            results.append(_record_from_parsed(row, parsed[key]))
+        else:
+            value = cached[key] if key in cached else parsed_json[key]
+            results.append(_record_from_parsed(row, json.loads(value)))
+    cache.record(hits=len(rows) - len(miss_rows), misses=len(miss_rows))
+    return results, errors
+
+
+def parse_rows_cached(rows):
+    """parse_rows с учетом кэша: разбираются только строки, которых еще нет в кэше."""
+    if _parse_cache is None:
+        return parse_rows(rows)
+    keys, cached, miss_rows = _cache_lookup(rows)
+    miss_results, miss_errors = parse_rows(miss_rows)
+    return _cache_merge(rows, keys, cached, miss_rows, miss_results, miss_errors)
+
+
+def _split_into_chunks(rows, chunk_size):
+    return [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+
+
+def get_process_pool(workers=None):
+    """Возвращает общий пул процессов, создавая его при первом обращении."""
+    global _process_pool, _process_pool_workers
+    workers = workers or INGEST_WORKERS
+    if _process_pool is None or _process_pool_workers != workers:
+        shutdown_process_pool()
+        _process_pool = ProcessPoolExecutor(max_workers=workers)
+        _process_pool_workers = workers
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool, _process_pool_workers
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+        _process_pool_workers = None
+
+
+async def parse_rows_async(rows, mode=None, workers=None, chunk_size=None):
+    """
+    Разбирает строки, не блокируя event loop.
+    - `serial`: весь разбор выполняется в отдельном потоке.
+    - `parallel`: строки делятся на чанки по `chunk_size` и разбираются в пуле процессов.
+    Возвращает (results, errors) в исходном порядке строк.
+    """
+    mode = mode or INGEST_MODE
+    if mode == "serial":
+        return await asyncio.to_thread(parse_rows_cached, rows)
+    if mode != "parallel":
+        raise ValueError(f"Unknown ingest mode: {mode}")
+
+    if _parse_cache is None:
+        return await _parse_rows_parallel(rows, workers, chunk_size)
+    # Обращения к кэшу выполняются в основном процессе, в пул уходят только промахи
+    keys, cached, miss_rows = await asyncio.to_thread(_cache_lookup, rows)
+    miss_results, miss_errors = await _parse_rows_parallel(miss_rows, workers, chunk_size)
+    return await asyncio.to_thread(_cache_merge, rows, keys, cached, miss_rows, miss_results, miss_errors)
+
+
+async def _parse_rows_parallel(rows, workers=None, chunk_size=None):
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool(workers)
+    chunk_results = await asyncio.gather(*[
+        loop.run_in_executor(pool, parse_rows, chunk)
+        for chunk in _split_into_chunks(rows, chunk_size)
+    ])
+
+    results = []
+    errors = []
+    for chunk_records, chunk_errors in chunk_results:
+        results.extend(chunk_records)
+        errors.extend(chunk_errors)
+    return results, errors
+
+
+# --- Потоковый режим --- #
+
+async def spool_upload(upload_file, suffix=".xlsx"):
+    """Сохраняет загружаемый файл во временный файл по частям и возвращает путь к нему."""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        while True:
+            chunk = await upload_file.read(SPOOL_CHUNK_SIZE)
+            if not chunk:
+                break
+            tmp.write(chunk)
+        return tmp.name
+
+
+def iter_xlsx_rows(path, columns=INGEST_COLUMNS):
+    """
+    Построчно читает первый лист XLSX в режиме read-only и отдает пары (index, row).
+    В row попадают только колонки из `columns`. Пустые строки в конце листа пропускаются,
+    как это делает pandas.read_excel.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        positions = {name: i for i, name in enumerate(header) if name in columns}
+
+        index = 0
+        pending_empty = 0
+        for values in rows:
+            row = {name: values[i] if i < len(values) else None for name, i in positions.items()}
+            if all(value is None for value in values):
+                pending_empty += 1
+                continue
+            # Пустые строки в середине листа pandas сохраняет, поэтому отдаем их перед непустой
+            for _ in range(pending_empty):
+                yield index, dict.fromkeys(positions)
+                index += 1
+            pending_empty = 0
+            yield index, row
+            index += 1
+    finally:
+        workbook.close()
+
+
+def iter_parsed_rows(rows, chunk_size=None):
+    """
+    Генератор: для каждой пары (index, row) отдает (record, None) или (None, error).
+    Строки разбираются порциями по `chunk_size`, чтобы использовать пакетный разбор DEP/ARR,
+    поэтому в памяти одновременно находится не больше одной порции.
+    """
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield from _iter_chunk_results(chunk)
+            chunk = []
+    if chunk:
+        yield from _iter_chunk_results(chunk)
+
+
+def _iter_chunk_results(chunk):
+    results, errors = parse_rows_cached(chunk)
+    # parse_rows возвращает ошибки отдельно, восстанавливаем исходный порядок строк
+    failed = {error["row"]: error for error in errors}
+    records = iter(results)
+    for index, _ in chunk:
+        if index in failed:
+            yield None, failed[index]
+        else:
+            yield next(records), None
+
+
+def ingest_xlsx_stream(xlsx_path, writer):
+    """
+    Потоково разбирает XLSX и передает записи в `writer` (flight_store.SegmentWriter).
+    Сегмент фиксируется (commit) только если ни одна строка не завершилась ошибкой.
+    Возвращает (count, preview, errors), где preview — первые PREVIEW_SIZE записей.
+    """
+    preview = []
+    errors = []
+    try:
+        for record, error in iter_parsed_rows(iter_xlsx_rows(xlsx_path)):
+            if error is not None:
+                errors.append(error)
+                continue
+            if errors:
+                # Результат все равно не будет сохранен, продолжаем только ради списка ошибок
+                continue
+            # Полет, который уже есть в хранилище, не записывается и не попадает в превью
+            if writer.write(record) and len(preview) < PREVIEW_SIZE:
+                preview.append(record)
+    except Exception:
+        writer.abort()
+        raise
+
+    if errors:
+        writer.abort()
+    else:
+        writer.commit()
+    return writer.count, preview, errors
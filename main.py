@@ -1,14 +1,27 @@
-from fastapi import FastAPI, File, UploadFile
-from fastapi.responses import JSONResponse
+import time
+IMPORTS_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
+from typing import Optional
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-import numpy as np
-import json
 import io
 import os
-from parsing import parse_shr, parse_dep_arr, calculate_duration
-from geojson_converter import convert_shapefile_to_geojson, standardize_region_name
+import asyncio
+import ingest
+from ingest import build_flight_record, parse_rows_async, shutdown_process_pool, iter_xlsx_rows, spool_upload, ingest_xlsx_stream
+from parse_cache import ParseCache
+from flight_store import FlightStore
+from flight_index import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from flight_heatmap import parse_bbox
+from flight_repository import FlightRepository
+from flight_export import STREAM_FORMATS, iter_export
+from http_cache import ResponseCache
+from warmup import Warmup
+from vector_tiles import MEDIA_TYPE as MVT_MEDIA_TYPE, TileCache, valid_tile
+from geojson_converter import convert_shapefile_to_geojson, geometry_level_for
 from ollama_analyzer.main import router as ai_router
+from ollama_analyzer.logic import analysis_cache, ollama_client
 from database_connector.main import router as db_router
 from auth_connector.main import router as auth_router
 from crypto_connector.main import router as crypto_router
@@ -19,75 +32,102 @@ DATA_FILE = "/Users/danil_ka88/Desktop/moscow/project/data/base_data.json"
 DEFAULT_XLSX = "/Users/danil_ka88/Desktop/moscow/project/data/2025.xlsx"
 GEOJSON_FILE = "/Users/danil_ka88/Desktop/moscow/project/data/russia_regions.geojson"
 SHAPEFILE_PATH = "/Users/danil_ka88/Desktop/moscow/project/Russia-Admin-Shapemap-main/RF/admin_4"
+PARSE_CACHE_FILE = "/Users/danil_ka88/Desktop/moscow/project/data/parse_cache.sqlite"
+FLIGHT_STORE_DIR = "/Users/danil_ka88/Desktop/moscow/project/data/flight_store"
+TILE_CACHE_DIR = "/Users/danil_ka88/Desktop/moscow/project/data/tile_cache"
+# Даты в параметрах запросов сравниваются со строками хранилища, поэтому принимается только YYYY-MM-DD
+DATE_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])$"
 
-def get_flight_regions_stats():
-    if not os.path.exists(DEFAULT_XLSX):
-        return {}
-
-    df = pd.read_excel(DEFAULT_XLSX)
-    df = df.replace({np.nan: None})
-
-    region_flight_counts = {}
-
-    # Получаем список всех GeoJSON регионов для нечеткого сопоставления
-    geojson_region_names = []
-    if os.path.exists(GEOJSON_FILE):
-        with open(GEOJSON_FILE, "r", encoding="utf-8") as f:
-            geojson_data = json.load(f)
-        for feature in geojson_data["features"]:
-            geojson_region_names.append(feature["properties"]["region_name"])
-
-    for index, row in df.iterrows():
-        region_name = row.get("Центр ЕС ОрВД")
-        if region_name:
-            # Передаем geojson_region_names в standardize_region_name
-            standardized_region_name = standardize_region_name(region_name, geojson_region_names)
-            region_flight_counts[standardized_region_name] = region_flight_counts.get(standardized_region_name, 0) + 1
-        
-    return region_flight_counts
+# Колоночное хранилище полетов и репозиторий данных в памяти, создаются на старте приложения
+flight_store = None
+repository = None
+tile_cache = None
+# Готовые (в том числе сжатые) ответы читающих эндпоинтов для текущей версии данных
+response_cache = ResponseCache()
+# Фазы запуска и фонового прогрева (GET /ready)
+warmup = Warmup()
 
 @app.on_event("startup")
 def on_startup():
-    """На старте проверяет, существуют ли базовые JSON файлы. Если нет - создает их."""
-    if not os.path.exists(DATA_FILE):
-        try:
-            df = pd.read_excel(DEFAULT_XLSX)
-            df = df.replace({np.nan: None})
-            
-            results = []
-            for index, row in df.iterrows():
-                if len(results) >= 50:
-                    break
-                try:
-                    shr_parsed = parse_shr(row.get('SHR'))
-                    dep_parsed = parse_dep_arr(row.get('DEP'))
-                    arr_parsed = parse_dep_arr(row.get('ARR'))
-
-                    result = {
-                        "Центр ЕС ОрВД": row.get("Центр ЕС ОрВД"),
-                        "SHR_raw": row.get("SHR"),
-                        "DEP_raw": row.get("DEP"),
-                        "ARR_raw": row.get("ARR"),
-                        "parsed_data": {
-                            "SHR": shr_parsed,
-                            "DEP": dep_parsed,
-                            "ARR": arr_parsed,
-                            "flight_duration_minutes": calculate_duration(dep_parsed, arr_parsed)
-                        }
-                    }
-                    results.append(result)
-                except Exception:
-                    continue
-            
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump(results, f, ensure_ascii=False, indent=4)
-            print(f"Default data file created at {DATA_FILE}")
-        except Exception as e:
-            print(f"Error creating default data file: {e}")
+    """
+    Открывает хранилище полетов и сразу начинает принимать запросы.
+    Перенос base_data.json, демо-данные, конвертация шейп-файла и загрузка данных в память
+    выполняются фоновым прогревом, его состояние — GET /ready.
+    """
+    started = time.perf_counter()
+    print(f"Startup phase 'imports' finished in {started - IMPORTS_STARTED:.3f}s")
+    warmup.run_phase("parse_cache", configure_parse_cache)
+    warmup.run_phase("open_store", open_store)
+    warmup.start_background([
+        ("migrate_json", lambda: flight_store.migrate_json(DATA_FILE)),
+        ("default_flights", create_default_flights),
+        ("geojson", convert_geojson),
+        # Первичная загрузка данных в память, дальше репозиторий перезагружает только изменившиеся источники
+        ("repository", load_repository),
+    ])
+    print(f"Startup finished in {time.perf_counter() - started:.3f}s, warm-up continues in background")
+
+def configure_parse_cache():
+    try:
+        ingest.configure_parse_cache(ParseCache(PARSE_CACHE_FILE))
+    except Exception as e:
+        print(f"Parse cache is disabled: {e}")
+
+def open_store():
+    global flight_store, repository, tile_cache
+    flight_store = FlightStore(FLIGHT_STORE_DIR)
+    # Репозиторий создается сразу, данные в него загружаются при первом get() (прогрев или запрос)
+    repository = FlightRepository(flight_store, GEOJSON_FILE, DEFAULT_XLSX)
+    tile_cache = TileCache(TILE_CACHE_DIR)
+
+def create_default_flights():
+    """Если хранилище пустое, создает демо-данные из первых 50 строк XLSX."""
+    if flight_store.count() != 0:
+        return
+    try:
+        # Нужны только первые 50 записей, поэтому читаем книгу построчно, а не целиком
+        results = []
+        for index, row in iter_xlsx_rows(DEFAULT_XLSX):
+            if len(results) >= 50:
+                break
+            try:
+                results.append(build_flight_record(row))
+            except Exception:
+                continue
+        
+        flight_store.append(results)
+        print(f"Default flight data created in {FLIGHT_STORE_DIR}")
+    except Exception as e:
+        print(f"Error creating default flight data: {e}")
 
+def convert_geojson():
     if not os.path.exists(GEOJSON_FILE):
         convert_shapefile_to_geojson(SHAPEFILE_PATH, GEOJSON_FILE)
 
+def prepare_responses(snapshot):
+    """Заранее, в фоне, собирает и сжимает самые тяжелые ответы версии данных (полный список полетов)."""
+    response_cache.prepare(("flights",), snapshot.data_version, lambda: snapshot.flights)
+    response_cache.prepare(("flight_regions_stats",), snapshot.data_version, lambda: snapshot.region_stats)
+
+def load_repository():
+    snapshot = repository.get(wait=True)
+    tile_cache.prune(snapshot.data_version)
+    prepare_responses(snapshot)
+
+def refresh_after_upload():
+    """Подтягивает новые данные в репозиторий, сбрасывает кэши прежней версии данных и готовит новые ответы."""
+    snapshot = repository.get(wait=True)
+    response_cache.invalidate()
+    tile_cache.prune(snapshot.data_version)
+    prepare_responses(snapshot)
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_process_pool()
+    cache = ingest.get_parse_cache()
+    if cache is not None:
+        cache.close()
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -109,74 +149,220 @@ app.include_router(crypto_router)
 def read_root():
     return {"Hello": "World"}
 
+@app.get("/ready")
+def get_readiness():
+    """Готовность к работе: 200, когда фоновый прогрев завершен, иначе 503 с состоянием фаз запуска."""
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+def read_excel_rows(contents):
+    """Строки книги Excel: [(номер строки, {колонка: значение})], пустые ячейки — None."""
+    # pandas загружается при первой такой загрузке, а не при запуске приложения
+    import pandas as pd
+    import numpy as np
+
+    df = pd.read_excel(io.BytesIO(contents))
+    df = df.replace({np.nan: None})
+    return list(zip(df.index.tolist(), df.to_dict("records")))
+
+def save_upload(records):
+    """Сохраняет разобранные записи новым сегментом, пропуская уже загруженные полеты. Возвращает SegmentWriter."""
+    writer = flight_store.write_records(records, dedupe=True)
+    writer.commit()
+    return writer
+
+def ingest_upload_stream(xlsx_path):
+    writer = flight_store.open_segment(dedupe=True)
+    count, preview, errors = ingest_xlsx_stream(xlsx_path, writer)
+    return count, writer.skipped, preview, errors
+
+def upload_message(count, skipped):
+    message = f"File processed successfully. {count} records saved."
+    if skipped:
+        message += f" {skipped} already uploaded records skipped."
+    return message
+
 @app.post("/api/upload")
 async def upload_and_parse_excel(file: UploadFile = File(...)):
     if not file.filename.endswith('.xlsx'):
         return JSONResponse(status_code=400, content={"error": "Invalid file format. Please upload an .xlsx file."})
 
+    if ingest.INGEST_MODE == "stream":
+        return await upload_and_parse_excel_stream(file)
+
     try:
         contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
-        df = df.replace({np.nan: None})
-        
-        results = []
-        errors = []
-        for index, row in df.iterrows():
-            try:
-                shr_parsed = parse_shr(row.get('SHR'))
-                dep_parsed = parse_dep_arr(row.get('DEP'))
-                arr_parsed = parse_dep_arr(row.get('ARR'))
-
-                result = {
-                    "Центр ЕС ОрВД": row.get("Центр ЕС ОрВД"),
-                    "SHR_raw": row.get("SHR"),
-                    "DEP_raw": row.get("DEP"),
-                    "ARR_raw": row.get("ARR"),
-                    "parsed_data": {
-                        "SHR": shr_parsed,
-                        "DEP": dep_parsed,
-                        "ARR": arr_parsed,
-                        "flight_duration_minutes": calculate_duration(dep_parsed, arr_parsed)
-                    }
-                }
-                results.append(result)
-            except Exception as e:
-                errors.append({"row": index, "error": str(e), "data": row.to_dict()})
+        # Разбор книги Excel идет в отдельном потоке, цикл событий продолжает обслуживать запросы
+        rows = await asyncio.to_thread(read_excel_rows, contents)
+        results, errors = await parse_rows_async(rows)
         
         if errors:
             return JSONResponse(status_code=422, content={"errors": errors})
 
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=4)
+        # Загрузка дописывается новым сегментом, ранее загруженные полеты сохраняются,
+        # полеты, которые уже есть в хранилище, пропускаются
+        writer = await asyncio.to_thread(save_upload, results)
+        await asyncio.to_thread(refresh_after_upload)
             
-        return JSONResponse(content={"message": f"File processed successfully. {len(results)} records saved.", "data": results})
+        return JSONResponse(content={"message": upload_message(writer.count, writer.skipped), "data": results})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+async def upload_and_parse_excel_stream(file: UploadFile):
+    """Потоковый вариант загрузки: файл сохраняется на диск, строки разбираются и пишутся по одной."""
+    xlsx_path = await spool_upload(file)
+    try:
+        count, skipped, preview, errors = await asyncio.to_thread(ingest_upload_stream, xlsx_path)
+        if errors:
+            return JSONResponse(status_code=422, content={"errors": errors})
+        await asyncio.to_thread(refresh_after_upload)
+        # В ответ попадает только превью, полный результат доступен через /api/flights
+        return JSONResponse(content={"message": upload_message(count, skipped), "data": preview})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
+    finally:
+        os.remove(xlsx_path)
 
 @app.get("/api/flights")
-def get_flights():
-    if not os.path.exists(DATA_FILE):
-        return []
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+def get_flights(
+    request: Request,
+    atc: Optional[str] = None,
+    sid: Optional[str] = None,
+    date_from: Optional[str] = Query(None, pattern=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, pattern=DATE_PATTERN),
+    sort: Optional[str] = None,
+    direction: Optional[str] = None,
+    # Без limit (и остальных параметров) отдается весь массив, поэтому значение по умолчанию — None
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: Optional[str] = None,
+):
+    """
+    Без параметров возвращает весь массив полетов (как раньше).
+    stream=ndjson или stream=json отдает весь набор потоком прямо из хранилища (NDJSON или JSON-массив по частям).
+    С любым из остальных параметров возвращает одну страницу: {"items", "total", "next_cursor"}.
+    Фильтры atc и sid — поиск подстроки без учета регистра, date_from/date_to — даты вылета YYYY-MM-DD.
+    Сортировка: sort = date | duration | atc, direction = asc | desc.
+    Ответы кэшируются для версии данных (ETag, gzip/brotli, 304 на If-None-Match).
+    """
+    if stream is not None:
+        if stream not in STREAM_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unknown stream format: {stream}")
+        return StreamingResponse(iter_export(flight_store, stream), media_type=STREAM_FORMATS[stream])
+
+    params = (atc, sid, date_from, date_to, sort, direction, limit, cursor)
+    snapshot = repository.get()
+    if all(value is None for value in params):
+        return response_cache.respond(request, ("flights",), snapshot.data_version, lambda: snapshot.flights)
+
+    def build_page():
+        try:
+            return snapshot.index.page(
+                atc=atc, sid=sid, date_from=date_from, date_to=date_to,
+                sort=sort or "date", direction=direction or "desc",
+                limit=DEFAULT_PAGE_SIZE if limit is None else limit, cursor=cursor,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return response_cache.respond(request, ("flights",) + params, snapshot.data_version, build_page)
+
+@app.get("/api/v1/flights/{sid}/trajectory")
+def get_flight_trajectory(sid: str):
+    """Траектория полета (DEP -> точки маршрута -> ARR) в виде GeoJSON Feature с длиной в км и bbox."""
+    trajectory = repository.get().trajectories.trajectory(sid)
+    if trajectory is None:
+        raise HTTPException(status_code=404, detail=f"Flight {sid} not found")
+    return trajectory
+
+@app.get("/api/parse_cache/stats")
+def get_parse_cache_stats():
+    cache = ingest.get_parse_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
 
 @app.get("/api/flight_regions_stats")
-def get_flight_regions_stats_api():
-    return get_flight_regions_stats()
+def get_flight_regions_stats_api(request: Request):
+    snapshot = repository.get()
+    return response_cache.respond(request, ("flight_regions_stats",), snapshot.data_version, lambda: snapshot.region_stats)
 
 @app.get("/api/geo/regions")
-def get_geo_regions():
-    if not os.path.exists(GEOJSON_FILE):
+def get_geo_regions(request: Request, zoom: Optional[int] = None, tolerance: Optional[float] = None):
+    """
+    Без параметров — исходная геометрия регионов.
+    zoom (масштаб карты) или tolerance (допуск в градусах) выбирают упрощенный уровень с округленными координатами.
+    """
+    if (zoom is not None and zoom < 0) or (tolerance is not None and tolerance < 0):
+        raise HTTPException(status_code=400, detail="zoom and tolerance must be non-negative")
+    snapshot = repository.get()
+    levels = snapshot.geo_region_levels
+    if not levels:
         return JSONResponse(status_code=404, content={"error": "GeoJSON file not found."})
-    with open(GEOJSON_FILE, "r", encoding="utf-8") as f:
-        geojson_data = json.load(f)
-    
-    flight_stats = get_flight_regions_stats()
-
-    for feature in geojson_data["features"]:
-        region_name = feature["properties"]["region_name"]
-        feature["properties"]["flight_count"] = flight_stats.get(region_name, 0)
-        feature["properties"]["has_flights"] = flight_stats.get(region_name, 0) > 0
-    
-    return geojson_data
+    level = min(geometry_level_for(zoom, tolerance), len(levels) - 1)
+    return response_cache.respond(request, ("geo_regions", level), snapshot.data_version, lambda: levels[level])
+
+@app.get("/api/v1/tiles/{z}/{x}/{y}.mvt")
+def get_vector_tile(z: int, x: int, y: int):
+    """Векторный тайл (MVT) со слоями regions и flights; готовые тайлы берутся из кэша на диске."""
+    if not valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail=f"Invalid tile: {z}/{x}/{y}")
+    snapshot = repository.get()
+    data = tile_cache.get_or_render(snapshot.data_version, z, x, y, snapshot.tiles.render)
+    return Response(content=data, media_type=MVT_MEDIA_TYPE)
+
+@app.get("/api/v1/analytics/summary")
+def get_analytics_summary():
+    """Сводка для дашборда в формате DataState (см. ui/types.ts), считается инкрементально при загрузках."""
+    return repository.get().analytics.summary()
+
+@app.get("/api/v1/analytics/cube")
+def query_flight_cube(
+    group_by: Optional[str] = None,
+    center: Optional[str] = None,
+    date: Optional[str] = None,
+    hour: Optional[str] = None,
+    type: Optional[str] = None,
+    altitude_band: Optional[str] = None,
+    date_from: Optional[str] = Query(None, pattern=DATE_PATTERN),
+    date_to: Optional[str] = Query(None, pattern=DATE_PATTERN),
+):
+    """
+    Срез куба полетов. group_by — измерения через запятую (center, date, hour, type, altitude_band),
+    фильтры по измерениям — значения через запятую, например /api/v1/analytics/cube?group_by=center,hour&type=BLA.
+    """
+    values = {"center": center, "date": date, "hour": hour, "type": type, "altitude_band": altitude_band}
+    filters = {dim: value.split(",") for dim, value in values.items() if value is not None}
+    snapshot = repository.get()
+    try:
+        return snapshot.cube.query(
+            group_by=group_by.split(",") if group_by else [],
+            filters=filters, date_from=date_from, date_to=date_to,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/analytics/heatmap")
+def get_flight_heatmap(request: Request, resolution: float = 0.5, shape: str = "square", bbox: Optional[str] = None):
+    """
+    Плотность полетов по ячейкам сетки: shape = square | hex, resolution — шаг сетки в градусах,
+    bbox = min_lon,min_lat,max_lon,max_lat. Точка полета — вылет, иначе прибытие, иначе центр зоны.
+    """
+    snapshot = repository.get()
+
+    def build():
+        try:
+            return snapshot.heatmap.query(shape, resolution, parse_bbox(bbox) if bbox else None)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return response_cache.respond(request, ("heatmap", shape, resolution, bbox), snapshot.data_version, build)
+
+@app.get("/api/v1/analytics/cube/dimensions")
+def get_flight_cube_dimensions():
+    return repository.get().cube.dimensions()
+
+@app.get("/api/diagnostics/repository")
+def get_repository_diagnostics():
+    return {**repository.diagnostics(), "response_cache": response_cache.stats(), "tile_cache": tile_cache.stats(),
+            "ollama": {**ollama_client.stats(), "cache": analysis_cache.stats()}}
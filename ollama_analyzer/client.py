@@ -0,0 +1,166 @@
+"""Асинхронный клиент Ollama для эндпоинтов анализа.
+
+Запросы к REST API Ollama идут через общий httpx.AsyncClient с пулом соединений,
+поэтому генерация не блокирует цикл событий. Доступность сервиса проверяется
+не перед каждым запросом, а раз в OLLAMA_HEALTH_TTL секунд (ошибка соединения
+при генерации сразу помечает сервис недоступным). Число одновременных генераций
+ограничено семафором, длина очереди ожидающих запросов отдается в stats().
+"""
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+import httpx
+
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "gemma3:1b")
+# Таймауты в секундах: соединение, ответ Ollama (при потоковой генерации — каждый фрагмент),
+# ожидание места в очереди, проверка доступности
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 2))
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", 60))
+OLLAMA_QUEUE_TIMEOUT = float(os.environ.get("OLLAMA_QUEUE_TIMEOUT", 30))
+OLLAMA_HEALTH_TIMEOUT = float(os.environ.get("OLLAMA_HEALTH_TIMEOUT", 1))
+OLLAMA_HEALTH_TTL = float(os.environ.get("OLLAMA_HEALTH_TTL", 30))
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", 2))
+
+
+class OllamaUnavailable(Exception):
+    """Ollama недоступна, не ответила вовремя или вернула ошибку."""
+
+
+class OllamaClient:
+    def __init__(self, host=OLLAMA_HOST, model=OLLAMA_MODEL, timeout=OLLAMA_TIMEOUT,
+                 connect_timeout=OLLAMA_CONNECT_TIMEOUT, queue_timeout=OLLAMA_QUEUE_TIMEOUT,
+                 health_timeout=OLLAMA_HEALTH_TIMEOUT, health_ttl=OLLAMA_HEALTH_TTL,
+                 max_concurrency=OLLAMA_MAX_CONCURRENCY):
+        self.host = host.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.queue_timeout = queue_timeout
+        self.health_timeout = health_timeout
+        self.health_ttl = health_ttl
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._health_lock = asyncio.Lock()
+        self._healthy = None
+        self._checked_at = 0.0
+        self.waiting = 0
+        self.active = 0
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    @property
+    def client(self):
+        # Клиент создается при первом запросе внутри работающего цикла событий
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.host,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_concurrency + 2,
+                                    max_keepalive_connections=self.max_concurrency + 2),
+            )
+        return self._client
+
+    def _mark(self, healthy):
+        self._healthy = healthy
+        self._checked_at = time.monotonic()
+
+    async def healthy(self):
+        """Доступность Ollama по результату последней проверки; проверка повторяется раз в health_ttl."""
+        if self._healthy is not None and time.monotonic() - self._checked_at < self.health_ttl:
+            return self._healthy
+        async with self._health_lock:
+            # Пока одна корутина проверяла сервис, остальные ждали на блокировке
+            if self._healthy is not None and time.monotonic() - self._checked_at < self.health_ttl:
+                return self._healthy
+            try:
+                response = await self.client.get("/api/version", timeout=self.health_timeout)
+                self._mark(response.status_code == 200)
+            except httpx.HTTPError:
+                self._mark(False)
+            return self._healthy
+
+    @contextlib.asynccontextmanager
+    async def _slot(self):
+        """Место для генерации: проверка доступности, ожидание в очереди, перевод ошибок httpx в OllamaUnavailable."""
+        if not await self.healthy():
+            raise OllamaUnavailable(f"Ollama is unavailable at {self.host}")
+        self.requests += 1
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise OllamaUnavailable(f"No free Ollama slot in {self.queue_timeout}s")
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        except httpx.TimeoutException as e:
+            self.timeouts += 1
+            raise OllamaUnavailable(f"Ollama request timed out: {e!r}")
+        except httpx.TransportError as e:
+            self.failures += 1
+            self._mark(False)
+            raise OllamaUnavailable(f"Ollama connection failed: {e!r}")
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            self.failures += 1
+            raise OllamaUnavailable(f"Ollama returned an invalid response: {e!r}")
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def _payload(self, messages, model, stream):
+        return {"model": model or self.model, "messages": messages, "stream": stream}
+
+    async def chat(self, messages, model=None):
+        """Ответ модели на список сообщений. OllamaUnavailable — сервис недоступен, очередь или генерация не уложились в таймаут."""
+        async with self._slot():
+            response = await self.client.post("/api/chat", json=self._payload(messages, model, False))
+            response.raise_for_status()
+            return response.json()["message"]["content"]
+
+    async def stream_chat(self, messages, model=None):
+        """
+        Фрагменты ответа модели по мере генерации (Ollama отдает по строке JSON на фрагмент).
+        Таймаут OLLAMA_TIMEOUT действует на ожидание каждого следующего фрагмента.
+        """
+        async with self._slot():
+            async with self.client.stream("POST", "/api/chat", json=self._payload(messages, model, True)) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise ValueError(chunk["error"])
+                    content = chunk.get("message", {}).get("content")
+                    if content:
+                        yield content
+                    if chunk.get("done"):
+                        break
+
+    def stats(self):
+        return {
+            "host": self.host,
+            "model": self.model,
+            "healthy": self._healthy,
+            "health_age": time.monotonic() - self._checked_at if self._healthy is not None else None,
+            "queue_depth": self.waiting,
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
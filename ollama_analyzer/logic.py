@@ -1,7 +1,22 @@
-import ollama
+import asyncio
+import re
+import time
+from collections import deque
+
 import bleach
 from typing import Any, Dict
 
+from .client import OllamaClient
+from .prompt_builder import build_prompt
+from .result_cache import AnalysisCache, data_hash
+
+# Общий клиент Ollama: пул соединений, кэш доступности и ограничение числа генераций
+ollama_client = OllamaClient()
+# Готовые ответы LLM по (модель, тип виджета, хэш данных)
+analysis_cache = AnalysisCache()
+# Размер промпта и время генерации последних обращений к модели
+recent_calls = deque(maxlen=50)
+
 # --- Безопасность: Настройка HTML-санитайзера --- #
 ALLOWED_TAGS = ['p', 'ul', 'li', 'strong', 'em', 'b', 'i']
 
@@ -9,25 +24,86 @@ def sanitize_html(dirty_html: str) -> str:
     """Очищает HTML-строку, оставляя только разрешенные теги."""
     return bleach.clean(dirty_html, tags=ALLOWED_TAGS, strip=True)
 
+# Полный тег или комментарий; атрибуты разрешенных тегов отбрасываются, как и в sanitize_html
+_TAG = re.compile(r"<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^<>]*>", re.S)
+# Незаконченный тег, комментарий или ссылка на символ в конце буфера
+_INCOMPLETE = re.compile(r"(<!--(?:(?!-->).)*|<[/!a-zA-Z][^<>]*|<|&[#a-zA-Z0-9]{0,10})$", re.S)
+# Незаконченный фрагмент длиннее этого считается текстом, чтобы буфер не рос бесконечно
+_MAX_PENDING = 1024
+
+class StreamSanitizer:
+    """
+    Потоковая очистка HTML по тем же правилам, что sanitize_html.
+    feed() принимает фрагменты ответа модели и возвращает очищенный HTML до последней
+    безопасной границы: незаконченный тег или ссылка на символ ждут следующего фрагмента.
+    finish() отдает остаток и закрывает открытые разрешенные теги.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._open = []
+
+    def _tag(self, match):
+        closing, name = match.group(1), (match.group(2) or "").lower()
+        if name not in ALLOWED_TAGS:
+            return ""
+        if not closing:
+            self._open.append(name)
+            return f"<{name}>"
+        if name not in self._open:
+            return ""
+        closed = []
+        while self._open:
+            top = self._open.pop()
+            closed.append(f"</{top}>")
+            if top == name:
+                break
+        return "".join(closed)
+
+    def _clean(self, html):
+        parts = []
+        position = 0
+        for match in _TAG.finditer(html):
+            parts.append(sanitize_html(html[position:match.start()]))
+            parts.append(self._tag(match))
+            position = match.end()
+        parts.append(sanitize_html(html[position:]))
+        return "".join(parts)
+
+    def feed(self, fragment: str) -> str:
+        html = self._pending + fragment
+        incomplete = _INCOMPLETE.search(html)
+        cut = incomplete.start() if incomplete and len(html) - incomplete.start() <= _MAX_PENDING else len(html)
+        self._pending = html[cut:]
+        return self._clean(html[:cut])
+
+    def finish(self) -> str:
+        html = self._clean(self._pending) + "".join(f"</{name}>" for name in reversed(self._open))
+        self._pending = ""
+        self._open = []
+        return html
+
 # --- Логика для демонстрационных данных (Fallback) --- #
 
 def get_mock_analysis(widgetType: str, data: Any) -> str:
     """Возвращает демонстрационный (захардкоженный) анализ, если Ollama недоступна."""
     # Эта логика полностью повторяет то, что было в Dashboard.tsx
+    # Виджеты карты и графиков присылают списки, значения показателей берутся только из словаря
+    fields = data if isinstance(data, dict) else {}
     analysis_map = {
         'map': "<p><strong>Ключевые инсайты:</strong></p><ul><li><strong>Централизация:</strong> Москва и Санкт-Петербург остаются абсолютными лидерами, концентрируя основной объем полетов.</li><li><strong>Южный хаб:</strong> Краснодарский край демонстрирует высокую активность, вероятно, связанную с агросектором и туризмом.</li><li><strong>Дальний Восток:</strong> Самая высокая средняя длительность полетов указывает на мониторинговые миссии на больших территориях.</li></ul>",
         'timeseries': "<p><strong>Ключевые инсайты:</strong></p><ul><li><strong>Положительный тренд:</strong> Наблюдается стабильный рост числа полетов в течение месяца.</li><li><strong>Эффект выходного дня:</strong> Заметно небольшое снижение активности в субботу и воскресенье.</li></ul>",
         'hourly': "<p><strong>Ключевые инсайты:</strong></p><ul><li><strong>Деловая активность:</strong> Пик полетов приходится на рабочие часы (11:00-14:00).</li><li><strong>Ночные операции:</strong> Минимальная активность ночью говорит о преобладании дневных задач.</li></ul>",
-        'totalFlights': f"<p>Значение <strong>{data.get('totalFlights', 'N/A')}</strong> указывает на высокий уровень общей полетной активности в системе. Это свидетельствует о зрелости и широком использовании БПЛА в анализируемых регионах.</p>",
-        'avgDuration': f"<p>Средняя длительность полета в <strong>{data.get('avgFlightDuration', 'N/A')} минут</strong> говорит о том, что большинство миссий являются среднесрочными. Это типично для задач инспекции, аэрофотосъемки или мониторинга объектов.</p>",
+        'totalFlights': f"<p>Значение <strong>{fields.get('totalFlights', 'N/A')}</strong> указывает на высокий уровень общей полетной активности в системе. Это свидетельствует о зрелости и широком использовании БПЛА в анализируемых регионах.</p>",
+        'avgDuration': f"<p>Средняя длительность полета в <strong>{fields.get('avgFlightDuration', 'N/A')} минут</strong> говорит о том, что большинство миссий являются среднесрочными. Это типично для задач инспекции, аэрофотосъемки или мониторинга объектов.</p>",
         'default': "<p>Анализ для данного виджета находится в разработке.</p>"
     }
     return analysis_map.get(widgetType, analysis_map['default'])
 
 # --- Логика для взаимодействия с Ollama --- #
 
-def _create_prompt(widgetType: str, data: Any) -> str:
-    """Создает системный и пользовательский промпт для LLM."""
+def _create_prompt(widgetType: str, data: Any):
+    """Создает системный и пользовательский промпт для LLM и оценку их размера (данные сжимаются до бюджета токенов)."""
     system_prompt = (
         "Ты — эксперт-аналитик по полетным данным гражданских БПЛА. "
         "Твоя задача — предоставлять краткие, но содержательные аналитические сводки на русском языке. "
@@ -36,29 +112,127 @@ def _create_prompt(widgetType: str, data: Any) -> str:
         "Не используй markdown. Не оборачивай ответ в ```html ... ```."
     )
 
-    user_prompt = f"Проанализируй следующие данные для виджета '{widgetType}':\n\n{str(data)}"
-    
-    return system_prompt, user_prompt
+    user_prompt, prompt_stats = build_prompt(system_prompt, widgetType, data)
+
+    return system_prompt, user_prompt, prompt_stats
+
+def _report_call(widgetType: str, prompt_stats: Dict[str, Any], seconds: float, **extra) -> None:
+    call = {"widgetType": widgetType, **prompt_stats, "latency_seconds": round(seconds, 3), **extra}
+    recent_calls.append(call)
+    print(f"[Ollama Analyzer] {widgetType}: промпт ~{prompt_stats['prompt_tokens']} токенов "
+          f"(данные ~{prompt_stats['data_tokens']} из ~{prompt_stats['raw_data_tokens']}), генерация {seconds:.2f}s")
+
+async def _generate_analysis(client: OllamaClient, widgetType: str, data: Any) -> str:
+    system_prompt, user_prompt, prompt_stats = _create_prompt(widgetType, data)
+    started = time.perf_counter()
+    analysis_html = await client.chat([
+        {'role': 'system', 'content': system_prompt},
+        {'role': 'user', 'content': user_prompt},
+    ])
+    _report_call(widgetType, prompt_stats, time.perf_counter() - started)
+    return sanitize_html(analysis_html)
+
+async def _analysis_or_mock(widgetType: str, data: Any, client: OllamaClient = None, cache: AnalysisCache = None):
+    """Анализ от Ollama через кэш ответов или демонстрационные данные при ошибке: (html, fallback)."""
+    client = client or ollama_client
+    cache = cache or analysis_cache
+    # В кэш попадает только очищенный ответ модели, демонстрационные данные не кэшируются
+    key = (client.model, widgetType, data_hash(data))
 
-def get_ollama_analysis(widgetType: str, data: Any) -> str:
-    """Основная функция для получения анализа от Ollama с fallback-логикой."""
-    system_prompt, user_prompt = _create_prompt(widgetType, data)
-    
     try:
-        # Проверяем доступность сервиса Ollama
-        ollama.ps()
-
-        response = ollama.chat(
-            model='gemma3:1b', # Как и просил пользователь
-            messages=[
-                {'role': 'system', 'content': system_prompt},
-                {'role': 'user', 'content': user_prompt},
-            ]
-        )
-        analysis_html = response['message']['content']
-        return sanitize_html(analysis_html)
+        return await cache.get_or_create(key, lambda: _generate_analysis(client, widgetType, data)), False
 
     except Exception as e:
-        print(f"[Ollama Analyzer] Ошибка при обращении к Ollama: {e}")
+        print(f"[Ollama Analyzer] Ошибка при обращении к Ollama ({widgetType}): {e}")
         print("[Ollama Analyzer] Возвращаю демонстрационные данные.")
-        return get_mock_analysis(widgetType, data)
+        return get_mock_analysis(widgetType, data), True
+
+async def get_ollama_analysis(widgetType: str, data: Any, client: OllamaClient = None, cache: AnalysisCache = None) -> str:
+    """Основная функция для получения анализа от Ollama с кэшем ответов и fallback-логикой."""
+    analysis_html, _ = await _analysis_or_mock(widgetType, data, client, cache)
+    return analysis_html
+
+async def analyze_batch(widgets, client: OllamaClient = None, cache: AnalysisCache = None):
+    """
+    Анализ нескольких виджетов [(widgetType, data)]: генерации выполняются одновременно,
+    результаты отдаются асинхронным генератором в порядке готовности:
+    {"index", "widgetType", "analysis", "fallback"}.
+    Ошибка одного виджета заменяет демонстрационными данными только его ответ.
+    """
+    client = client or ollama_client
+    pending = asyncio.Queue()
+    for item in enumerate(widgets):
+        pending.put_nowait(item)
+    results = asyncio.Queue()
+
+    async def worker():
+        # Виджеты пакета разбирают столько обработчиков, сколько у клиента мест для генерации:
+        # в очереди клиента стоят только взятые в работу виджеты, и ожидание остальных
+        # не засчитывается в OLLAMA_QUEUE_TIMEOUT
+        while not pending.empty():
+            index, (widgetType, data) = pending.get_nowait()
+            analysis_html, fallback = await _analysis_or_mock(widgetType, data, client, cache)
+            results.put_nowait({"index": index, "widgetType": widgetType, "analysis": analysis_html, "fallback": fallback})
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(len(widgets), client.max_concurrency))]
+    try:
+        for _ in range(len(widgets)):
+            yield await results.get()
+    finally:
+        # Клиент отключился: ожидание прекращается, начатые генерации дописываются в кэш
+        for task in workers:
+            task.cancel()
+
+async def stream_ollama_analysis(widgetType: str, data: Any, client: OllamaClient = None, cache: AnalysisCache = None):
+    """
+    Потоковый анализ: асинхронный генератор событий (тип, данные) для SSE.
+    "token" — очередной очищенный фрагмент HTML, "done" — конец ответа
+    (cached — ответ из кэша, fallback — демонстрационные данные, error — генерация прервалась).
+    Полный ответ сохраняется в тот же кэш, что и у get_ollama_analysis.
+    """
+    client = client or ollama_client
+    cache = cache or analysis_cache
+    key = (client.model, widgetType, data_hash(data))
+    cached = cache.get(key)
+    if cached is not None:
+        yield "token", {"html": cached}
+        yield "done", {"cached": True, "fallback": False}
+        return
+
+    system_prompt, user_prompt, prompt_stats = _create_prompt(widgetType, data)
+    sanitizer = StreamSanitizer()
+    parts = []
+    started = time.perf_counter()
+    first_token = None
+    try:
+        async for fragment in client.stream_chat([
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt},
+        ]):
+            html = sanitizer.feed(fragment)
+            if html:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(html)
+                yield "token", {"html": html}
+    except Exception as e:
+        print(f"[Ollama Analyzer] Ошибка при потоковом обращении к Ollama: {e}")
+        if not parts:
+            print("[Ollama Analyzer] Возвращаю демонстрационные данные.")
+            yield "token", {"html": get_mock_analysis(widgetType, data)}
+            yield "done", {"cached": False, "fallback": True}
+            return
+        tail = sanitizer.finish()
+        if tail:
+            yield "token", {"html": tail}
+        yield "done", {"cached": False, "fallback": False, "error": str(e)}
+        return
+
+    tail = sanitizer.finish()
+    if tail:
+        parts.append(tail)
+        yield "token", {"html": tail}
+    cache.put(key, "".join(parts))
+    _report_call(widgetType, prompt_stats, time.perf_counter() - started, first_token_seconds=first_token)
+    yield "done", {"cached": False, "fallback": False, "first_token_seconds": first_token,
+                   "prompt_tokens": prompt_stats["prompt_tokens"]}
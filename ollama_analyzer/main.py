@@ -1,6 +1,10 @@
+import json
+import time
+
 from fastapi import APIRouter, HTTPException
-from .models import AnalyzeRequest, AnalyzeResponse
-from .logic import get_ollama_analysis
+from fastapi.responses import StreamingResponse
+from .models import AnalyzeBatchRequest, AnalyzeRequest, AnalyzeResponse
+from .logic import analysis_cache, analyze_batch, get_ollama_analysis, ollama_client, recent_calls, stream_ollama_analysis
 
 router = APIRouter(
     prefix="/api/v1/ai",
@@ -17,8 +21,55 @@ async def analyze_data(request: AnalyzeRequest):
     - Возвращает HTML-ответ с результатом анализа.
     """
     try:
-        analysis_result = get_ollama_analysis(request.widgetType, request.data)
+        analysis_result = await get_ollama_analysis(request.widgetType, request.data)
         return AnalyzeResponse(analysis=analysis_result)
     except Exception as e:
         # Общая обработка ошибок на случай, если что-то пойдет не так внутри логики
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/analyze/stream")
+async def analyze_data_stream(request: AnalyzeRequest):
+    """
+    Потоковый вариант /analyze: Server-Sent Events по мере генерации.
+    - `event: token`, `data: {"html": ...}` — очередной фрагмент очищенного HTML (фрагменты склеиваются по порядку).
+    - `event: done`, `data: {"cached", "fallback", ...}` — конец ответа.
+    """
+    async def events():
+        async for event, payload in stream_ollama_analysis(request.widgetType, request.data):
+            yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post("/analyze/batch")
+async def analyze_data_batch(request: AnalyzeBatchRequest):
+    """
+    Анализ нескольких виджетов одним запросом. Генерации выполняются одновременно
+    (в пределах OLLAMA_MAX_CONCURRENCY), результаты отдаются Server-Sent Events по мере готовности:
+    - `event: result`, `data: {"index", "widgetType", "analysis", "fallback"}` — ответ для виджета
+      с номером `index` в запросе (`fallback` — демонстрационные данные вместо ответа модели).
+    - `event: done`, `data: {"count", "fallbacks", "seconds"}` — все виджеты обработаны.
+    """
+    async def events():
+        started = time.perf_counter()
+        fallbacks = 0
+        async for result in analyze_batch([(widget.widgetType, widget.data) for widget in request.widgets]):
+            fallbacks += result["fallback"]
+            yield f"event: result\ndata: {json.dumps(result, ensure_ascii=False)}\n\n"
+        summary = {"count": len(request.widgets), "fallbacks": fallbacks, "seconds": round(time.perf_counter() - started, 3)}
+        yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/status")
+async def get_ai_status():
+    """
+    Состояние клиента Ollama (доступность, длина очереди, активные генерации, ошибки), кэша ответов
+    и последние обращения к модели: оценка размера промпта в токенах и время генерации.
+    """
+    return {**ollama_client.stats(), "cache": analysis_cache.stats(), "recent_calls": list(recent_calls)}
+
+@router.on_event("shutdown")
+async def close_ollama_client():
+    await ollama_client.aclose()
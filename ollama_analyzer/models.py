@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import Any, Dict
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List
+
+# Наибольшее число виджетов в одном пакетном запросе
+MAX_BATCH_WIDGETS = 20
 
 class AnalyzeRequest(BaseModel):
     """
@@ -14,3 +17,9 @@ class AnalyzeResponse(BaseModel):
     Модель ответа с результатом анализа.
     """
     analysis: str
+
+class AnalyzeBatchRequest(BaseModel):
+    """
+    Модель пакетного запроса на анализ нескольких виджетов.
+    """
+    widgets: List[AnalyzeRequest] = Field(..., min_length=1, max_length=MAX_BATCH_WIDGETS)
@@ -0,0 +1,146 @@
+"""Сжатие данных виджета в промпт с бюджетом токенов.
+
+Данные выводятся компактным текстом вместо str(data): скаляры — строками «путь: значение»,
+списки объектов — таблицами «колонка|колонка» с заголовком один раз. Длинные таблицы
+сокращаются до топ-k строк по числу полетов (временные ряды — до усредненных интервалов),
+для числовых колонок добавляются квантили по всем строкам. Лимиты строк уменьшаются,
+пока оценка размера промпта не уложится в PROMPT_TOKEN_BUDGET.
+"""
+import json
+import math
+import os
+import statistics
+
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 1500))
+# Грубая оценка для русского текста с числами: токен — около трех символов
+CHARS_PER_TOKEN = 3.0
+# Уровни сжатия: (строк таблицы, точек временного ряда, символов строки)
+COMPACTION_LEVELS = [(50, 60, 200), (20, 30, 120), (10, 15, 80), (5, 8, 40), (3, 4, 20)]
+TIME_KEYS = ("date", "time", "timestamp", "hour", "day", "month", "period")
+RANK_KEYS = ("flights", "count", "total", "value", "flightDensity")
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _format(value, max_chars):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+    text = str(value).replace("|", "/").replace("\n", " ")
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+def _quantiles(values):
+    values = sorted(values)
+    if len(values) > 1:
+        p25, median, p75 = statistics.quantiles(values, n=4, method="inclusive")
+    else:
+        p25 = median = p75 = values[0]
+    parts = [("min", values[0]), ("p25", p25), ("med", median), ("p75", p75), ("max", values[-1]),
+             ("mean", statistics.fmean(values)), ("sum", math.fsum(values))]
+    return " ".join(f"{name}={value:.4g}" for name, value in parts)
+
+
+def _buckets(count, size):
+    """Границы count элементов, разбитых на size почти равных интервалов."""
+    edges = [round(i * count / size) for i in range(size + 1)]
+    return [(start, end) for start, end in zip(edges, edges[1:]) if end > start]
+
+
+def _table(path, rows, level):
+    max_rows, max_points, max_chars = level
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    numeric = [column for column in columns
+               if any(_is_number(row.get(column)) for row in rows)
+               and all(row.get(column) is None or _is_number(row.get(column)) for row in rows)]
+    time_key = next((column for column in columns if column in TIME_KEYS), None)
+    note = ""
+    shown = rows
+    if time_key and len(rows) > max_points:
+        # Временной ряд: порядок сохраняется, соседние точки усредняются по интервалам
+        shown = []
+        for start, end in _buckets(len(rows), max_points):
+            bucket = rows[start:end]
+            row = {column: bucket[0].get(column) for column in columns}
+            row[time_key] = f"{bucket[0].get(time_key)}..{bucket[-1].get(time_key)}" if end - start > 1 else bucket[0].get(time_key)
+            for column in numeric:
+                values = [r[column] for r in bucket if r.get(column) is not None]
+                row[column] = statistics.fmean(values) if values else None
+            shown.append(row)
+        note = f", усреднено до {len(shown)} интервалов"
+    elif len(rows) > max_rows:
+        rank = next((column for column in RANK_KEYS if column in numeric), numeric[0] if numeric else None)
+        if rank is not None:
+            shown = sorted(rows, key=lambda row: row.get(rank) if row.get(rank) is not None else -math.inf, reverse=True)[:max_rows]
+            note = f", показаны топ-{max_rows} по {rank}"
+        else:
+            shown = rows[:max_rows]
+            note = f", показаны первые {max_rows}"
+
+    lines = [f"{path}: таблица, {len(rows)} строк{note}", "|".join(columns)]
+    lines += ["|".join(_format(row.get(column), max_chars) for column in columns) for row in shown]
+    if shown is not rows:
+        for column in numeric:
+            values = [row[column] for row in rows if row.get(column) is not None]
+            if values:
+                lines.append(f"{path}.{column} (все {len(rows)} строк): {_quantiles(values)}")
+    return lines
+
+
+def _render(value, path, level):
+    max_rows, max_points, max_chars = level
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            lines += _render(item, f"{path}.{key}" if path else str(key), level)
+        return lines
+    name = path or "data"
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value):
+            return _table(name, value, level)
+        if value and all(_is_number(item) for item in value):
+            if len(value) <= max_points:
+                return [f"{name}: " + ",".join(_format(item, max_chars) for item in value)]
+            means = [statistics.fmean(value[start:end]) for start, end in _buckets(len(value), max_points)]
+            return [f"{name}: {len(value)} значений, усреднено до {len(means)}: " + ",".join(_format(item, max_chars) for item in means),
+                    f"{name}: {_quantiles(value)}"]
+        shown = [_format(item, max_chars) for item in value[:max_rows]]
+        more = f" … и еще {len(value) - max_rows}" if len(value) > max_rows else ""
+        return [f"{name}: [" + "; ".join(shown) + "]" + more]
+    return [f"{name}: {_format(value, max_chars)}"]
+
+
+def compact_data(data, budget=PROMPT_TOKEN_BUDGET):
+    """Текстовое представление data в пределах budget токенов (по оценке) и номер примененного уровня сжатия."""
+    for number, level in enumerate(COMPACTION_LEVELS):
+        text = "\n".join(_render(data, "", level))
+        if estimate_tokens(text) <= budget:
+            return text, number
+    # Даже самый сильный уровень не уложился — текст обрезается
+    max_chars = int(budget * CHARS_PER_TOKEN)
+    return text[:max_chars - 1] + "…", len(COMPACTION_LEVELS)
+
+
+def build_prompt(system_prompt, widgetType, data, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Пользовательский промпт со сжатыми данными и его размеры:
+    (user_prompt, {"prompt_tokens", "data_tokens", "raw_data_tokens", "budget", "level"}).
+    """
+    text, level = compact_data(data, budget)
+    user_prompt = f"Проанализируй следующие данные для виджета '{widgetType}':\n\n{text}"
+    return user_prompt, {
+        "prompt_tokens": estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+        "data_tokens": estimate_tokens(text),
+        "raw_data_tokens": estimate_tokens(str(data)),
+        "budget": budget,
+        "level": level,
+    }
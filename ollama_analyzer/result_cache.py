@@ -0,0 +1,88 @@
+"""Кэш готовых ответов LLM для POST /api/v1/ai/analyze.
+
+Ключ — модель, тип виджета и SHA-256 канонического JSON данных (ключи отсортированы),
+значение — HTML уже после sanitize_html. Записи живут OLLAMA_CACHE_TTL секунд,
+при переполнении вытесняются давно не запрошенные. Одинаковые запросы, пришедшие
+во время генерации, ждут ту же задачу, а не запускают новую.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+OLLAMA_CACHE_TTL = float(os.environ.get("OLLAMA_CACHE_TTL", 600))
+OLLAMA_CACHE_ENTRIES = int(os.environ.get("OLLAMA_CACHE_ENTRIES", 256))
+
+
+def data_hash(data):
+    """SHA-256 канонического JSON: одинаковые данные с разным порядком ключей дают один хэш."""
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, max_entries=OLLAMA_CACHE_ENTRIES, ttl=OLLAMA_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if time.monotonic() >= expires:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self.put(key, task.result())
+
+    async def get_or_create(self, key, build):
+        """Значение из кэша или результат build(); одновременные вызовы с одним ключом ждут одну генерацию."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            # Генерация идет отдельной задачей: отключение первого клиента не отменяет ее для остальных
+            task = asyncio.ensure_future(build())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.joined += 1
+        return await asyncio.shield(task)
+
+    def invalidate(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+        }
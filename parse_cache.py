@@ -0,0 +1,107 @@
+"""Персистентный кэш результатов разбора телеграмм.
+
+Ключ — SHA-256 от сырых строк SHR/DEP/ARR и версии парсера, значение — `parsed_data`
+в виде JSON. Хранится в SQLite, размер ограничен вытеснением давно не использованных записей.
+При смене PARSER_VERSION записи старых версий удаляются автоматически.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from parsing import PARSER_VERSION
+
+PARSE_CACHE_MAX_ENTRIES = int(os.environ.get("PARSE_CACHE_MAX_ENTRIES", 500000))
+
+# SQLite ограничивает число параметров в одном запросе
+_SQL_BATCH_SIZE = 500
+
+
+class ParseCache:
+    def __init__(self, path, max_entries=PARSE_CACHE_MAX_ENTRIES, version=PARSER_VERSION):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, version TEXT NOT NULL, value TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        # Записи, созданные другой версией парсера, больше не валидны
+        self._conn.execute("DELETE FROM entries WHERE version != ?", (version,))
+        self._conn.commit()
+
+    def make_key(self, shr_raw, dep_raw, arr_raw):
+        payload = json.dumps([self.version, shr_raw, dep_raw, arr_raw], ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Возвращает {key: parsed_data JSON} для найденных ключей и обновляет время использования."""
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH_SIZE):
+                batch = keys[i:i + _SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+                self._conn.execute(
+                    f"UPDATE entries SET last_used = ? WHERE key IN ({placeholders})", [now, *batch]
+                )
+            self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """Сохраняет {key: parsed_data JSON} и вытесняет самые старые записи сверх лимита."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, version, value, last_used) VALUES (?, ?, ?, ?)",
+                [(key, self.version, value, now) for key, value in items.items()],
+            )
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY last_used LIMIT ?)", (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def record(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            entries = self._count()
+            total = self.hits + self.misses
+            return {
+                "parser_version": self.version,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,5 +1,13 @@
+import os
 import re
 from datetime import datetime
+from parsing_fast import parse_shr_fast
+
+# Движок парсинга SHR: "fast" (parsing_fast.py) или "legacy" (функции ниже)
+PARSER_ENGINE = os.environ.get("SHR_PARSER_ENGINE", "fast")
+# Версия формата разбора. Увеличивать при любом изменении результата парсинга:
+# от нее зависит ключ в кэше разбора (parse_cache.py)
+PARSER_VERSION = "1"
 
 def parse_coordinates(coord_str):
     if not isinstance(coord_str, str):
@@ -200,7 +208,15 @@ def parse_field_18(field_18_string):
             
     return parsed_info
 
-def parse_shr(shr_string):
+def parse_shr(shr_string, engine=None):
+    engine = engine or PARSER_ENGINE
+    if engine == "fast":
+        return parse_shr_fast(shr_string)
+    if engine == "legacy":
+        return parse_shr_legacy(shr_string)
+    raise ValueError(f"Unknown SHR parser engine: {engine}")
+
+def parse_shr_legacy(shr_string):
     if not isinstance(shr_string, str) or not shr_string.startswith('(SHR'):
         return None
 
@@ -0,0 +1,286 @@
+"""Fast SHR telegram parser engine.
+
+Produces exactly the same structures as the legacy functions in `parsing.py`,
+but every pattern is compiled once at import time, the telegram is split into
+fields only once and each coordinate token is converted a single time.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+
+FIELD_18_KEYS = ['DEP', 'DEST', 'DOF', 'EET', 'OPR', 'REG', 'STS', 'TYP', 'RMK', 'SID', 'PERM']
+
+# --- Precompiled patterns --- #
+_SHR_HEADER = re.compile(r'SHR-(.*)')
+_FIELD_13 = re.compile(r'(ZZZZ|\w{4})(\d{4})')
+_FIELD_16 = re.compile(r'(ZZZZ|\w{4})(\d{4})(?:\s+((?:ZZZZ|\w{4})(?:\s+(?:ZZZZ|\w{4}))*))?')
+_AERODROME = re.compile(r'(ZZZZ|\w{4})')
+# First occurrence of any "KEY/" (no word boundary, same as str.find in the legacy engine)
+_FIELD_18_START = re.compile('(?:' + '|'.join(FIELD_18_KEYS) + ')/')
+_FIELD_18_KEY = re.compile(r'\b(' + '|'.join(FIELD_18_KEYS) + r')\/')
+
+_COORD_SHORT = re.compile(r'(\d{4})([NS])(\d{5})([EW])')
+_COORD_LONG = re.compile(r'(\d{2})(\d{2})(\d{2})([NS])(\d{3})(\d{2})(\d{2})([EW])')
+# Same language and alternative order as r'\d{4}[NS]\d{5}[EW]|\d{6}[NS]\d{7}[EW]'
+_COORD_TOKEN = re.compile(r'\d{4}[NS]\d{5}[EW]|\d{6}[NS]\d{7}[EW]')
+
+_TYP = re.compile(r'(\d*)(\w+)')
+_REG_SPLIT = re.compile(r'[\,\s]+\s*')
+_PHONE = re.compile(r'\+?\d[\d\s\-()]{9,}\d')
+_PHONE_SEPARATORS = re.compile(r'[\s\-()]+')
+
+_ALTITUDE = re.compile(r'M(\d{4})/M(\d{4})')
+_ZONA_RADIUS = re.compile(r'R([\d,]+)\s+(.*)')
+
+_RMK_MCHS = re.compile(r'М4С')
+_RMK_4_START = re.compile(r'\b4([А-Яа-яЁё])')
+_RMK_4_INSIDE = re.compile(r'([А-Яа-яЁё])4([А-Яа-яЁё])')
+_RMK_4_END = re.compile(r'([А-Яа-яЁё])4\b')
+_RMK_OPERATOR = re.compile(r'(ОПЕРАТОР БВС|ОПЕРАТОР)\s*([^+\n\r]+)', re.IGNORECASE)
+_RMK_MODEL = re.compile(r'БВС\s+(?:МОДЕЛЬ\s+)?([A-Z0-9][A-Z0-9\s\-\.]*?)(?=\s+[А-ЯЁа-яё]|\s+\+?\d{10,}|(?:\s\d{4}[NS])|$)', re.IGNORECASE)
+_RMK_ZONE = re.compile(r'\b(MR\d+|WR\d+|ULR\d+)\b')
+_RMK_PERMISSION = re.compile(r'РАЗРЕШЕНИЕ\s+([\w\s\-.,/]+(?:\sОТ\s\d{2}\.\d{2}\.\d{4})?)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=65536)
+def _coordinates_tuple(coord_str):
+    # Returns (lat, lon) or None; cached because the same points repeat across telegrams
+    match = _COORD_SHORT.fullmatch(coord_str)
+    if match:
+        lat_str, lat_dir, lon_str, lon_dir = match.groups()
+        lat = int(lat_str[:2]) + int(lat_str[2:]) / 60
+        if lat_dir == 'S':
+            lat = -lat
+        lon = int(lon_str[:3]) + int(lon_str[3:]) / 60
+        if lon_dir == 'W':
+            lon = -lon
+        return lat, lon
+
+    match = _COORD_LONG.fullmatch(coord_str)
+    if match:
+        lat_deg, lat_min, lat_sec, lat_dir, lon_deg, lon_min, lon_sec, lon_dir = match.groups()
+        lat = int(lat_deg) + int(lat_min) / 60 + int(lat_sec) / 3600
+        lon = int(lon_deg) + int(lon_min) / 60 + int(lon_sec) / 3600
+        if lat_dir == 'S': lat = -lat
+        if lon_dir == 'W': lon = -lon
+        return lat, lon
+
+    return None
+
+
+def parse_coordinates(coord_str):
+    if not isinstance(coord_str, str):
+        return None
+    coords = _coordinates_tuple(coord_str.replace(" ", ""))
+    if coords is None:
+        return None
+    return {"latitude": coords[0], "longitude": coords[1]}
+
+
+def _find_coordinates(text):
+    # Every token found by _COORD_TOKEN is a valid coordinate, so one conversion is enough
+    result = []
+    for token in _COORD_TOKEN.findall(text):
+        coords = _coordinates_tuple(token)
+        if coords is not None:
+            result.append({"latitude": coords[0], "longitude": coords[1]})
+    return result
+
+
+@lru_cache(maxsize=4096)
+def _format_date(value):
+    # DOF/ADD values repeat a lot within one export, strptime is the expensive part
+    try:
+        return datetime.strptime(value, '%y%m%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return value
+
+
+def parse_typ(typ_str):
+    if not isinstance(typ_str, str):
+        return {"raw": typ_str}
+    match = _TYP.match(typ_str)
+    if match:
+        count = int(match.group(1)) if match.group(1) else 1
+        return {"count": count, "type": match.group(2)}
+    return {"raw": typ_str}
+
+
+def parse_rmk(rmk_str):
+    if not rmk_str:
+        return {}
+
+    rmk_str_processed = rmk_str
+    if '4' in rmk_str_processed:
+        rmk_str_processed = _RMK_MCHS.sub('МЧС', rmk_str_processed)
+        rmk_str_processed = _RMK_4_START.sub(r'Ч\1', rmk_str_processed)
+        rmk_str_processed = _RMK_4_INSIDE.sub(r'\1Ч\2', rmk_str_processed)
+        rmk_str_processed = _RMK_4_END.sub(r'\1Ч', rmk_str_processed)
+    if 'BWS' in rmk_str_processed:
+        rmk_str_processed = rmk_str_processed.replace('BWS', 'БВС')
+
+    parsed_rmk = {"raw": rmk_str_processed}
+
+    phones_cleaned = [_PHONE_SEPARATORS.sub('', phone) for phone in _PHONE.findall(rmk_str_processed)]
+    if phones_cleaned:
+        parsed_rmk['телефоны'] = phones_cleaned
+
+    operator_match = _RMK_OPERATOR.search(rmk_str_processed)
+    if operator_match:
+        parsed_rmk['оператор'] = operator_match.group(2).strip()
+
+    model_match = _RMK_MODEL.search(rmk_str_processed)
+    if model_match:
+        parsed_rmk['модель_бвс'] = model_match.group(1).strip()
+
+    coords_parsed = _find_coordinates(rmk_str_processed)
+    if coords_parsed:
+        parsed_rmk['координаты'] = coords_parsed
+
+    zone_names = _RMK_ZONE.findall(rmk_str_processed)
+    if zone_names:
+        parsed_rmk['названия_зон'] = list(set(zone_names))
+
+    permission_match = _RMK_PERMISSION.search(rmk_str_processed)
+    if permission_match:
+        parsed_rmk['разрешение'] = permission_match.group(1).strip()
+
+    return parsed_rmk
+
+
+def parse_route(route_str):
+    if not isinstance(route_str, str):
+        return {"raw": route_str}
+
+    parts = route_str.split('/ZONA')
+    main_part = parts[0].strip()
+    zona_part = parts[1].strip() if len(parts) > 1 else None
+
+    altitude_range = None
+    alt_match = _ALTITUDE.search(main_part)
+    if alt_match:
+        altitude_range = {"min_m": int(alt_match.group(1)), "max_m": int(alt_match.group(2))}
+
+    waypoints_parsed = _find_coordinates(main_part)
+
+    zona_info = None
+    if zona_part:
+        zona_part = zona_part.strip('/')
+        if zona_part.startswith('R'):
+            radius_match = _ZONA_RADIUS.match(zona_part)
+            if radius_match:
+                center_coords = parse_coordinates(radius_match.group(2))
+                zona_info = {"type": "radius", "radius_km": float(radius_match.group(1).replace(',', '.')), "center": center_coords}
+        else:
+            coords = _find_coordinates(zona_part)
+            if coords:
+                zona_info = {"type": "polygon", "coordinates": coords}
+            else:
+                zona_info = {"type": "name", "name": zona_part}
+
+    return {"altitude": altitude_range, "zona": zona_info, "waypoints": waypoints_parsed, "raw": route_str}
+
+
+def parse_field_18(field_18_string):
+    if not field_18_string:
+        return {}
+
+    matches = list(_FIELD_18_KEY.finditer(field_18_string))
+    if not matches:
+        return {'raw': field_18_string}
+
+    parsed_info = {}
+    for i, match in enumerate(matches):
+        key = match.group(1)
+        value_end = matches[i+1].start() if i + 1 < len(matches) else len(field_18_string)
+        value = field_18_string[match.end():value_end].strip()
+
+        if key == 'TYP':
+            parsed_info[key] = parse_typ(value)
+        elif key == 'DOF':
+            parsed_info[key] = _format_date(value)
+        elif key == 'DEP' or key == 'DEST':
+            parsed_info[key] = {"raw": value, "coordinates": parse_coordinates(value)}
+        elif key == 'RMK':
+            phones_from_opr = parsed_info.get('RMK', {}).get('телефоны', [])
+            parsed_rmk = parse_rmk(value)
+            if phones_from_opr:
+                parsed_rmk['телефоны'] = sorted(list(set(parsed_rmk.get('телефоны', []) + phones_from_opr)))
+            parsed_info[key] = parsed_rmk
+        elif key == 'REG':
+            parsed_info[key] = [v.strip() for v in _REG_SPLIT.split(value) if v.strip()]
+        elif key == 'OPR':
+            operator_name = value.replace('\n', ' ')
+            phone_numbers_in_opr_raw = _PHONE.findall(operator_name)
+
+            if phone_numbers_in_opr_raw:
+                for raw_phone in phone_numbers_in_opr_raw:
+                    operator_name = re.sub(re.escape(raw_phone) + r'\s*', '', operator_name).strip()
+
+                if 'RMK' not in parsed_info:
+                    parsed_info['RMK'] = {'raw': ''}
+                if 'телефоны' not in parsed_info['RMK']:
+                    parsed_info['RMK']['телефоны'] = []
+                parsed_info['RMK']['телефоны'].extend(_PHONE_SEPARATORS.sub('', phone) for phone in phone_numbers_in_opr_raw)
+
+            parsed_info[key] = operator_name.strip()
+        else:
+            parsed_info[key] = value
+
+    return parsed_info
+
+
+def parse_shr_fast(shr_string):
+    if not isinstance(shr_string, str) or not shr_string.startswith('(SHR'):
+        return None
+
+    body = shr_string.strip()[1:-1]
+    parts = body.split('\n-')
+    # Offset of every part inside `body`, used instead of re-joining the tail for Field 18
+    offsets = [0] * len(parts)
+    for i in range(1, len(parts)):
+        offsets[i] = offsets[i-1] + len(parts[i-1]) + 2
+
+    parsed_data = {}
+
+    match = _SHR_HEADER.match(parts[0])
+    if match:
+        parsed_data['Тип сообщения'] = 'SHR'
+        parsed_data['Опознавательный индекс'] = match.group(1).strip()
+
+    # Field 13: Aerodrome and time of departure
+    if len(parts) > 1:
+        aerodrome_time_str = parts[1].strip()
+        field_13_match = _FIELD_13.match(aerodrome_time_str)
+        if field_13_match:
+            parsed_data['Аэродром вылета'] = field_13_match.group(1)
+            parsed_data['Время вылета'] = field_13_match.group(2)
+        else:
+            parsed_data['Аэродром и время вылета'] = aerodrome_time_str
+
+    # Field 15: Route
+    if len(parts) > 2:
+        parsed_data['Маршрут'] = parse_route(parts[2].strip())
+
+    # Field 16: Destination aerodrome, time and alternates
+    other_info_start_index = 3
+    if len(parts) > 3:
+        field_16_match = _FIELD_16.match(parts[3].strip())
+        if field_16_match:
+            parsed_data['Аэродром назначения'] = field_16_match.group(1)
+            parsed_data['Время назначения'] = field_16_match.group(2)
+            if field_16_match.group(3):
+                alt_aerodromes = _AERODROME.findall(field_16_match.group(3))
+                if alt_aerodromes:
+                    parsed_data['Запасные аэродромы'] = alt_aerodromes
+            other_info_start_index = 4
+
+    # Field 18: Other Information, starts at the first "KEY/" after the preceding fields
+    if len(parts) >= other_info_start_index:
+        start = offsets[other_info_start_index-1]
+        key_match = _FIELD_18_START.search(body, start)
+        if key_match:
+            start = key_match.start()
+        parsed_data['Прочая информация'] = parse_field_18(body[start:])
+
+    return parsed_data
@@ -0,0 +1,106 @@
+"""Пакетный разбор колонок DEP/ARR и расчет длительности полетов.
+
+Телеграммы стандартного вида разбираются векторными строковыми операциями pandas,
+длительность считается одним вычитанием datetime64. Все остальные строки
+разбираются скалярными функциями из `parsing.py`, поэтому результат совпадает
+с построчным разбором.
+"""
+import numpy as np
+import pandas as pd
+
+from parsing import parse_dep_arr, calculate_duration
+
+# Стандартная телеграмма IDEP/IARR: строки разделены '\n', ключ и значение — одним пробелом
+_SIMPLE_DEP_ARR = (
+    r'\A-TITLE [^\s]+\n'
+    r'-SID (?P<sid>[^\s]+)\n'
+    r'-AD[DA] (?P<date>[0-9]{6})\n'
+    r'-AT[DA] (?P<time>[0-9]{4})\n'
+    r'-AD(?:EP|ARR) [^\s]+\n'
+    r'-AD(?:EP|ARR)Z (?P<lat_deg>[0-9]{2})(?P<lat_min>[0-9]{2})(?P<lat_dir>[NS])'
+    r'(?P<lon_deg>[0-9]{3})(?P<lon_min>[0-9]{2})(?P<lon_dir>[EW])'
+    r'(?:\n-PAP [^\s]+)?'
+    r'(?:\n-REG (?P<reg>[^\s,]+))?\Z'
+)
+
+
+def _to_float(column):
+    return column.astype(object).astype("float64")
+
+
+def _extract_simple(series):
+    """Разбирает стандартные телеграммы. Возвращает DataFrame с колонкой `simple` и полями."""
+    values = pd.Series(series, dtype=object).reset_index(drop=True)
+    is_str = values.map(lambda v: isinstance(v, str)).astype(bool)
+
+    frame = pd.DataFrame(index=values.index)
+    frame["is_str"] = is_str
+    extracted = values[is_str].astype(str).str.extract(_SIMPLE_DEP_ARR)
+    frame = frame.join(extracted)
+
+    dates = pd.to_datetime(frame["date"], format="%y%m%d", errors="coerce")
+    frame["simple"] = frame["sid"].notna() & dates.notna()
+    frame["date_str"] = dates.dt.strftime("%Y-%m-%d")
+
+    # Все группы состоят только из цифр [0-9], поэтому прямое приведение к float безопасно
+    time_value = _to_float(frame["time"])
+    hours = time_value // 100
+    minutes = time_value % 100
+    frame["time_ok"] = frame["simple"] & (hours < 24) & (minutes < 60)
+    frame["datetime"] = dates + pd.to_timedelta(hours * 60 + minutes, unit="min")
+
+    lat = _to_float(frame["lat_deg"]) + _to_float(frame["lat_min"]) / 60
+    lon = _to_float(frame["lon_deg"]) + _to_float(frame["lon_min"]) / 60
+    frame["lat"] = lat.where(frame["lat_dir"] != "S", -lat)
+    frame["lon"] = lon.where(frame["lon_dir"] != "W", -lon)
+    return values, frame
+
+
+def _build_dicts(values, frame):
+    """Собирает словари в том же формате и порядке ключей, что и parse_dep_arr."""
+    values = values.tolist()
+    result = [None] * len(values)
+    simple = frame["simple"].tolist()
+    is_str = frame["is_str"].tolist()
+    columns = zip(frame["sid"].tolist(), frame["date_str"].tolist(), frame["time"].tolist(),
+                  frame["lat"].tolist(), frame["lon"].tolist(), frame["reg"].tolist())
+    for i, (sid, date, time, lat, lon, reg) in enumerate(columns):
+        if simple[i]:
+            parsed = {"sid": sid, "date": date, "time": time, "coordinates": {"latitude": lat, "longitude": lon}}
+            if isinstance(reg, str):
+                parsed["registration"] = [reg]
+            result[i] = parsed
+        elif is_str[i]:
+            result[i] = parse_dep_arr(values[i])
+    return result
+
+
+def parse_dep_arr_series(series):
+    """Пакетный аналог parse_dep_arr: возвращает список словарей (или None) в порядке строк."""
+    values, frame = _extract_simple(series)
+    return _build_dicts(values, frame)
+
+
+def parse_dep_arr_columns(dep_series, arr_series):
+    """
+    Разбирает колонки DEP и ARR и считает длительность полета.
+    Возвращает кортеж списков (dep_parsed, arr_parsed, durations), выровненных по строкам.
+    Значения совпадают с parse_dep_arr и calculate_duration, включая None для некорректных строк.
+    """
+    dep_values, dep_frame = _extract_simple(dep_series)
+    arr_values, arr_frame = _extract_simple(arr_series)
+    dep_parsed = _build_dicts(dep_values, dep_frame)
+    arr_parsed = _build_dicts(arr_values, arr_frame)
+
+    both_ok = (dep_frame["time_ok"] & arr_frame["time_ok"]).to_numpy()
+    delta = (arr_frame["datetime"] - dep_frame["datetime"]).to_numpy()
+    delta = np.where(both_ok, delta, np.timedelta64(0, "m"))
+    minutes = (delta // np.timedelta64(1, "m")).tolist()
+
+    durations = [None] * len(dep_parsed)
+    for i in range(len(durations)):
+        if both_ok[i]:
+            durations[i] = int(minutes[i])
+        else:
+            durations[i] = calculate_duration(dep_parsed[i], arr_parsed[i])
+    return dep_parsed, arr_parsed, durations
@@ -0,0 +1,119 @@
+"""Пространственная привязка полетов к регионам.
+
+Полигоны регионов (GeoJSON, полученный из шейп-файла admin_4) загружаются один раз
+в STRtree, геометрии подготавливаются (shapely.prepare). Точка полета — координаты
+вылета, иначе прибытия, иначе центр зоны (колонки point_lat/point_lon хранилища).
+Все точки порции обрабатываются векторно: отбор кандидатов по дереву и проверка intersects_xy.
+"""
+import json
+import threading
+
+import numpy as np
+import shapely
+
+from flight_store import flight_point
+from geometry_cache import feature_shapes
+
+POINT_COLUMNS = ["point_lat", "point_lon"]
+
+
+class RegionLocator:
+    def __init__(self, geojson, geometries=None):
+        # geometries — готовые геометрии shapely объектов GeoJSON (например, из бинарного кэша)
+        features, geometries = feature_shapes(geojson, geometries)
+        self.names = sorted({f["properties"]["region_name"] for f in features})
+        codes = {name: code for code, name in enumerate(self.names)}
+        # Для каждого полигона — номер региона (один регион может состоять из нескольких объектов)
+        self._region_of = np.array([codes[f["properties"]["region_name"]] for f in features], dtype=np.int64)
+        shapely.prepare(geometries)
+        self._geometries = np.array(geometries, dtype=object)
+        self._tree = shapely.STRtree(self._geometries)
+
+    def locate(self, lats, lons):
+        """Номера регионов (индексы в self.names) для массивов координат; -1 — вне регионов или нет координат."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        result = np.full(len(lats), -1, dtype=np.int64)
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        if not valid.any() or not len(self._geometries):
+            return result
+        x, y = lons[valid], lats[valid]
+        # Дерево отбирает кандидатов по ограничивающим прямоугольникам, точная проверка —
+        # векторный intersects_xy по подготовленным полигонам (без предиката на каждую пару в дереве)
+        point_idx, geometry_idx = self._tree.query(shapely.points(x, y))
+        hit = shapely.intersects_xy(self._geometries[geometry_idx], x[point_idx], y[point_idx])
+        point_idx, geometry_idx = point_idx[hit], geometry_idx[hit]
+        # Точка на границе попадает в несколько полигонов — берем первый по порядку
+        order = np.lexsort((geometry_idx, point_idx))
+        point_idx, geometry_idx = point_idx[order], geometry_idx[order]
+        first = np.unique(point_idx, return_index=True)[1]
+        located = np.full(len(x), -1, dtype=np.int64)
+        located[point_idx[first]] = self._region_of[geometry_idx[first]]
+        result[valid] = located
+        return result
+
+
+def read_points(store, offset):
+    """Координаты точек полетов (lat, lon) для строк хранилища начиная с offset; NaN — точки нет."""
+    # Сегменты, записанные до появления колонок point_*, — точка берется из parsed_data.
+    # В остальных сегментах пустая точка — полет без координат, он не разбирается повторно
+    missing = store.legacy_rows(offset, "point_lat")
+    table = store.read_tail(offset, POINT_COLUMNS)
+    lats = np.asarray(table.column("point_lat").to_numpy(), dtype=np.float64)
+    lons = np.asarray(table.column("point_lon").to_numpy(), dtype=np.float64)
+    if missing:
+        parsed = store.read_tail(offset, ["parsed_data"]).column("parsed_data").take(missing).to_pylist()
+        for i, value in zip(missing, parsed):
+            lat, lon = flight_point(json.loads(value))
+            if lat is not None:
+                lats[i], lons[i] = lat, lon
+    return lats, lons
+
+
+class RegionAssignment:
+    """Регион для каждой строки хранилища; новые строки привязываются по мере загрузок."""
+
+    def __init__(self, locator=None):
+        self._lock = threading.Lock()
+        self._locator = locator
+        self._codes = np.empty(0, dtype=np.int64)
+        self._store_id = None
+
+    def set_locator(self, locator):
+        # Новые границы регионов — привязка пересчитывается при следующем refresh
+        with self._lock:
+            self._locator = locator
+            self._codes = np.empty(0, dtype=np.int64)
+
+    @property
+    def rows(self):
+        return len(self._codes)
+
+    def copy(self):
+        """Копия для перезагрузки репозитория: локатор и массив регионов используются совместно."""
+        with self._lock:
+            assignment = RegionAssignment(self._locator)
+            assignment._codes, assignment._store_id = self._codes, self._store_id
+        return assignment
+
+    def refresh(self, store):
+        with self._lock:
+            if self._locator is None:
+                return 0
+            codes = self._codes
+            if self._store_id != store.store_id or len(codes) > store.count():
+                codes = np.empty(0, dtype=np.int64)
+                self._store_id = store.store_id
+            if len(codes) == store.count():
+                return 0
+            lats, lons = read_points(store, len(codes))
+            self._codes = np.concatenate([codes, self._locator.locate(lats, lons)])
+            return len(lats)
+
+    def counts(self):
+        """{region_name: число полетов} по пространственной привязке."""
+        if self._locator is None:
+            return {}
+        codes = self._codes
+        counts = np.bincount(codes[codes >= 0], minlength=len(self._locator.names))
+        return {name: int(count) for name, count in zip(self._locator.names, counts)}
@@ -0,0 +1,111 @@
+import math
+from analytics import AnalyticsSummary, geojson_region_areas, js_round
+from flight_store import FlightStore
+from ingest import build_flight_record
+from test_flight_index import _row
+
+def _reference(flights):
+    """Повторяет расчеты dataSlice.ts (кроме случайных полей регионов)."""
+    total = len(flights)
+    hourly = [0] * 24
+    daily = {}
+    regions = {}
+    from analytics import summary_region_name
+    for f in flights:
+        dep = f["parsed_data"]["DEP"] or {}
+        if dep.get("time"):
+            hourly[int(dep["time"][:2])] += 1
+        if dep.get("date"):
+            daily[dep["date"]] = daily.get(dep["date"], 0) + 1
+        region = regions.setdefault(summary_region_name(f["Центр ЕС ОрВД"]), [0, 0])
+        region[0] += 1
+        region[1] += f["parsed_data"]["flight_duration_minutes"] or 0
+    counts = sorted(daily.values())
+    mid = len(counts) // 2
+    return {
+        "totalFlights": total,
+        "avgFlightDuration": js_round(sum(f["parsed_data"]["flight_duration_minutes"] or 0 for f in flights) / total),
+        "hourlyDistribution": [{"hour": f"{h:02d}", "flights": c} for h, c in enumerate(hourly)],
+        "peakLoad": max(hourly),
+        "timeSeries": [{"date": d, "flights": c} for d, c in daily.items()],
+        "avgDailyFlights": js_round(sum(counts) / len(counts)),
+        "medianDailyFlights": (counts[mid - 1] + counts[mid]) / 2 if len(counts) % 2 == 0 else counts[mid],
+        "regions": {name: (n, js_round(d / n)) for name, (n, d) in regions.items()},
+    }
+
+def _check(summary, flights):
+    expected = _reference(flights)
+    regions = {r["name"]: (r["flights"], r["avgDuration"]) for r in summary["regions"]}
+    assert regions == expected.pop("regions")
+    assert {k: summary[k] for k in expected} == expected
+
+def test_summary_is_updated_incrementally(tmp_path):
+    store = FlightStore(str(tmp_path / "store"))
+    analytics = AnalyticsSummary(str(tmp_path / "summary.json"))
+    store.append([build_flight_record(_row(i)) for i in range(20)])
+    assert analytics.refresh(store) == 20
+    _check(analytics.summary(), store.read_records())
+
+    store.append([build_flight_record(_row(i)) for i in range(20, 33)])
+    # Дочитываются только новые строки
+    assert analytics.refresh(store) == 13
+    assert analytics.refresh(store) == 0
+    _check(analytics.summary(), store.read_records())
+
+def test_summary_state_survives_restart_and_compaction(tmp_path):
+    store = FlightStore(str(tmp_path / "store"), compact_threshold=100)
+    path = str(tmp_path / "summary.json")
+    for i in range(3):
+        store.append([build_flight_record(_row(j)) for j in range(i * 5, i * 5 + 5)])
+    AnalyticsSummary(path).refresh(store)
+    store.compact()
+    store.append([build_flight_record(_row(99))])
+
+    analytics = AnalyticsSummary(path)
+    assert analytics.rows == 15
+    assert analytics.refresh(store) == 1
+    _check(analytics.summary(), store.read_records())
+
+def test_summary_resets_for_new_store(tmp_path):
+    path = str(tmp_path / "summary.json")
+    old = FlightStore(str(tmp_path / "old"))
+    old.append([build_flight_record(_row(i)) for i in range(5)])
+    AnalyticsSummary(path).refresh(old)
+    new = FlightStore(str(tmp_path / "new"))
+    new.append([build_flight_record(_row(7))])
+    analytics = AnalyticsSummary(path)
+    analytics.refresh(new)
+    assert analytics.summary()["totalFlights"] == 1
+
+def test_summary_resets_for_new_store_with_more_rows(tmp_path):
+    path = str(tmp_path / "summary.json")
+    old = FlightStore(str(tmp_path / "old"))
+    old.append([build_flight_record(_row(i)) for i in range(5)])
+    AnalyticsSummary(path).refresh(old)
+    # Новое хранилище длиннее старого: по одному числу строк подмену не заметить
+    new = FlightStore(str(tmp_path / "new"))
+    new.append([build_flight_record(_row(i)) for i in range(10, 18)])
+    analytics = AnalyticsSummary(path)
+    assert analytics.refresh(new) == 8
+    _check(analytics.summary(), new.read_records())
+
+def test_empty_summary():
+    summary = AnalyticsSummary().summary()
+    assert (summary["totalFlights"], summary["peakLoad"], summary["medianDailyFlights"]) == (0, 0, 0)
+    assert len(summary["hourlyDistribution"]) == 24
+
+def test_region_density_and_zero_flight_days(tmp_path):
+    store = FlightStore(str(tmp_path / "store"))
+    store.append([build_flight_record(_row(i)) for i in range(20)])
+    analytics = AnalyticsSummary()
+    analytics.refresh(store)
+    geojson = {"features": [{"properties": {"region_name": "новосибирская"}, "geometry": {
+        "type": "Polygon", "coordinates": [[[82, 54], [83, 54], [83, 55], [82, 55], [82, 54]]]}}]}
+    areas = geojson_region_areas(geojson)
+    # Градус на градус около 54° с.ш. — примерно 111 км x 65 км
+    assert math.isclose(areas["новосибирская"], 111.2 * 111.2 * math.cos(math.radians(54.5)), rel_tol=0.01)
+    analytics.set_region_areas(areas)
+    region = next(r for r in analytics.summary()["regions"] if r["name"] == "новосибирская")
+    assert region["flightDensity"] == region["flights"] / areas["новосибирская"] * 1000
+    days = len(analytics.summary()["timeSeries"])
+    assert region["zeroFlightDays"] == days - len({f"2025-01-{10 + i % 5}" for i in range(0, 20, 4)})
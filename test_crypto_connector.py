@@ -0,0 +1,23 @@
+import threading
+import time
+
+from crypto_connector import utils
+
+
+def test_concurrent_first_calls_share_one_key(monkeypatch):
+    generate = utils.rsa.generate_private_key
+
+    def slow_generate(**kwargs):
+        time.sleep(0.05)
+        return generate(**kwargs)
+
+    monkeypatch.setattr(utils, "_key", None)
+    monkeypatch.setattr(utils.rsa, "generate_private_key", slow_generate)
+    keys = []
+    threads = [threading.Thread(target=lambda: keys.append(utils._private_key())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(keys) == 8 and all(key is keys[0] for key in keys)
+    assert utils.decrypt_message(utils.encrypt_message("проверка")) == "проверка"
@@ -0,0 +1,79 @@
+import pytest
+from flight_cube import FlightCube, InvalidCubeQuery, altitude_band, hour_label
+from flight_store import FlightStore, record_to_row
+from ingest import build_flight_record
+from test_flight_index import _row
+
+def _cells(records):
+    cells = []
+    for record in records:
+        row = record_to_row(record)
+        cells.append({
+            "center": row["center"], "date": row["dep_date"], "hour": hour_label(row["dep_time"]),
+            "type": row["aircraft_type"], "altitude_band": altitude_band(row["altitude_max"]),
+        })
+    return cells
+
+def _group(cells, group_by, **filters):
+    counts = {}
+    for cell in cells:
+        if all(cell[dim] in values for dim, values in filters.items()):
+            key = tuple(cell[dim] for dim in group_by)
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+@pytest.fixture
+def store(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append([build_flight_record(_row(i)) for i in range(20)])
+    return store
+
+@pytest.mark.parametrize("group_by, filters", [
+    (["center"], {}),
+    (["hour", "center"], {"type": ["BLA"]}),
+    (["altitude_band", "type"], {"center": ["Московский", "Новосибирский"]}),
+    (["date"], {"hour": ["00", "03"]}),
+    ([], {"center": ["Московский"]}),
+])
+def test_query_matches_full_scan(store, group_by, filters):
+    cube = FlightCube()
+    cube.refresh(store)
+    # Второй загрузкой добавляются новые категории (центр, дата)
+    extra = dict(_row(3), **{"Центр ЕС ОрВД": "Екатеринбургский"})
+    extra["DEP"] = extra["DEP"].replace("250113", "250201")
+    store.append([build_flight_record(extra), build_flight_record(_row(21))])
+    assert cube.refresh(store) == 2
+
+    result = cube.query(group_by, filters)
+    expected = _group(_cells(store.read_records()), group_by, **filters)
+    assert {tuple(row[dim] for dim in group_by): row["flights"] for row in result["rows"]} == (expected if group_by else {})
+    assert result["total"] == sum(expected.values())
+
+def test_date_range_and_unknown_values(store):
+    cube = FlightCube()
+    cube.refresh(store)
+    result = cube.query(["date"], date_from="2025-01-11", date_to="2025-01-12")
+    assert {row["date"] for row in result["rows"]} == {"2025-01-11", "2025-01-12"}
+    assert cube.query(["center"], {"type": ["UNKNOWN"]}) == {"group_by": ["center"], "rows": [], "total": 0}
+    with pytest.raises(InvalidCubeQuery):
+        cube.query(["altitude"])
+    with pytest.raises(InvalidCubeQuery):
+        cube.query(["hour", "hour"])
+
+def test_cube_is_rebuilt_for_replaced_store(store, tmp_path):
+    cube = FlightCube()
+    cube.refresh(store)
+    replaced = FlightStore(str(tmp_path / "replaced"))
+    replaced.append([build_flight_record(_row(i)) for i in range(30, 55)])
+    assert cube.refresh(replaced) == 25
+    expected = _group(_cells(replaced.read_records()), ["center"])
+    assert {(row["center"],): row["flights"] for row in cube.query(["center"])["rows"]} == expected
+
+def test_cube_stores_only_occupied_cells(store):
+    cube = FlightCube()
+    assert cube.query(["center"]) == {"group_by": ["center"], "rows": [], "total": 0}
+    cube.refresh(store)
+    cells = {tuple(cell.values()) for cell in _cells(store.read_records())}
+    # Ключ и счетчик на каждую занятую ячейку, а не на все сочетания категорий
+    assert cube.nbytes == len(cells) * 16
+    assert cube.query(["center", "date", "hour", "type", "altitude_band"])["total"] == 20
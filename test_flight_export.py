@@ -0,0 +1,30 @@
+import json
+import pytest
+from flight_store import FlightStore
+from flight_export import iter_export, iter_json_array, iter_ndjson
+from ingest import build_flight_record
+from test_ingest import GOOD_ROW
+
+@pytest.fixture
+def store(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append([build_flight_record(dict(GOOD_ROW, **{"Центр ЕС ОрВД": f"Центр {i}"})) for i in range(5)])
+    store.append([build_flight_record(dict(GOOD_ROW, ARR=None, DEP=None, **{"Центр ЕС ОрВД": None}))])
+    return store
+
+def test_json_array_matches_records(store):
+    chunks = list(iter_json_array(store, batch_size=2))
+    # Первая порция уходит отдельно, до чтения остальных сегментов
+    assert len(chunks) > 3
+    assert json.loads(b"".join(chunks)) == store.read_records()
+
+def test_ndjson_matches_records(store):
+    lines = b"".join(iter_ndjson(store, batch_size=4)).decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == store.read_records()
+
+def test_empty_store(tmp_path):
+    store = FlightStore(str(tmp_path))
+    assert b"".join(iter_json_array(store)) == b"[]"
+    assert b"".join(iter_ndjson(store)) == b""
+    with pytest.raises(ValueError):
+        iter_export(store, "csv")
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from flight_heatmap import FlightHeatmap, InvalidHeatmapQuery, _bin, _centers, parse_bbox
+from flight_store import FlightStore
+from ingest import build_flight_record
+from test_flight_trajectories import MOSCOW, SPB, _record
+from test_ingest import GOOD_ROW
+
+
+def _point_record(point):
+    return _record(None, dep=point)
+
+
+def test_square_grid_matches_histogram2d():
+    rng = np.random.default_rng(1)
+    lats, lons = rng.uniform(50, 60, 5000), rng.uniform(30, 40, 5000)
+    heatmap = FlightHeatmap()
+    heatmap._lats, heatmap._lons = lats, lons
+    result = heatmap.query("square", 1.0)
+    histogram, _, _ = np.histogram2d(lons, lats, bins=[np.arange(30, 41), np.arange(50, 61)])
+    cells = {(lon, lat): count for lon, lat, count in result["cells"]}
+    for i in range(10):
+        for j in range(10):
+            assert cells.get((30.5 + i, 50.5 + j), 0) == histogram[i, j]
+    assert result["total"] == 5000 and result["max_count"] == histogram.max()
+
+
+def test_hex_bins_points_to_nearest_center():
+    rng = np.random.default_rng(2)
+    lats, lons = rng.uniform(-5, 5, 2000), rng.uniform(-5, 5, 2000)
+    q, r = _bin("hex", 1.0, lats, lons)
+    centers_lon, centers_lat = _centers("hex", 1.0, q, r)
+    distance = np.hypot(centers_lon - lons, centers_lat - lats)
+    # Ни один центр соседней ячейки не ближе центра своей
+    for dq, dr in [(1, 0), (-1, 0), (0, 1), (0, -1), (1, -1), (-1, 1)]:
+        other_lon, other_lat = _centers("hex", 1.0, q + dq, r + dr)
+        assert (distance <= np.hypot(other_lon - lons, other_lat - lats) + 1e-9).all()
+    assert (distance <= 1.0 / np.sqrt(3) + 1e-9).all()
+
+
+def test_incremental_refresh_updates_cached_grids(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append([_point_record(MOSCOW)] * 3 + [_point_record(None)])
+    heatmap = FlightHeatmap()
+    assert heatmap.refresh(store) == 4
+    assert heatmap.query("square", 1.0)["total"] == 3
+    hexes = heatmap.query("hex", 0.5)
+
+    store.append([_point_record(SPB), _point_record(MOSCOW)])
+    assert heatmap.refresh(store) == 2
+    assert heatmap.cached_grids()[0]["cells"] == 2
+    square = heatmap.query("square", 1.0)
+    assert square["total"] == 5 and square["max_count"] == 4
+    assert heatmap.query("hex", 0.5)["total"] == hexes["total"] + 2
+    # Полет GOOD_ROW: координаты берутся из колонок point_* так же, как для привязки к регионам
+    store.append([build_flight_record(GOOD_ROW)])
+    heatmap.refresh(store)
+    assert heatmap.query("square", 1.0, parse_bbox("42,43,45,46"))["total"] == 1
+
+
+def test_invalid_queries():
+    heatmap = FlightHeatmap()
+    with pytest.raises(InvalidHeatmapQuery):
+        heatmap.query("triangle", 1.0)
+    with pytest.raises(InvalidHeatmapQuery):
+        heatmap.query("square", 0.0001)
+    with pytest.raises(InvalidHeatmapQuery):
+        parse_bbox("1,2,3")
+    with pytest.raises(InvalidHeatmapQuery):
+        parse_bbox("5,0,1,1")
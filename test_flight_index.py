@@ -0,0 +1,83 @@
+import pytest
+from flight_store import FlightStore
+from flight_index import FlightIndex, InvalidCursor
+from ingest import build_flight_record
+from test_ingest import GOOD_ROW
+
+CENTERS = ["Новосибирский", "Московский", "Санкт-Петербургский", None]
+
+def _row(i):
+    day = 10 + i % 5
+    hour = i % 7
+    return dict(
+        GOOD_ROW,
+        **{"Центр ЕС ОрВД": CENTERS[i % 4]},
+        SHR=f"(SHR-{i}\n-ZZZZ0600\n-M0000/M0005 /ZONA R0,5 4408N04308E/\n-DEP/4408N04308E DOF/2501{day} TYP/BLA SID/77{i:04d})",
+        DEP=f"-TITLE IDEP\n-SID 77{i:04d}\n-ADD 2501{day}\n-ATD 0{hour}00\n-ADEP ZZZZ\n-ADEPZ 4408N04308E",
+        ARR=f"-TITLE IARR\n-SID 77{i:04d}\n-ADA 2501{day}\n-ATA 0800\n-ADARR ZZZZ\n-ADARRZ 4408N04308E" if i % 6 else None,
+    )
+
+@pytest.fixture
+def store(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append([build_flight_record(_row(i)) for i in range(20)])
+    store.append([build_flight_record(_row(i)) for i in range(20, 37)])
+    return store
+
+def _reference(records, atc="", sid="", sort="date", direction="desc"):
+    """Повторяет selectFilteredAndSortedFlights из ui/store/flightsSlice.ts."""
+    def sid_of(r):
+        return r["parsed_data"]["SHR"]["Прочая информация"].get("SID") or ""
+    keys = {
+        "date": lambda r: (r["parsed_data"]["DEP"] or {}).get("date") or "",
+        "duration": lambda r: r["parsed_data"]["flight_duration_minutes"] or 0,
+        "atc": lambda r: r["Центр ЕС ОрВД"] or "",
+    }
+    result = [r for r in records
+              if atc.lower() in (r["Центр ЕС ОрВД"] or "").lower() and sid.lower() in sid_of(r).lower()]
+    result = sorted(result, key=keys[sort])
+    return result[::-1] if direction == "desc" else result
+
+def _all_pages(index, limit, **kwargs):
+    items, cursor = [], None
+    while True:
+        page = index.page(limit=limit, cursor=cursor, **kwargs)
+        items.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items, page["total"]
+
+@pytest.mark.parametrize("sort", ["date", "duration", "atc"])
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+@pytest.mark.parametrize("filters", [{}, {"atc": "моск"}, {"sid": "0001"}, {"atc": "ский", "sid": "77"}])
+def test_pages_match_client_side_sorting(store, sort, direction, filters):
+    index = FlightIndex(store)
+    expected = _reference(store.read_records(), sort=sort, direction=direction, **filters)
+    items, total = _all_pages(index, limit=4, sort=sort, direction=direction, **filters)
+    assert items == expected
+    assert total == len(expected)
+
+def test_date_range_filter(store):
+    index = FlightIndex(store)
+    items, total = _all_pages(index, limit=100, date_from="2025-01-11", date_to="2025-01-12", sort="date", direction="asc")
+    assert total == len(items) > 0
+    assert {r["parsed_data"]["DEP"]["date"] for r in items} == {"2025-01-11", "2025-01-12"}
+
+def test_cursor_is_stable_after_append(store):
+    first = FlightIndex(store).page(sort="duration", direction="asc", limit=5)
+    store.append([build_flight_record(_row(100))])
+    index = FlightIndex(store)
+    assert index.size == 38
+    second = index.page(sort="duration", direction="asc", limit=5, cursor=first["next_cursor"])
+    seen = {r["SHR_raw"] for r in first["items"]}
+    assert not seen & {r["SHR_raw"] for r in second["items"]}
+
+def test_invalid_cursor(store):
+    index = FlightIndex(store)
+    cursor = index.page(sort="date", limit=1)["next_cursor"]
+    with pytest.raises(InvalidCursor):
+        index.page(sort="atc", cursor=cursor)
+    with pytest.raises(InvalidCursor):
+        index.page(cursor="not a cursor")
+    with pytest.raises(ValueError):
+        index.page(sort="altitude")
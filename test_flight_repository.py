@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+from flight_store import FlightStore
+from flight_repository import FlightRepository
+from ingest import build_flight_record
+from test_ingest import GOOD_ROW, _write_xlsx
+
+GEOJSON = {"type": "FeatureCollection", "features": [
+    {"type": "Feature", "properties": {"region_name": "новосибирская"}, "geometry": None},
+    {"type": "Feature", "properties": {"region_name": "московская"}, "geometry": None},
+]}
+
+def _repository(tmp_path):
+    geojson_path = tmp_path / "regions.geojson"
+    geojson_path.write_text(json.dumps(GEOJSON, ensure_ascii=False), encoding="utf-8")
+    xlsx_path = str(tmp_path / "2025.xlsx")
+    _write_xlsx(xlsx_path, [GOOD_ROW, GOOD_ROW, dict(GOOD_ROW, **{"Центр ЕС ОрВД": None})])
+    store = FlightStore(str(tmp_path / "store"))
+    store.append([build_flight_record(GOOD_ROW)])
+    return FlightRepository(store, str(geojson_path), xlsx_path), store
+
+def test_serves_from_memory_until_sources_change(tmp_path):
+    repository, store = _repository(tmp_path)
+    snapshot = repository.get()
+    assert snapshot.flights == store.read_records()
+    assert snapshot.region_stats == {"новосибирская": 2}
+    counts = {f["properties"]["region_name"]: f["properties"]["flight_count"] for f in snapshot.geo_regions["features"]}
+    assert counts == {"новосибирская": 2, "московская": 0}
+    # Без изменений источников возвращается тот же снимок
+    assert repository.get() is snapshot
+
+    store.append([build_flight_record(GOOD_ROW)])
+    updated = repository.get()
+    assert len(updated.flights) == 2
+    # Перезагружаются только полеты и зависящие от них счетчики, GeoJSON и статистика XLSX переиспользуются
+    assert updated.geojson is snapshot.geojson
+    assert updated.region_stats is snapshot.region_stats
+    assert repository.last_reload["sources"] == ["flights", "geo_region_levels", "geo_regions", "index", "spatial_counts", "store_version"]
+
+def test_touch_without_content_change_does_not_reload(tmp_path):
+    repository, _ = _repository(tmp_path)
+    snapshot = repository.get()
+    stat = os.stat(repository.geojson.path)
+    os.utime(repository.geojson.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert repository.get() is snapshot
+    assert repository.geojson.reloads == 1
+
+def test_reloads_changed_geojson(tmp_path):
+    repository, _ = _repository(tmp_path)
+    repository.get()
+    geojson = dict(GEOJSON, features=GEOJSON["features"][1:])
+    with open(repository.geojson.path, "w", encoding="utf-8") as f:
+        json.dump(geojson, f, ensure_ascii=False)
+    snapshot = repository.get()
+    assert [f["properties"]["region_name"] for f in snapshot.geo_regions["features"]] == ["московская"]
+    assert repository.geojson.reloads == 2
+    assert repository.regions_xlsx.reloads == 2
+
+def test_picks_up_writes_from_another_process(tmp_path):
+    repository, store = _repository(tmp_path)
+    repository.get()
+    FlightStore(store.directory).append([build_flight_record(GOOD_ROW)])
+    assert len(repository.get().flights) == 2
+
+def test_diagnostics(tmp_path):
+    repository, _ = _repository(tmp_path)
+    repository.get()
+    diagnostics = repository.diagnostics()
+    assert diagnostics["rss_bytes"] > 0
+    assert diagnostics["flights"]["count"] == 1
+    assert diagnostics["flights"]["table_bytes"] > 0
+    assert diagnostics["sources"]["geojson"]["reloads"] == 1
+    assert diagnostics["last_reload"]["at"] is not None
+
+def test_geo_regions_include_spatial_counts(tmp_path):
+    from test_region_locator import GEOJSON as SQUARES
+    repository, store = _repository(tmp_path)
+    with open(repository.geojson.path, "w", encoding="utf-8") as f:
+        json.dump(SQUARES, f, ensure_ascii=False)
+    store.append([build_flight_record(GOOD_ROW)])
+    counts = {f["properties"]["region_name"]: f["properties"]["spatial_flight_count"]
+              for f in repository.get().geo_regions["features"]}
+    assert counts == {"ставропольский": 2, "дагестан": 0, "пустой": 0}
+
+def test_geo_region_levels_share_counts(tmp_path):
+    from test_region_locator import GEOJSON as SQUARES
+    repository, _ = _repository(tmp_path)
+    with open(repository.geojson.path, "w", encoding="utf-8") as f:
+        json.dump(SQUARES, f, ensure_ascii=False)
+    snapshot = repository.get()
+    assert snapshot.geo_region_levels[0] is snapshot.geo_regions
+    for level in snapshot.geo_region_levels[1:]:
+        counts = {f["properties"]["region_name"]: f["properties"]["spatial_flight_count"] for f in level["features"]}
+        assert counts["ставропольский"] == 1
+    assert len(repository.diagnostics()["geometry_levels"]) == len(snapshot.geo_region_levels)
+
+def test_readers_get_previous_snapshot_during_reload(tmp_path, monkeypatch):
+    repository, store = _repository(tmp_path)
+    snapshot = repository.get()
+    started, release = threading.Event(), threading.Event()
+    build_index = FlightRepository._load_flights
+
+    def slow_load_flights(self, components):
+        started.set()
+        release.wait(5)
+        return build_index(self, components)
+    monkeypatch.setattr(FlightRepository, "_load_flights", slow_load_flights)
+
+    store.append([build_flight_record(GOOD_ROW)])
+    reload = threading.Thread(target=repository.get, kwargs={"wait": True})
+    reload.start()
+    assert started.wait(5)
+    # Перезагрузка идет в другом потоке — запрос сразу получает прежний снимок
+    assert repository.get() is snapshot
+    release.set()
+    reload.join()
+
+    updated = repository.get()
+    assert len(updated.flights) == 2
+    assert (updated.analytics.rows, updated.cube.rows, updated.trajectories.rows) == (2, 2, 2)
+    # Компоненты прежнего снимка не изменились вместе с новым
+    assert (snapshot.analytics.rows, snapshot.cube.rows, snapshot.trajectories.rows) == (1, 1, 1)
+    assert snapshot.analytics.summary()["totalFlights"] == 1
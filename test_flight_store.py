@@ -0,0 +1,116 @@
+import json
+import pyarrow.parquet as pq
+import pytest
+import flight_store
+from flight_store import FlightStore, record_to_row
+from ingest import build_flight_record
+from test_ingest import GOOD_ROW
+
+def _records(n, start=0):
+    return [build_flight_record(dict(GOOD_ROW, **{"Центр ЕС ОрВД": f"Центр {i}"})) for i in range(start, start + n)]
+
+def test_append_and_read_roundtrip(tmp_path):
+    store = FlightStore(str(tmp_path))
+    records = _records(3) + [build_flight_record(dict(GOOD_ROW, ARR=None, DEP=None))]
+    store.append(records)
+    assert store.read_records() == records
+    assert store.count() == 4
+    assert store.version == 1
+
+def test_append_keeps_previous_uploads(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append(_records(2))
+    store.append(_records(3, start=2))
+    assert store.append([]) is None
+    assert store.version == 2
+    assert store.read_records() == _records(5)
+    # Повторное открытие читает тот же манифест
+    assert FlightStore(str(tmp_path)).read_records() == _records(5)
+
+def test_read_table_selects_columns_and_segments(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append(_records(2))
+    second = store.append(_records(1, start=2))
+    table = store.read_table(["center", "sid", "duration"], segments=[second])
+    assert table.column_names == ["center", "sid", "duration"]
+    assert table.to_pylist() == [{"center": "Центр 2", "sid": "7772251137", "duration": 60}]
+
+def test_compact_preserves_rows_and_order(tmp_path):
+    store = FlightStore(str(tmp_path), compact_threshold=100)
+    for i in range(4):
+        store.append(_records(2, start=i * 2))
+    old_segments = store.segments()
+    store.compact()
+    assert len(store.segments()) == 1
+    assert store.read_records() == _records(8)
+    # Старые файлы никто не читает — они удалены сразу после компактизации
+    assert not any((tmp_path / name).exists() for name in old_segments)
+
+def test_compaction_keeps_segments_of_running_readers(tmp_path):
+    store = FlightStore(str(tmp_path), compact_threshold=100)
+    for i in range(3):
+        store.append(_records(2, start=i * 2))
+    old_segments = store.segments()
+    batches = store.iter_batches(["sid"], batch_size=1)
+    sids = [next(batches).column("sid")[0].as_py()]
+    store.compact()
+    store.append(_records(2, start=6))
+    store.compact()
+    # Выгрузка, начатая до двух компактизаций подряд, дочитывает прежние сегменты
+    assert all((tmp_path / name).exists() for name in old_segments)
+    sids += [batch.column("sid")[0].as_py() for batch in batches]
+    assert sids == store.read_table(["sid"]).column("sid").to_pylist()[:6]
+    assert not any((tmp_path / name).exists() for name in old_segments)
+    assert json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))["obsolete"] == []
+
+def test_migrate_json(tmp_path):
+    records = _records(3)
+    json_path = tmp_path / "base_data.json"
+    json_path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    store = FlightStore(str(tmp_path / "store"))
+    assert store.migrate_json(str(json_path)) is True
+    assert store.read_records() == records
+    assert not json_path.exists()
+    assert store.migrate_json(str(json_path)) is False
+
+def test_record_to_row_handles_nan_cells():
+    record = dict(build_flight_record(GOOD_ROW), ARR_raw=float("nan"))
+    row = record_to_row(record)
+    assert row["arr_raw"] is None
+    assert (row["sid"], row["dep_date"], row["duration"]) == ("7772251137", "2025-01-24", 60)
+
+def test_reupload_skips_stored_flights(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append(_records(3))
+    # Сегмент старого формата без колонки row_key: ключи считаются по исходным текстам
+    path = store.segment_path(store.segments()[0])
+    pq.write_table(pq.read_table(path).drop_columns(["row_key"]), path)
+    different = [build_flight_record(dict(GOOD_ROW, SHR=GOOD_ROW["SHR"].replace("SID/7772251137", "SID/1")))]
+
+    writer = store.write_records(_records(3) + different + different, dedupe=True)
+    assert (writer.count, writer.skipped) == (1, 4)
+    writer.commit()
+    assert store.count() == 4
+    assert store.read_records() == _records(3) + different
+
+    writer = FlightStore(str(tmp_path)).write_records(_records(2) + different, dedupe=True)
+    assert (writer.count, writer.skipped) == (0, 3)
+    assert writer.commit() is None
+    # Без dedupe запись идет как есть
+    store.append(different)
+    assert store.count() == 5
+
+def test_failed_deduped_upload_releases_upload_lock(tmp_path, monkeypatch):
+    store = FlightStore(str(tmp_path))
+    store.append(_records(1))
+    # Запись, на которой падает record_to_row
+    with pytest.raises(AttributeError):
+        store.write_records([None], dedupe=True)
+    assert not store._upload_lock.locked()
+
+    def broken_writer(*args, **kwargs):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(flight_store.pq, "ParquetWriter", broken_writer)
+    with pytest.raises(OSError):
+        store.open_segment(dedupe=True)
+    assert not store._upload_lock.locked()
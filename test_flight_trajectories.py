@@ -0,0 +1,79 @@
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from flight_store import FlightStore
+from flight_trajectories import FlightTrajectories, haversine_km
+
+MOSCOW = {"latitude": 55.7558, "longitude": 37.6173}
+TVER = {"latitude": 56.8587, "longitude": 35.9176}
+VALDAI = {"latitude": 57.98, "longitude": 33.25}
+SPB = {"latitude": 59.9343, "longitude": 30.3351}
+
+
+def _record(sid, dep=None, waypoints=(), arr=None, typ="BLA"):
+    parsed = {
+        "SHR": {"Маршрут": {"waypoints": list(waypoints)}, "Прочая информация": {"SID": sid, "TYP": {"type": typ}}},
+        "DEP": {"coordinates": dep} if dep else {},
+        "ARR": {"coordinates": arr} if arr else {},
+    }
+    return {"Центр ЕС ОрВД": "Московский", "SHR_raw": None, "DEP_raw": None, "ARR_raw": None, "parsed_data": parsed}
+
+
+def _distance(a, b):
+    return float(haversine_km(a["latitude"], a["longitude"], b["latitude"], b["longitude"]))
+
+
+def test_haversine():
+    assert _distance(MOSCOW, SPB) == pytest.approx(634, abs=2)
+    distances = haversine_km(np.array([0.0, 0.0]), np.array([0.0, 0.0]), np.array([0.0, 1.0]), np.array([1.0, 0.0]))
+    assert distances[0] == pytest.approx(distances[1])
+
+
+def test_trajectory_line_length_and_bbox(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append([
+        _record("A", dep=MOSCOW, waypoints=[TVER, VALDAI], arr=SPB),
+        _record("B", dep=SPB),
+        _record("C"),
+    ])
+    trajectories = FlightTrajectories()
+    assert trajectories.refresh(store) == 3
+
+    feature = trajectories.trajectory("A")
+    assert feature["geometry"]["type"] == "LineString"
+    assert feature["geometry"]["coordinates"] == [[p["longitude"], p["latitude"]] for p in (MOSCOW, TVER, VALDAI, SPB)]
+    expected = _distance(MOSCOW, TVER) + _distance(TVER, VALDAI) + _distance(VALDAI, SPB)
+    assert feature["properties"]["length_km"] == pytest.approx(expected, abs=1e-3)
+    assert feature["properties"]["aircraft_type"] == "BLA"
+    assert feature["bbox"] == [SPB["longitude"], MOSCOW["latitude"], MOSCOW["longitude"], SPB["latitude"]]
+
+    single = trajectories.trajectory("B")
+    assert single["geometry"] == {"type": "Point", "coordinates": [SPB["longitude"], SPB["latitude"]]}
+    assert single["properties"]["length_km"] == 0
+    empty = trajectories.trajectory("C")
+    assert empty["geometry"] is None and "bbox" not in empty
+    assert trajectories.trajectory("missing") is None
+
+
+def test_incremental_refresh_and_legacy_segments(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append([_record("A", dep=MOSCOW, arr=TVER)])
+    # Сегмент старого формата без колонок track_lat/track_lon
+    writer = store.open_segment()
+    writer.write(_record("L", dep=TVER, arr=SPB))
+    writer.finish()
+    path = store.segment_path(writer.name)
+    pq.write_table(pq.read_table(path).drop_columns(["track_lat", "track_lon"]), path)
+    store._add_segment(writer.name, 1)
+
+    trajectories = FlightTrajectories()
+    assert trajectories.refresh(store) == 2
+    assert trajectories.trajectory("L")["properties"]["length_km"] == pytest.approx(_distance(TVER, SPB), abs=1e-3)
+
+    # Повторный SID: выдается последний загруженный полет
+    store.append([_record("A", dep=VALDAI, arr=SPB)])
+    assert trajectories.refresh(store) == 1
+    assert trajectories.refresh(store) == 0
+    assert trajectories.trajectory("A")["properties"]["length_km"] == pytest.approx(_distance(VALDAI, SPB), abs=1e-3)
+    assert trajectories.trajectory("L")["properties"]["points"] == 2
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+import shapely
+from shapely.geometry import shape
+
+from flight_repository import FlightRepository, file_hash
+from flight_store import FlightStore
+from geometry_cache import cache_path, load_geometry_cache, write_geometry_cache
+
+HOLE = [[[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]], [[1, 1], [2, 1], [2, 2], [1, 2], [1, 1]]]
+GEOJSON = {"type": "FeatureCollection", "name": "admin_4", "features": [
+    {"type": "Feature", "properties": {"region_name": "с дыркой"}, "geometry": {"type": "Polygon", "coordinates": HOLE}},
+    {"type": "Feature", "properties": {"region_name": "пустой"}, "geometry": None},
+    {"type": "Feature", "properties": {"region_name": "острова"}, "geometry": {"type": "MultiPolygon", "coordinates": [
+        [[[10, 10], [11, 10], [11, 11], [10, 10]]], [[[12, 12], [13, 12], [13, 13], [12, 12]]],
+    ]}},
+    {"type": "Feature", "properties": {"region_name": "один остров"}, "geometry": {"type": "MultiPolygon", "coordinates": [
+        [[[20, 20], [21, 20], [21, 21], [20, 20]]],
+    ]}},
+]}
+
+
+def test_round_trip_restores_geojson(tmp_path):
+    path = str(tmp_path / "regions.geomcache")
+    written = write_geometry_cache(GEOJSON, path, "abc")
+    assert written[1] is None and written[0].equals(shape(GEOJSON["features"][0]["geometry"]))
+
+    cached = load_geometry_cache(path, "abc")
+    assert [g.geom_type if g is not None else None for g in cached.geometries] == \
+        ["Polygon", None, "MultiPolygon", "MultiPolygon"]
+    restored = cached.to_geojson()
+    assert restored["name"] == "admin_4"
+    assert [f["properties"] for f in restored["features"]] == [f["properties"] for f in GEOJSON["features"]]
+    for original, feature in zip(GEOJSON["features"], restored["features"]):
+        if original["geometry"] is None:
+            assert feature["geometry"] is None
+        else:
+            assert shapely.equals(shape(feature["geometry"]), shape(original["geometry"]))
+            assert feature["geometry"]["type"] == original["geometry"]["type"]
+
+
+def test_stale_or_missing_cache_is_ignored(tmp_path):
+    path = str(tmp_path / "regions.geomcache")
+    assert load_geometry_cache(path) is None
+    write_geometry_cache(GEOJSON, path, "abc")
+    assert load_geometry_cache(path, "other") is None
+    # Повторная запись заменяет каталог целиком
+    write_geometry_cache(dict(GEOJSON, features=GEOJSON["features"][:1]), path, "def")
+    assert len(load_geometry_cache(path, "def").geometries) == 1
+
+
+def test_repository_builds_and_reuses_cache(tmp_path):
+    geojson_path = str(tmp_path / "regions.geojson")
+    with open(geojson_path, "w", encoding="utf-8") as f:
+        json.dump(GEOJSON, f, ensure_ascii=False)
+    store = FlightStore(str(tmp_path / "store"))
+    first = FlightRepository(store, geojson_path, str(tmp_path / "missing.xlsx")).get()
+    assert os.path.isdir(cache_path(geojson_path))
+    assert load_geometry_cache(cache_path(geojson_path), file_hash(geojson_path)) is not None
+
+    second = FlightRepository(store, geojson_path, str(tmp_path / "missing.xlsx")).get()
+    assert [f["properties"] for f in second.geojson["features"]] == [f["properties"] for f in first.geojson["features"]]
+    assert len(second.geometry_levels) == len(first.geometry_levels)
+
+
+def test_repository_loads_geojson_the_cache_cannot_store(tmp_path):
+    geojson = {"type": "FeatureCollection", "features": [
+        GEOJSON["features"][0],
+        {"type": "Feature", "properties": {"region_name": "коллекция"}, "geometry": {"type": "GeometryCollection", "geometries": [
+            {"type": "Polygon", "coordinates": [[[30, 30], [31, 30], [31, 31], [30, 30]]]},
+        ]}},
+    ]}
+    geojson_path = str(tmp_path / "regions.geojson")
+    with open(geojson_path, "w", encoding="utf-8") as f:
+        json.dump(geojson, f, ensure_ascii=False)
+    with pytest.raises(ValueError):
+        write_geometry_cache(geojson, str(tmp_path / "direct.geomcache"), "abc")
+
+    snapshot = FlightRepository(FlightStore(str(tmp_path / "store")), geojson_path, str(tmp_path / "missing.xlsx")).get()
+    assert [f["properties"]["region_name"] for f in snapshot.geojson["features"]] == ["с дыркой", "коллекция"]
+    assert snapshot.geo_regions is not None
+    assert not os.path.exists(cache_path(geojson_path))
@@ -0,0 +1,71 @@
+import math
+
+import shapely
+from shapely.geometry import shape
+
+from geojson_converter import GEOMETRY_LEVELS, build_geometry_levels, count_vertices, geometry_level_for
+
+
+def _border(steps=200):
+    # Извилистая общая граница двух соседних регионов по долготе 40
+    return [(40 + 0.01 * math.sin(i / 3), 45 + i * 0.01) for i in range(steps + 1)]
+
+
+def _regions():
+    border = _border()
+    west = [(38, 45)] + border + [(38, border[-1][1]), (38, 45)]
+    east = [(42, 45)] + border + [(42, border[-1][1]), (42, 45)]
+    return {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"region_name": "запад"}, "geometry": {"type": "Polygon", "coordinates": [west]}},
+        {"type": "Feature", "properties": {"region_name": "восток"}, "geometry": {"type": "Polygon", "coordinates": [east]}},
+        {"type": "Feature", "properties": {"region_name": "пустой"}, "geometry": None},
+    ]}
+
+
+def test_levels_reduce_vertices_and_keep_properties():
+    geojson = _regions()
+    levels = build_geometry_levels(geojson)
+    assert len(levels) == len(GEOMETRY_LEVELS)
+    assert levels[0] is geojson
+    vertices = [count_vertices(level) for level in levels]
+    assert vertices == sorted(vertices, reverse=True)
+    assert vertices[-1] < vertices[0] / 10
+    for level in levels[1:]:
+        assert [f["properties"]["region_name"] for f in level["features"]] == ["запад", "восток"]
+
+
+def test_non_polygonal_regions_are_simplified_separately():
+    geojson = _regions()
+    west = geojson["features"][0]["geometry"]
+    geojson["features"][0]["geometry"] = {"type": "GeometryCollection", "geometries": [west]}
+    levels = build_geometry_levels(geojson)
+    vertices = [count_vertices(level) for level in levels]
+    assert vertices == sorted(vertices, reverse=True) and vertices[-1] < vertices[0]
+    for level in levels[1:]:
+        assert [f["properties"]["region_name"] for f in level["features"]] == ["запад", "восток"]
+
+
+def test_shared_border_has_no_gaps_or_overlaps():
+    for level in build_geometry_levels(_regions())[1:]:
+        west, east = [shape(f["geometry"]) for f in level["features"]]
+        assert west.is_valid and east.is_valid
+        assert west.intersection(east).area < 1e-9
+        # Объединение покрывает весь прямоугольник без щелей по границе
+        assert abs(west.union(east).area - 4 * 2) < 1e-6
+
+
+def test_coordinates_are_quantized():
+    levels = build_geometry_levels(_regions())
+    for level, (_, decimals) in zip(levels[1:], GEOMETRY_LEVELS[1:]):
+        coords = shapely.get_coordinates(shape(level["features"][0]["geometry"]))
+        assert (abs(coords - coords.round(decimals)) < 1e-12).all()
+
+
+def test_level_for_zoom_and_tolerance():
+    assert geometry_level_for() == 0
+    assert geometry_level_for(zoom=14) == 0
+    assert geometry_level_for(zoom=2) == len(GEOMETRY_LEVELS) - 1
+    assert geometry_level_for(tolerance=0.02) == 2
+    assert geometry_level_for(tolerance=0.019) == 1
+    levels = [geometry_level_for(zoom=zoom) for zoom in range(15)]
+    assert levels == sorted(levels, reverse=True)
@@ -0,0 +1,130 @@
+import gzip
+import threading
+import time
+
+import brotli
+import orjson
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from http_cache import ResponseCache, etag_matches, negotiate_encoding
+
+DATA = {"регион": "московская", "flights": list(range(500))}
+
+
+def _client():
+    cache = ResponseCache(max_entries=2)
+    state = {"version": 1, "builds": 0}
+    app = FastAPI()
+
+    @app.get("/data")
+    def data(request: Request, key: str = "a"):
+        def build():
+            state["builds"] += 1
+            return DATA
+        return cache.respond(request, (key,), state["version"], build)
+
+    return TestClient(app), cache, state
+
+
+def test_compressed_bodies_and_not_modified():
+    client, cache, state = _client()
+    plain = client.get("/data", headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200
+    assert plain.content == orjson.dumps(DATA)
+    assert plain.headers["cache-control"] == "no-cache"
+    etag = plain.headers["etag"]
+    # До фонового сжатия отдается быстрый gzip, brotli появляется после него
+    assert client.get("/data", headers={"Accept-Encoding": "gzip"}).json() == DATA
+    cache.wait()
+
+    compressed = client.get("/data", headers={"Accept-Encoding": "gzip, br"})
+    assert compressed.headers["content-encoding"] == "br"
+    assert compressed.json() == DATA
+    assert client.get("/data", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+
+    not_modified = client.get("/data", headers={"If-None-Match": f"W/{etag}"})
+    assert not_modified.status_code == 304 and not not_modified.content
+    assert state["builds"] == 1
+    assert cache.stats()["not_modified"] == 1
+
+
+def test_rebuilds_on_new_version_and_evicts_lru():
+    client, cache, state = _client()
+    etag = client.get("/data").headers["etag"]
+    state["version"] = 2
+    # Новая версия данных с тем же содержимым: ответ пересобран, ETag прежний
+    assert client.get("/data", headers={"If-None-Match": etag}).status_code == 304
+    assert state["builds"] == 2
+    client.get("/data?key=b")
+    client.get("/data?key=c")
+    assert cache.stats()["entries"] == 2
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+
+
+def test_concurrent_misses_build_once():
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.05)
+        return DATA
+
+    threads = [threading.Thread(target=cache.entry, args=(("k",), 1, build)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    cache.wait()
+    cached = cache.entry(("k",), 1, build)
+    assert cached.compressed
+    assert gzip.decompress(cached.bodies["gzip"]) == brotli.decompress(cached.bodies["br"]) == cached.bodies["identity"]
+    assert cache._building == {}
+
+
+def test_failed_builds_leave_no_locks():
+    cache = ResponseCache()
+
+    def build():
+        raise ValueError("Invalid cursor")
+
+    for i in range(1000):
+        with pytest.raises(ValueError):
+            cache.entry(("flights", f"cursor-{i}"), 1, build)
+    assert cache._building == {}
+    assert cache.stats()["entries"] == 0
+    # После ошибки ключ собирается заново
+    assert cache.entry(("flights", "cursor-0"), 1, lambda: DATA).version == 1
+
+
+def test_prepare_builds_and_compresses_outside_request():
+    cache = ResponseCache()
+    # Фоновый поток занят — запрос получает ответ с быстрым gzip, не дожидаясь сильного сжатия
+    release = threading.Event()
+    cache._background.submit(release.wait, 5)
+    cached = cache.entry(("fast",), 1, lambda: DATA)
+    assert set(cached.bodies) == {"identity", "gzip"} and not cached.compressed
+    assert gzip.decompress(cached.bodies["gzip"]) == cached.bodies["identity"]
+    release.set()
+    cache.wait()
+    assert cached.compressed and "br" in cached.bodies
+
+    cache.prepare(("flights",), 1, lambda: DATA).result()
+    cache.wait()
+    assert cache.stats()["compressed"] == 2
+    builds = []
+    assert cache.entry(("flights",), 1, lambda: builds.append(1)).compressed
+    assert builds == []
+
+
+def test_negotiation_and_etag_matching():
+    available = {"identity": b"", "gzip": b"", "br": b""}
+    assert negotiate_encoding(None, available) == "identity"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", available) == "gzip"
+    assert negotiate_encoding("br;q=0, *", available) == "gzip"
+    assert negotiate_encoding("br", {"identity": b"", "gzip": b""}) == "identity"
+    assert etag_matches('"a", "b"', '"b"') and etag_matches("*", '"b"') and not etag_matches('"a"', '"b"')
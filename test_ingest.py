@@ -0,0 +1,108 @@
+import asyncio
+import os
+import pytest
+from ingest import build_flight_record, parse_rows, parse_rows_async, shutdown_process_pool
+
+GOOD_ROW = {
+    "Центр ЕС ОрВД": "Новосибирский",
+    "SHR": "(SHR-00725\n-ZZZZ0600\n-M0000/M0005 /ZONA R0,5 4408N04308E/\n-ZZZZ0700\n-DEP/4408N04308E DOF/250124 TYP/BLA SID/7772251137)",
+    "DEP": "-TITLE IDEP\n-SID 7772251137\n-ADD 250124\n-ATD 0600\n-ADEP ZZZZ\n-ADEPZ 4408N04308E\n-PAP 0",
+    "ARR": "-TITLE IARR\n-SID 7772251137\n-ADA 250124\n-ATA 0700\n-ADARR ZZZZ\n-ADARRZ 4408N04308E\n-PAP 0",
+}
+# Радиус зоны "R,," не преобразуется во float — строка должна попасть в errors
+BAD_ROW = dict(GOOD_ROW, SHR="(SHR-1\n-ZZZZ0100\n-M0000/M0001 /ZONA R,, 5152N08600E/)")
+
+def test_build_flight_record():
+    record = build_flight_record(GOOD_ROW)
+    assert record["Центр ЕС ОрВД"] == "Новосибирский"
+    assert record["parsed_data"]["flight_duration_minutes"] == 60
+    assert record["parsed_data"]["DEP"]["sid"] == "7772251137"
+
+def test_parse_rows_collects_errors():
+    results, errors = parse_rows([(0, GOOD_ROW), (1, BAD_ROW), (2, GOOD_ROW)])
+    assert len(results) == 2
+    assert [e["row"] for e in errors] == [1]
+
+def test_parse_rows_parallel_preserves_order():
+    rows = []
+    for i in range(23):
+        row = dict(GOOD_ROW, **{"Центр ЕС ОрВД": f"Центр {i}"})
+        rows.append((i, BAD_ROW if i % 7 == 3 else row))
+    serial = parse_rows(rows)
+    try:
+        parallel = asyncio.run(parse_rows_async(rows, mode="parallel", workers=2, chunk_size=4))
+    finally:
+        shutdown_process_pool()
+    assert parallel == serial
+    assert [e["row"] for e in parallel[1]] == [3, 10, 17]
+
+def test_parse_rows_async_unknown_mode():
+    with pytest.raises(ValueError):
+        asyncio.run(parse_rows_async([], mode="unknown"))
+
+def _write_xlsx(path, rows):
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Дата", "Центр ЕС ОрВД", "SHR", "DEP", "ARR"])
+    for row in rows:
+        if row is None:
+            sheet.append([None] * 5)
+        else:
+            sheet.append(["01.01.2025", row["Центр ЕС ОрВД"], row["SHR"], row["DEP"], row["ARR"]])
+    workbook.save(path)
+
+def test_iter_xlsx_rows_matches_read_excel(tmp_path):
+    import pandas as pd
+    from ingest import iter_xlsx_rows
+    path = str(tmp_path / "flights.xlsx")
+    _write_xlsx(path, [GOOD_ROW, None, dict(GOOD_ROW, ARR=None), None, None])
+    df = pd.read_excel(path).astype(object)
+    df = df.where(df.notna(), None)
+    expected = [(index, {k: row[k] for k in ("Центр ЕС ОрВД", "SHR", "DEP", "ARR")}) for index, row in enumerate(df.to_dict("records"))]
+    assert list(iter_xlsx_rows(path)) == expected
+
+def test_ingest_xlsx_stream_writes_segment(tmp_path):
+    from flight_store import FlightStore
+    from ingest import ingest_xlsx_stream, iter_xlsx_rows
+    path = str(tmp_path / "flights.xlsx")
+    store = FlightStore(str(tmp_path / "store"))
+    _write_xlsx(path, [GOOD_ROW, dict(GOOD_ROW, ARR=None)] * 15)
+    count, preview, errors = ingest_xlsx_stream(path, store.open_segment())
+    results, _ = parse_rows(list(iter_xlsx_rows(path)))
+    assert (count, errors) == (30, [])
+    assert preview == results[:10]
+    assert store.read_records() == results
+
+def test_ingest_xlsx_stream_reupload_skips_stored_flights(tmp_path):
+    from flight_store import FlightStore
+    from ingest import ingest_xlsx_stream
+    path = str(tmp_path / "flights.xlsx")
+    store = FlightStore(str(tmp_path / "store"))
+    store.append([build_flight_record(GOOD_ROW)])
+    _write_xlsx(path, [GOOD_ROW, dict(GOOD_ROW, ARR=None), GOOD_ROW])
+    writer = store.open_segment(dedupe=True)
+    count, preview, errors = ingest_xlsx_stream(path, writer)
+    assert (count, writer.skipped, errors) == (1, 2, [])
+    assert [record["ARR_raw"] for record in preview] == [None]
+    assert store.count() == 2
+
+def test_ingest_xlsx_stream_keeps_store_on_errors(tmp_path):
+    from flight_store import FlightStore
+    from ingest import ingest_xlsx_stream
+    path = str(tmp_path / "flights.xlsx")
+    store = FlightStore(str(tmp_path / "store"))
+    store.append([build_flight_record(GOOD_ROW)])
+    _write_xlsx(path, [GOOD_ROW, BAD_ROW])
+    count, preview, errors = ingest_xlsx_stream(path, store.open_segment())
+    assert [e["row"] for e in errors] == [1]
+    assert store.count() == 1
+    assert sorted(os.listdir(tmp_path / "store")) == ["manifest.json", "segment-000001.parquet"]
+
+def test_parse_rows_engines_match(monkeypatch):
+    import ingest
+    rows = [(0, GOOD_ROW), (1, BAD_ROW), (2, dict(GOOD_ROW, ARR=None)), (3, dict(GOOD_ROW, DEP="-SID 1"))]
+    monkeypatch.setattr(ingest, "INGEST_DEP_ARR_ENGINE", "scalar")
+    expected = parse_rows(rows)
+    monkeypatch.setattr(ingest, "INGEST_DEP_ARR_ENGINE", "vectorized")
+    assert parse_rows(rows) == expected
@@ -0,0 +1,321 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ollama_analyzer.client import OllamaClient, OllamaUnavailable
+from ollama_analyzer.logic import StreamSanitizer, analyze_batch, get_mock_analysis, get_ollama_analysis, sanitize_html, stream_ollama_analysis
+from ollama_analyzer.result_cache import AnalysisCache, data_hash
+
+
+class StubOllama:
+    """Локальный HTTP-сервер с ответами /api/version и /api/chat вместо Ollama."""
+
+    def __init__(self, delay=0.0, reply="<p>ok</p><script>x</script>", fragments=None, fragment_delay=0.0,
+                 delays=None, fail_on=None):
+        self.delay = delay
+        # Задержка и ошибка 500 для запросов, в тексте которых есть заданная подстрока
+        self.delays = delays or {}
+        self.fail_on = fail_on
+        self.reply = reply
+        self.fragments = fragments
+        self.fragment_delay = fragment_delay
+        self.version_calls = 0
+        self.chat_calls = []
+        self.active = 0
+        self.peak = 0
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body):
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for fragment in stub.fragments or [stub.reply]:
+                    line = {"message": {"role": "assistant", "content": fragment}, "done": False}
+                    self.wfile.write((json.dumps(line) + "\n").encode())
+                    self.wfile.flush()
+                    time.sleep(stub.fragment_delay)
+                self.wfile.write((json.dumps({"message": {"content": ""}, "done": True}) + "\n").encode())
+
+            def do_GET(self):
+                stub.version_calls += 1
+                self._send({"version": "0.0.0"})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with lock:
+                    stub.chat_calls.append(body)
+                    stub.active += 1
+                    stub.peak = max(stub.peak, stub.active)
+                content = body["messages"][-1]["content"]
+                time.sleep(next((delay for marker, delay in stub.delays.items() if marker in content), stub.delay))
+                if stub.fail_on and stub.fail_on in content:
+                    with lock:
+                        stub.active -= 1
+                    self.send_error(500)
+                    return
+                try:
+                    if body.get("stream"):
+                        self._stream()
+                        return
+                finally:
+                    with lock:
+                        stub.active -= 1
+                self._send({"message": {"role": "assistant", "content": stub.reply}})
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        # Клиент, не дождавшийся ответа, закрывает соединение — это ожидаемо
+        self.server.handle_error = lambda request, address: None
+        self.host = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_health_is_cached_and_responses_are_sanitized():
+    with StubOllama() as stub:
+        client = OllamaClient(host=stub.host)
+
+        async def scenario():
+            results = [await get_ollama_analysis("map", {"a": i}, client, AnalysisCache()) for i in range(3)]
+            await client.aclose()
+            return results
+
+        assert asyncio.run(scenario()) == ["<p>ok</p>x"] * 3
+        assert stub.version_calls == 1
+        assert len(stub.chat_calls) == 3
+        assert stub.chat_calls[0]["stream"] is False
+        assert [message["role"] for message in stub.chat_calls[0]["messages"]] == ["system", "user"]
+
+
+def test_semaphore_bounds_concurrency_and_reports_queue_depth():
+    with StubOllama(delay=0.2) as stub:
+        client = OllamaClient(host=stub.host, max_concurrency=2)
+        depths = []
+
+        async def scenario():
+            tasks = [asyncio.create_task(client.chat([{"role": "user", "content": str(i)}])) for i in range(6)]
+            await asyncio.sleep(0.1)
+            depths.append(client.stats()["queue_depth"])
+            results = await asyncio.gather(*tasks)
+            await client.aclose()
+            return results
+
+        assert asyncio.run(scenario()) == [stub.reply] * 6
+        assert stub.peak == 2
+        assert depths == [4]
+        assert client.stats()["queue_depth"] == 0 and client.stats()["active"] == 0
+
+
+def test_slow_generation_does_not_block_event_loop():
+    with StubOllama(delay=0.5) as stub:
+        client = OllamaClient(host=stub.host, timeout=0.2)
+
+        async def scenario():
+            ticks = []
+
+            async def ticker():
+                for _ in range(5):
+                    ticks.append(time.monotonic())
+                    await asyncio.sleep(0.02)
+
+            generation = asyncio.create_task(client.chat([{"role": "user", "content": "slow"}]))
+            await ticker()
+            with pytest.raises(OllamaUnavailable):
+                await generation
+            await client.aclose()
+            return ticks
+
+        ticks = asyncio.run(scenario())
+        assert ticks[-1] - ticks[0] < 0.2
+        assert client.stats()["timeouts"] == 1
+
+
+def test_unavailable_service_falls_back_without_retrying_health():
+    stub = StubOllama()
+    host = stub.host
+    stub.server.server_close()
+    client = OllamaClient(host=host, health_ttl=60)
+
+    async def scenario():
+        first = await get_ollama_analysis("hourly", {}, client, AnalysisCache())
+        second = await get_ollama_analysis("hourly", {}, client, AnalysisCache())
+        await client.aclose()
+        return first, second
+
+    assert asyncio.run(scenario()) == (get_mock_analysis("hourly", {}),) * 2
+    assert client.stats()["healthy"] is False
+    assert client.stats()["requests"] == 0
+
+
+def test_result_cache_collapses_identical_requests():
+    with StubOllama(delay=0.2) as stub:
+        client = OllamaClient(host=stub.host, max_concurrency=4)
+        cache = AnalysisCache(max_entries=8, ttl=60)
+
+        async def scenario():
+            first = await asyncio.gather(*[
+                get_ollama_analysis("map", {"b": 2, "a": 1}, client, cache) for _ in range(5)
+            ])
+            started = time.perf_counter()
+            for _ in range(100):
+                hit = await get_ollama_analysis("map", {"a": 1, "b": 2}, client, cache)
+            hit_seconds = (time.perf_counter() - started) / 100
+            other = await get_ollama_analysis("hourly", {"a": 1, "b": 2}, client, cache)
+            await client.aclose()
+            return first, hit, hit_seconds, other
+
+        first, hit, hit_seconds, other = asyncio.run(scenario())
+        assert first == ["<p>ok</p>x"] * 5 and hit == "<p>ok</p>x" and other == hit
+        assert len(stub.chat_calls) == 2
+        assert hit_seconds < 0.001
+        assert cache.stats()["joined"] == 4 and cache.stats()["hits"] == 100 and cache.stats()["inflight"] == 0
+
+
+def test_result_cache_expires_evicts_and_skips_failures():
+    cache = AnalysisCache(max_entries=2, ttl=60)
+    calls = []
+
+    async def build(value):
+        calls.append(value)
+        if value == "boom":
+            raise OllamaUnavailable("down")
+        return value
+
+    async def scenario():
+        await cache.get_or_create("a", lambda: build("a"))
+        await cache.get_or_create("b", lambda: build("b"))
+        await cache.get_or_create("a", lambda: build("a"))
+        await cache.get_or_create("c", lambda: build("c"))
+        with pytest.raises(OllamaUnavailable):
+            await cache.get_or_create("d", lambda: build("boom"))
+
+    asyncio.run(scenario())
+    # "b" вытеснен как давно не запрошенный, ошибка не сохранена
+    assert cache.get("a") == "a" and cache.get("b") is None and cache.get("d") is None
+    assert calls == ["a", "b", "c", "boom"]
+    cache.ttl = 0
+    cache.put("e", "e")
+    assert cache.get("e") is None
+    assert data_hash({"x": [1, 2], "y": "я"}) == data_hash({"y": "я", "x": [1, 2]})
+
+
+def test_stream_sanitizer_matches_sanitize_html_for_any_split():
+    html = ('<p>a &amp; b < c <strong class="x">bold</strong><script>alert(1)</script><!-- c --></p>'
+            + get_mock_analysis("map", {}))
+    for size in range(1, 12):
+        sanitizer = StreamSanitizer()
+        parts = [sanitizer.feed(html[i:i + size]) for i in range(0, len(html), size)]
+        assert "".join(parts) + sanitizer.finish() == sanitize_html(html)
+    sanitizer = StreamSanitizer()
+    assert sanitizer.feed("<p>text <str") == "<p>text "
+    assert sanitizer.feed("ong>x &am") == "<strong>x "
+    assert sanitizer.finish() == "&amp;am</strong></p>"
+
+
+def test_stream_relays_fragments_before_generation_ends():
+    fragments = ["<p>Пер", "вый <stro", "ng>инсайт</strong>", "<img src=x onerror=1>", " и т.д.</p>"]
+    with StubOllama(fragments=fragments, fragment_delay=0.15) as stub:
+        client = OllamaClient(host=stub.host)
+        cache = AnalysisCache()
+
+        async def scenario():
+            started = time.perf_counter()
+            events = []
+            async for event, payload in stream_ollama_analysis("map", {"a": 1}, client, cache):
+                events.append((event, payload, time.perf_counter() - started))
+            cached = [event async for event in stream_ollama_analysis("map", {"a": 1}, client, cache)]
+            await client.aclose()
+            return events, cached
+
+        events, cached = asyncio.run(scenario())
+        tokens = [payload["html"] for event, payload, _ in events if event == "token"]
+        assert "".join(tokens) == sanitize_html("".join(fragments))
+        assert tokens[0] == "<p>Пер"
+        total = events[-1][2]
+        assert events[0][2] < total / 3
+        assert events[-1][0] == "done" and events[-1][1]["first_token_seconds"] < total / 3
+        assert cached == [("token", {"html": "".join(tokens)}), ("done", {"cached": True, "fallback": False})]
+        assert len(stub.chat_calls) == 1 and stub.chat_calls[0]["stream"] is True
+
+
+def test_stream_falls_back_to_mock_when_unavailable():
+    stub = StubOllama()
+    stub.server.server_close()
+    client = OllamaClient(host=stub.host)
+
+    async def scenario():
+        events = [event async for event in stream_ollama_analysis("hourly", {}, client, AnalysisCache())]
+        await client.aclose()
+        return events
+
+    assert asyncio.run(scenario()) == [
+        ("token", {"html": get_mock_analysis("hourly", {})}),
+        ("done", {"cached": False, "fallback": True}),
+    ]
+
+
+def test_batch_returns_results_as_they_complete_with_per_widget_fallback():
+    with StubOllama(delays={"'map'": 0.4, "'totalFlights'": 0.1}, fail_on="'hourly'") as stub:
+        client = OllamaClient(host=stub.host, max_concurrency=2)
+        widgets = [("map", [{"name": "Москва", "flights": 10}]), ("hourly", [{"hour": 1, "flights": 2}]),
+                   ("totalFlights", {"totalFlights": 5}), ("totalFlights", {"totalFlights": 5})]
+
+        async def scenario():
+            started = time.perf_counter()
+            results = [(result, time.perf_counter() - started)
+                       async for result in analyze_batch(widgets, client, AnalysisCache())]
+            await client.aclose()
+            return results
+
+        results = asyncio.run(scenario())
+        order = [result["index"] for result, _ in results]
+        assert order[0] == 1 and set(order[1:3]) == {2, 3} and order[3] == 0
+        by_index = {result["index"]: result for result, _ in results}
+        assert by_index[1] == {"index": 1, "widgetType": "hourly",
+                               "analysis": get_mock_analysis("hourly", widgets[1][1]), "fallback": True}
+        assert by_index[0]["analysis"] == by_index[2]["analysis"] == "<p>ok</p>x"
+        assert not by_index[0]["fallback"] and not by_index[3]["fallback"]
+        # Одинаковые виджеты генерируются один раз, генерации идут одновременно
+        assert len(stub.chat_calls) == 3 and stub.peak == 2
+        assert results[-1][1] < 0.4 + 0.1 + 0.2
+
+
+def test_batch_larger_than_concurrency_does_not_time_out_in_queue():
+    with StubOllama(delay=0.2) as stub:
+        # Все 8 виджетов в очереди клиента ждали бы дольше queue_timeout
+        client = OllamaClient(host=stub.host, max_concurrency=2, queue_timeout=0.3)
+        widgets = [("totalFlights", {"totalFlights": i}) for i in range(8)]
+
+        async def scenario():
+            results = [result async for result in analyze_batch(widgets, client, AnalysisCache())]
+            await client.aclose()
+            return results
+
+        results = asyncio.run(scenario())
+        assert sorted(result["index"] for result in results) == list(range(8))
+        assert not any(result["fallback"] for result in results)
+        assert len(stub.chat_calls) == 8 and stub.peak == 2
+        assert client.stats()["timeouts"] == 0
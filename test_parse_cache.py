@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+import ingest
+from parse_cache import ParseCache
+from test_ingest import GOOD_ROW, BAD_ROW
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.sqlite"))
+    ingest.configure_parse_cache(cache)
+    yield cache
+    ingest.configure_parse_cache(None)
+    cache.close()
+
+def test_cached_results_match_uncached(cache):
+    other = dict(GOOD_ROW, ARR=None, **{"Центр ЕС ОрВД": "Другой центр"})
+    rows = [(0, GOOD_ROW), (1, BAD_ROW), (2, other), (3, GOOD_ROW), (4, BAD_ROW)]
+    expected = ingest.parse_rows(rows)
+
+    assert ingest.parse_rows_cached(rows) == expected
+    assert (cache.hits, cache.misses) == (2, 3)
+    # Повторная загрузка: успешно разобранные строки берутся из кэша
+    assert ingest.parse_rows_cached(rows) == expected
+    assert cache.stats()["entries"] == 2
+    assert (cache.hits, cache.misses) == (6, 4)
+
+def test_cached_records_are_independent(cache):
+    results, _ = ingest.parse_rows_cached([(0, GOOD_ROW), (1, GOOD_ROW)])
+    results[0]["parsed_data"]["DEP"]["sid"] = "changed"
+    assert results[1]["parsed_data"]["DEP"]["sid"] == "7772251137"
+
+def test_parser_version_bump_invalidates(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    old = ParseCache(path, version="1")
+    old.put_many({old.make_key("a", "b", "c"): "{}"})
+    old.close()
+    assert ParseCache(path, version="1").stats()["entries"] == 1
+    new = ParseCache(path, version="2")
+    assert new.stats()["entries"] == 0
+    assert new.make_key("a", "b", "c") != old.make_key("a", "b", "c")
+
+def test_lru_eviction(tmp_path):
+    cache = ParseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put_many({"a": "1"})
+    cache.put_many({"b": "2"})
+    cache.get_many(["a"])
+    cache.put_many({"c": "3"})
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["evictions"] == 1
+
+def test_parallel_mode_uses_cache(cache):
+    rows = [(i, GOOD_ROW if i % 2 else BAD_ROW) for i in range(6)]
+    expected = ingest.parse_rows(rows)
+    try:
+        assert asyncio.run(ingest.parse_rows_async(rows, mode="parallel", workers=2, chunk_size=1)) == expected
+    finally:
+        ingest.shutdown_process_pool()
+    assert cache.misses == 2
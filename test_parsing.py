@@ -226,4 +226,50 @@ def test_calculate_duration_missing_info():
     assert calculate_duration(dep_info, arr_info) is None
 
 def test_calculate_duration_none_input():
-    assert calculate_duration(None, None) is None
\ No newline at end of file
+    assert calculate_duration(None, None) is None
+
+# Тесты эквивалентности быстрого движка SHR (parsing_fast) и legacy-реализации
+SHR_CORPUS = [
+    "(SHR-ZZZZZ\n-ZZZZ0705\n-K0300M3000\n-DEP/5957N02905E DOF/250201 OPR/МАЛИНОВСКИЙ НИКИТА АЛЕКСАНДРОВИЧ\n+79313215153 TYP/SHAR RMK/ОБОЛОЧКА 300 ДЛЯ ЗОНДИРОВАНИЯ АТМОСФЕРЫ SID/7772187998)",
+    "(SHR-00725\n-ZZZZ0600\n-M0000/M0005 /ZONA R0,5 4408N04308E/\n-ZZZZ0700\n-DEP/4408N04308E DEST/4408N04308E DOF/250124 OPR/ГУ МЧС РОССИИ ПО\nСТАВРОПОЛЬСКОМУ КРАЮ REG/00724,REG00725 STS/SAR TYP/BLA RMK/WR655 В ЗОНЕ ВИЗУАЛЬНОГО ПОЛЕТА СОГЛАСОВАНО С ЕСОРВД РОСТОВ ПОЛЕТ БЛА В ВП-С-МЧС МОНИТОРИНГ ПАВОДКООПАСНЫХ УЧАСТКОВ РАЗРЕШЕНИЕ 10-37/9425 15.11.2024 АДМИНИСТРАЦИЯ МИНЕРАЛОВОДСКОГО МУНИЦИПАЛЬНОГО ОКРУГА ОПЕРАТОР ЛЯХОВСКАЯ +79283000251 ЛЯПИН +79620149012 SID/7772251137)",
+    "(SHR-RA0001\n-UUWW0330\n-K0040M0015 4643N04855E 4650N04835E /ZONA 5646N06202E 5646N06203E 564630N0620220E 5646N06202E/\n-UUOO0500 UUDD URRR\n-DEP/5548N03730E DOF/251301 TYP/2BLA REG/RF-37204, RF-37018 0J02194 RMK/БВС МОДЕЛЬ DJI MINI 3 ТОЧКА 554819N0373011E ЗОНА MR076285 И WR123 MR076285 ВЛАДИМИРОВИ4 4АСТЬ М4С BWS PHANTOM 4 SID/7772000001)",
+    "(SHR-00001\n-ZZZZ0100\n-M0020/M0025 /ZONA KO02/\n-DEP/5152N08600E OPR/ОПЕРАТОР +7 913 123-45-67 RMK/ОПЕРАТОР БВС ИВАНОВ +79131234567 РАЗРЕШЕНИЕ N-16 ОТ 20.12.2024 SID/1)",
+    "(SHR-00002\n-ZZZZ0100\n-M0000/M0080 /ZONA R002 5152N08600E/\n-RMK/WR16567 ZENKOWO БЕЗ SRO БВС SUPERCAM S350 GT WZL 6049N06937E GT POS 6049N06937E H IST 0 350 M TEL 89829906599)",
+    "(SHR-00003\n-ZZZZ0100\n-M0000/M0080\n-ZZZZ0200\n-TEXT WITHOUT KEYS)",
+    "(SHR-00004\n-ZZZZ0100\n-M0000/M0080 /ZONA R,,/ \n-ZZZZ0200)",
+    "(SHR-00005\n-АБВГ0100\n-M0000/M0080 /ZONA /\n-ADEP/5152N08600W DEST/1000S01000W DOF/BADDATE EET/0030 PERM/X SID/2)",
+    "(SHR-00006\n-BAD\n-/ZONA R1,5 5152N08600E EXTRA/)",
+    "(SHR-00007)",
+    "(SHR\n-ZZZZ0100)",
+    "(SHR-00008\n-ZZZZ0100\n-\n-\n-)",
+    "NOT SHR",
+    None,
+]
+
+def test_parse_shr_engines_are_byte_identical():
+    import json
+    from parsing import parse_shr_legacy
+    from parsing_fast import parse_shr_fast
+    for shr_str in SHR_CORPUS:
+        try:
+            expected = json.dumps(parse_shr_legacy(shr_str), ensure_ascii=False)
+        except Exception as e:
+            with pytest.raises(type(e)):
+                parse_shr_fast(shr_str)
+            continue
+        assert json.dumps(parse_shr_fast(shr_str), ensure_ascii=False) == expected
+
+def test_parse_shr_fast_helpers_match_legacy():
+    import parsing_fast
+    for value in ["5152N08600E", "440846N0430829E", " 5957N 02905E", "INVALID", "", None]:
+        assert parsing_fast.parse_coordinates(value) == parse_coordinates(value)
+    for value in ["M0000/M0005 /ZONA 5646N06202E 5646N06203E/", "K0040M0015 4643N04855E /ZONA KO02/", None]:
+        assert parsing_fast.parse_route(value) == parse_route(value)
+    for value in ["ВЛАДИМИРОВИ4 4АСТЬ М4С У4ЕТНЫЕ", "ОПЕРАТОР БВС ПЕТРОВ +7 913 123-45-67", "", None]:
+        assert parsing_fast.parse_rmk(value) == parse_rmk(value)
+
+def test_parse_shr_engine_switch():
+    shr_str = SHR_CORPUS[0]
+    assert parse_shr(shr_str, engine="legacy") == parse_shr(shr_str, engine="fast")
+    with pytest.raises(ValueError):
+        parse_shr(shr_str, engine="unknown")
@@ -0,0 +1,38 @@
+import json
+import pandas as pd
+from parsing import parse_dep_arr, calculate_duration
+from parsing_vectorized import parse_dep_arr_columns, parse_dep_arr_series
+
+DEP = "-TITLE IDEP\n-SID 7772187998\n-ADD {d}\n-ATD {t}\n-ADEP ZZZZ\n-ADEPZ {c}\n-PAP 0"
+ARR = "-TITLE IARR\n-SID 7772187998\n-ADA {d}\n-ATA {t}\n-ADARR ZZZZ\n-ADARRZ {c}\n-PAP 0"
+
+# Пары (DEP, ARR): стандартные телеграммы и строки, которые уходят в скалярный разбор
+CORPUS = [
+    (DEP.format(d="250201", t="0705", c="5957N02905E"), ARR.format(d="250202", t="0100", c="5957N02905E")),
+    (DEP.format(d="250231", t="0705", c="5957S02905W"), ARR.format(d="250201", t="0805", c="5957N02905E")),
+    (DEP.format(d="690101", t="2359", c="5957N02905E") + "\n-REG RF37362", ARR.format(d="690101", t="2359", c="5957N02905E")),
+    (DEP.format(d="680101", t="2400", c="595700N0290500E"), ARR.format(d="680101", t="0000", c="5957N02905E")),
+    (DEP.format(d="250201", t="0960", c="5957N02905E") + "\n-REG RF1, RF2", ARR.format(d="250201", t="0805", c="5957N02905E")),
+    (DEP.format(d="250201", t="0705", c="5957N02905E") + "\n", ARR.format(d="250201", t="0805", c="5957N02905E")),
+    (DEP.format(d="250201", t="0705", c="5957N02905E"), ARR.format(d="250131", t="0605", c="5957N02905E")),
+    ("-TITLE IDEP\r\n-SID 1\r\n-ADD 250201\r\n-ATD 0705", "-SID 1 2"),
+    (None, ARR.format(d="250201", t="0805", c="5957N02905E")),
+    (5, None),
+    (float("nan"), ""),
+]
+
+def test_parse_dep_arr_columns_matches_scalar():
+    dep_parsed, arr_parsed, durations = parse_dep_arr_columns(
+        pd.Series([dep for dep, _ in CORPUS]), pd.Series([arr for _, arr in CORPUS]))
+    for i, (dep, arr) in enumerate(CORPUS):
+        expected_dep = parse_dep_arr(dep)
+        expected_arr = parse_dep_arr(arr)
+        expected = [expected_dep, expected_arr, calculate_duration(expected_dep, expected_arr)]
+        assert json.dumps([dep_parsed[i], arr_parsed[i], durations[i]]) == json.dumps(expected)
+
+def test_parse_dep_arr_series_matches_scalar():
+    values = [dep for dep, _ in CORPUS]
+    assert parse_dep_arr_series(pd.Series(values)) == [parse_dep_arr(v) for v in values]
+
+def test_parse_dep_arr_columns_empty():
+    assert parse_dep_arr_columns(pd.Series([], dtype=object), pd.Series([], dtype=object)) == ([], [], [])
@@ -0,0 +1,50 @@
+from ollama_analyzer.prompt_builder import COMPACTION_LEVELS, build_prompt, compact_data, estimate_tokens
+
+
+def _regions(count):
+    return [{"id": str(i), "name": f"Регион {i}", "flights": (i * 37) % 1000, "avgDuration": i / 3,
+             "coords": {"x": i, "y": -i}, "zeroFlightDays": i % 30} for i in range(count)]
+
+
+def test_small_data_is_rendered_in_full():
+    text, level = compact_data({"totalFlights": 1200, "avgFlightDuration": 35.25, "regions": _regions(3)})
+    assert level == 0
+    lines = text.splitlines()
+    assert lines[:4] == ["totalFlights: 1200", "avgFlightDuration: 35.25", "regions: таблица, 3 строк",
+                         "id|name|flights|avgDuration|coords|zeroFlightDays"]
+    assert lines[4] == '0|Регион 0|0|0|{"x":0,"y":0}|0'
+    assert len(lines) == 7
+
+
+def test_large_report_fits_budget_with_top_k_and_quantiles():
+    regions = _regions(2000)
+    user_prompt, stats = build_prompt("system", "report", regions, budget=800)
+    assert stats["data_tokens"] <= 800 < stats["raw_data_tokens"]
+    assert stats["prompt_tokens"] == estimate_tokens("system") + estimate_tokens(user_prompt)
+    assert 0 < stats["level"] < len(COMPACTION_LEVELS)
+    lines = user_prompt.splitlines()
+    max_rows = COMPACTION_LEVELS[stats["level"]][0]
+    assert lines[2] == f"data: таблица, 2000 строк, показаны топ-{max_rows} по flights"
+    shown = [int(line.split("|")[2]) for line in lines[4:4 + max_rows]]
+    assert shown == sorted((region["flights"] for region in regions), reverse=True)[:max_rows]
+    assert "data.flights (все 2000 строк): min=0 " in user_prompt
+    assert "max=999 " in user_prompt
+
+
+def test_time_series_is_averaged_in_order():
+    series = [{"date": f"d{i:03d}", "flights": i} for i in range(120)]
+    text, level = compact_data({"timeSeries": series, "values": list(range(100))}, budget=200)
+    lines = text.splitlines()
+    points = COMPACTION_LEVELS[level][1]
+    assert lines[0] == f"timeSeries: таблица, 120 строк, усреднено до {points} интервалов"
+    assert lines[2].startswith("d000..")
+    averages = [float(line.split("|")[1]) for line in lines[2:2 + points]]
+    assert averages == sorted(averages)
+    assert any(line.startswith(f"values: 100 значений, усреднено до {points}: ") for line in lines)
+
+
+def test_oversized_text_is_truncated_to_budget():
+    text, level = compact_data({f"metric{i}": i for i in range(500)}, budget=50)
+    assert level == len(COMPACTION_LEVELS)
+    assert estimate_tokens(text) <= 50
+    assert text.startswith("metric0: 0\nmetric1: 1") and text.endswith("…")
@@ -0,0 +1,69 @@
+import numpy as np
+import pyarrow.parquet as pq
+from flight_store import FlightStore, flight_point
+from ingest import build_flight_record
+from region_locator import RegionAssignment, RegionLocator, read_points
+from test_ingest import GOOD_ROW
+
+def _square(name, lon, lat, size=1):
+    ring = [[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]
+    return {"type": "Feature", "properties": {"region_name": name}, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+
+# GOOD_ROW вылетает из точки 44°08' N 43°08' E
+GEOJSON = {"type": "FeatureCollection", "features": [
+    _square("ставропольский", 43, 44),
+    _square("дагестан", 44, 44),
+    _square("дагестан", 46, 44),
+    {"type": "Feature", "properties": {"region_name": "пустой"}, "geometry": None},
+]}
+
+def test_locate_points():
+    locator = RegionLocator(GEOJSON)
+    lats = [44.5, 44.5, 44.5, 50.0, np.nan, 44.5]
+    lons = [43.5, 44.5, 46.5, 43.5, 43.5, 44.0]
+    names = [locator.names[code] if code >= 0 else None for code in locator.locate(lats, lons)]
+    # Точка на общей границе попадает в первый полигон
+    assert names == ["ставропольский", "дагестан", "дагестан", None, None, "ставропольский"]
+
+def test_flight_point_fallbacks():
+    record = build_flight_record(GOOD_ROW)["parsed_data"]
+    dep = record["DEP"]["coordinates"]
+    assert flight_point(record) == (dep["latitude"], dep["longitude"])
+    no_dep = build_flight_record(dict(GOOD_ROW, DEP=None, ARR=None))["parsed_data"]
+    zona = no_dep["SHR"]["Маршрут"]["zona"]
+    assert flight_point(no_dep) == (zona["center"]["latitude"], zona["center"]["longitude"])
+    assert flight_point({}) == (None, None)
+
+def test_assignment_is_incremental_and_reads_legacy_segments(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append([build_flight_record(GOOD_ROW)] * 3)
+    # Сегмент старого формата без колонок point_lat/point_lon
+    writer = store.open_segment()
+    writer.write(build_flight_record(dict(GOOD_ROW, DEP=None, ARR=None)))
+    writer.finish()
+    path = store.segment_path(writer.name)
+    pq.write_table(pq.read_table(path).drop_columns(["point_lat", "point_lon"]), path)
+    store._add_segment(writer.name, 1)
+
+    assignment = RegionAssignment(RegionLocator(GEOJSON))
+    assert assignment.refresh(store) == 4
+    store.append([build_flight_record(dict(GOOD_ROW, DEP=None, ARR=None, SHR=None))])
+    assert assignment.refresh(store) == 1
+    assert assignment.rows == 5
+    assert assignment.counts() == {"дагестан": 0, "ставропольский": 4}
+
+    # После компактизации точки старого сегмента пересчитаны и записаны в колонки
+    store.compact()
+    assert store.legacy_rows(0, "point_lat") == []
+    points = read_points(store, 0)
+    assert not np.isnan(points[0][:4]).any() and np.isnan(points[0][4])
+
+def test_flights_without_point_are_not_reparsed(tmp_path):
+    store = FlightStore(str(tmp_path))
+    store.append([build_flight_record(dict(GOOD_ROW, DEP=None, ARR=None, SHR=None))] * 3)
+    read_columns = []
+    read_tail = store.read_tail
+    store.read_tail = lambda offset, columns=None: read_columns.append(columns) or read_tail(offset, columns)
+    lats, lons = read_points(store, 0)
+    assert np.isnan(lats).all() and np.isnan(lons).all()
+    assert read_columns == [["point_lat", "point_lon"]]
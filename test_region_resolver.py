@@ -0,0 +1,37 @@
+import pytest
+from geojson_converter import REGION_NAME_MAPPING, RegionResolver, standardize_region_name
+
+CENTERS = [
+    "Московский", "Санкт-Петербургский", "Екатеринбургский", "Ростовский", "Новосибирский",
+    "Красноярский", "Хабаровский", "Якутский", "Магаданский", "Иркутский", "Тюменский",
+    "Самарский", "Калининградский", "Симферопольский", "Алтайский край", "Республика Алтай",
+    "Карачаево-Черкесская Республика", "Ханты-Мансийский автономный округ - Югра",
+    "Чеченская республика", "г. Москва", "Томская область", "Тверь", "Курганский",
+    "Kурганская", "", "   ", "Неизвестный центр", None, 42,
+]
+GEOJSON_NAMES = ["курган", "курганск", "алтай", "тверская", "томская", "неизвестн центр", "московская"]
+
+@pytest.mark.parametrize("geojson_names", [None, [], GEOJSON_NAMES])
+def test_resolver_matches_standardize_region_name(geojson_names):
+    names = CENTERS + [key + "ский" for key in REGION_NAME_MAPPING] + [key.upper() for key in REGION_NAME_MAPPING]
+    resolver = RegionResolver(geojson_names)
+    expected = [standardize_region_name(name, geojson_names) for name in names]
+    assert [resolver.resolve(name) for name in names] == expected
+    # Повторный проход берет значения из памяти
+    assert resolver.resolve_many(names) == expected
+
+def test_first_mapping_prefix_wins():
+    resolver = RegionResolver()
+    # Подходят и "новосибир", и "новосибирск"; как и в словаре, выигрывает первый
+    assert resolver.resolve("новосибирск") == standardize_region_name("новосибирск") == "новосибирская"
+    assert resolver.resolve("алтайск") == standardize_region_name("алтайск")
+
+def test_resolve_many_resolves_distinct_names_once(monkeypatch):
+    import geojson_converter
+    names = ["Московский", "Томский", None, "Московский"] * 50
+    expected = [standardize_region_name(name, GEOJSON_NAMES) for name in names]
+    calls = []
+    original = geojson_converter.normalize_region_name
+    monkeypatch.setattr(geojson_converter, "normalize_region_name", lambda name: calls.append(name) or original(name))
+    assert RegionResolver(GEOJSON_NAMES).resolve_many(names) == expected
+    assert sorted(calls) == ["Московский", "Томский"]
@@ -0,0 +1,98 @@
+import json
+
+import mapbox_vector_tile
+
+from flight_repository import FlightRepository
+from flight_store import FlightStore, flight_point
+from ingest import build_flight_record
+from test_ingest import GOOD_ROW
+from test_region_locator import GEOJSON
+from vector_tiles import TileCache, tile_bounds, valid_tile
+
+
+def _repository(tmp_path, flights=3):
+    geojson_path = tmp_path / "regions.geojson"
+    geojson_path.write_text(json.dumps(GEOJSON, ensure_ascii=False), encoding="utf-8")
+    store = FlightStore(str(tmp_path / "store"))
+    store.append([build_flight_record(GOOD_ROW)] * flights)
+    repository = FlightRepository(store, str(geojson_path), str(tmp_path / "missing.xlsx"))
+    repository.get()
+    return repository, store
+
+
+# Точка вылета GOOD_ROW
+LAT, LON = flight_point(build_flight_record(GOOD_ROW)["parsed_data"])
+
+
+def _tile_of(lon, lat, z):
+    for x in range(2 ** z):
+        for y in range(2 ** z):
+            west, south, east, north = tile_bounds(z, x, y)
+            if west <= lon < east and south <= lat < north:
+                return x, y
+
+
+def test_tile_bounds():
+    assert tile_bounds(0, 0, 0) == (-180, -85.0511287798066, 180, 85.0511287798066)
+    west, south, east, north = tile_bounds(1, 1, 0)
+    assert (west, south, east) == (0, 0, 180)
+    assert valid_tile(2, 3, 3) and not valid_tile(2, 4, 0) and not valid_tile(-1, 0, 0)
+
+
+def test_render_regions_and_aggregated_points(tmp_path):
+    repository, _ = _repository(tmp_path)
+    x, y = _tile_of(LON, LAT, 6)
+    tile = mapbox_vector_tile.decode(repository.get().tiles.render(6, x, y))
+    names = sorted(f["properties"]["region_name"] for f in tile["regions"]["features"])
+    assert names == ["дагестан", "ставропольский"]
+    stavropol = [f for f in tile["regions"]["features"] if f["properties"]["region_name"] == "ставропольский"][0]
+    assert stavropol["properties"]["spatial_flight_count"] == 3
+    # Три полета из одной точки — одна точка тайла со счетчиком
+    points = tile["flights"]["features"]
+    assert len(points) == 1 and points[0]["properties"]["count"] == 3
+
+    far_x, far_y = _tile_of(100.5, 60.5, 6)
+    empty = mapbox_vector_tile.decode(repository.get().tiles.render(6, far_x, far_y))
+    assert not empty.get("regions", {}).get("features") and not empty.get("flights", {}).get("features")
+
+
+def test_single_point_keeps_sid(tmp_path):
+    repository, _ = _repository(tmp_path, flights=1)
+    x, y = _tile_of(LON, LAT, 10)
+    points = mapbox_vector_tile.decode(repository.get().tiles.render(10, x, y))["flights"]["features"]
+    assert points[0]["properties"] == {"count": 1, "sid": build_flight_record(GOOD_ROW)["parsed_data"]["SHR"]["Прочая информация"]["SID"]}
+
+
+def test_cache_is_invalidated_by_upload(tmp_path):
+    repository, store = _repository(tmp_path)
+    cache = TileCache(str(tmp_path / "tiles"))
+    key = repository.data_version()
+    first = cache.get_or_render(key, 6, 40, 23, repository.get().tiles.render)
+    assert cache.get_or_render(key, 6, 40, 23, repository.get().tiles.render) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    store.append([build_flight_record(GOOD_ROW)])
+    repository.get()
+    new_key = repository.data_version()
+    assert new_key != key
+    assert cache.prune(new_key) == 1
+    assert cache.get(key, 6, 40, 23) is None
+
+def test_prune_during_render_keeps_tile(tmp_path):
+    cache = TileCache(str(tmp_path / "tiles"))
+    pruned = []
+
+    def render(z, x, y):
+        # Загрузка и prune пришлись на время отрисовки тайла старой версии
+        pruned.append(cache.prune("new"))
+        return b"tile"
+
+    assert cache.get_or_render("old", 1, 0, 0, render) == b"tile"
+    assert pruned == [0]
+    # Каталог устаревшей версии удален после окончания отрисовки
+    assert not (tmp_path / "tiles" / "old").exists()
+
+    # Тайл отдается, даже если его не удалось сохранить
+    (tmp_path / "tiles" / "broken").write_bytes(b"")
+    assert cache.get_or_render("broken", 1, 0, 0, lambda z, x, y: b"tile") == b"tile"
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,37 @@
+import threading
+
+from warmup import DONE, FAILED, Warmup
+
+
+def test_background_phases_report_readiness():
+    warmup = Warmup()
+    release = threading.Event()
+    order = []
+    assert warmup.run_phase("fast", lambda: order.append("fast"))
+    warmup.start_background([("slow", lambda: (release.wait(5), order.append("slow"))), ("after", lambda: order.append("after"))])
+    status = warmup.status()
+    assert not status["ready"]
+    assert status["phases"]["fast"]["status"] == DONE
+    assert status["phases"]["after"]["status"] == "pending"
+
+    release.set()
+    warmup.wait(5)
+    status = warmup.status()
+    assert status["ready"]
+    assert order == ["fast", "slow", "after"]
+    assert all(phase["seconds"] is not None for phase in status["phases"].values())
+
+
+def test_failed_phase_keeps_app_not_ready():
+    warmup = Warmup()
+
+    def broken():
+        raise RuntimeError("boom")
+
+    warmup.start_background([("broken", broken), ("next", lambda: None)])
+    warmup.wait(5)
+    status = warmup.status()
+    assert not status["ready"]
+    assert status["phases"]["broken"] == {"status": FAILED, "seconds": status["phases"]["broken"]["seconds"], "error": "boom"}
+    # Следующие фазы выполняются, несмотря на ошибку
+    assert status["phases"]["next"]["status"] == DONE
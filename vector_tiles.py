@@ -0,0 +1,238 @@
+"""Векторные тайлы (Mapbox Vector Tile) с регионами и точками полетов.
+
+Тайл режется из данных в памяти. Полигоны регионов берутся с уровня упрощения,
+подходящего масштабу (GEOMETRY_LEVELS), кандидаты отбираются по STRtree и обрезаются
+по границе тайла. Точки полетов (вылет, прибытие или центр зоны) отбираются векторно,
+точки, попавшие в одну ячейку (POINT_CELL), объединяются в одну со счетчиком.
+Готовые тайлы кэшируются на диске в каталоге версии данных, после загрузки
+каталоги прежних версий удаляются.
+"""
+import contextlib
+import math
+import os
+import shutil
+import threading
+import uuid
+
+import mapbox_vector_tile
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+from geojson_converter import geometry_level_for
+from region_locator import read_points
+
+TILE_EXTENT = 4096
+# Запас за границей тайла в пикселях, чтобы на стыках тайлов не было видно обрезки контуров
+TILE_BUFFER = 64
+# Точки полетов объединяются по ячейкам сетки тайла (8 единиц MVT — около пикселя экрана для тайла 512 px)
+POINT_CELL = 8
+MAX_TILE_ZOOM = 20
+MAX_LATITUDE = 85.0511287798
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+REGION_PROPERTIES = ("original_name", "region_name", "flight_count", "has_flights", "spatial_flight_count")
+
+
+def tile_bounds(z, x, y):
+    """Границы тайла в градусах: (запад, юг, восток, север)."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return (x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y))
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def _to_tile(coords, z, x, y):
+    """Долгота/широта -> пиксели тайла (ось y направлена вниз, как в MVT)."""
+    n = 2 ** z
+    lat = np.radians(np.clip(coords[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    px = ((coords[:, 0] + 180) / 360 * n - x) * TILE_EXTENT
+    py = ((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2 * n - y) * TILE_EXTENT
+    return np.column_stack([px, py])
+
+
+def _buffered_bounds(z, x, y):
+    west, south, east, north = tile_bounds(z, x, y)
+    dx = (east - west) * TILE_BUFFER / TILE_EXTENT
+    dy = (north - south) * TILE_BUFFER / TILE_EXTENT
+    return west - dx, south - dy, east + dx, north + dy
+
+
+def _region_properties(feature):
+    # В MVT нет null, поэтому пустые свойства не передаются
+    properties = feature["properties"]
+    return {key: properties[key] for key in REGION_PROPERTIES if properties.get(key) is not None}
+
+
+class TileSource:
+    """Регионы и точки полетов в памяти; точки дочитываются по мере загрузок."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._levels = []
+        self._points = (np.empty(0), np.empty(0), [])
+        self._store_id = None
+
+    @property
+    def rows(self):
+        return len(self._points[0])
+
+    def copy(self):
+        """Копия для перезагрузки репозитория: уровни регионов и точки используются совместно."""
+        with self._lock:
+            source = TileSource()
+            source._levels, source._points, source._store_id = self._levels, self._points, self._store_id
+        return source
+
+    def set_regions(self, geo_region_levels):
+        """Уровни GeoJSON регионов (со счетчиками полетов) -> геометрии и дерево для каждого уровня."""
+        levels = []
+        for geojson in geo_region_levels:
+            features = [feature for feature in geojson["features"] if feature.get("geometry")]
+            geometries = np.array([shape(feature["geometry"]) for feature in features], dtype=object)
+            levels.append((geometries, shapely.STRtree(geometries), [_region_properties(f) for f in features]))
+        self._levels = levels
+
+    def refresh(self, store):
+        with self._lock:
+            lats, lons, sids = self._points
+            if self._store_id != store.store_id or len(lats) > store.count():
+                lats, lons, sids = np.empty(0), np.empty(0), []
+                self._store_id = store.store_id
+            if len(lats) == store.count():
+                return 0
+            new_lats, new_lons = read_points(store, len(lats))
+            new_sids = store.read_tail(len(lats), ["sid"]).column("sid").to_pylist()
+            self._points = (np.concatenate([lats, new_lats]), np.concatenate([lons, new_lons]), sids + new_sids)
+            return len(new_lats)
+
+    def _region_features(self, z, x, y):
+        if not self._levels:
+            return []
+        geometries, tree, properties = self._levels[min(geometry_level_for(zoom=z), len(self._levels) - 1)]
+        bounds = _buffered_bounds(z, x, y)
+        candidates = tree.query(shapely.box(*bounds))
+        clipped = shapely.clip_by_rect(geometries[candidates], *bounds)
+        features = []
+        for index, geometry in zip(candidates, clipped):
+            if geometry.is_empty:
+                continue
+            features.append({
+                "geometry": shapely.transform(geometry, lambda coords: _to_tile(coords, z, x, y)),
+                "properties": properties[index],
+            })
+        return features
+
+    def _point_features(self, z, x, y):
+        lats, lons, sids = self._points
+        west, south, east, north = _buffered_bounds(z, x, y)
+        selected = np.flatnonzero((lats >= south) & (lats <= north) & (lons >= west) & (lons <= east))
+        if not len(selected):
+            return []
+        cells = np.floor(_to_tile(np.column_stack([lons[selected], lats[selected]]), z, x, y) / POINT_CELL).astype(np.int64)
+        # На мелком масштабе тысячи полетов попадают в одну ячейку — отдается одна точка со счетчиком
+        cells, first, counts = np.unique(cells, axis=0, return_index=True, return_counts=True)
+        features = []
+        for point, index, count in zip(shapely.points((cells + 0.5) * POINT_CELL), selected[first], counts):
+            properties = {"count": int(count)}
+            if count == 1 and sids[index]:
+                properties["sid"] = sids[index]
+            features.append({"geometry": point, "properties": properties})
+        return features
+
+    def render(self, z, x, y):
+        """Тайл z/x/y в формате MVT (слои regions и flights)."""
+        layers = [
+            {"name": "regions", "features": self._region_features(z, x, y)},
+            {"name": "flights", "features": self._point_features(z, x, y)},
+        ]
+        return mapbox_vector_tile.encode(layers, default_options={
+            "extents": TILE_EXTENT,
+            "y_coord_down": True,
+            "on_invalid_geometry": mapbox_vector_tile.encoder.on_invalid_geometry_make_valid,
+        })
+
+
+class TileCache:
+    """Кэш готовых тайлов на диске: <каталог>/<версия данных>/z/x/y.mvt."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Число идущих отрисовок по версиям данных и текущая версия (последний prune)
+        self._rendering = {}
+        self._keep = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, z, x, y):
+        return os.path.join(self.directory, key, str(z), str(x), f"{y}.mvt")
+
+    def get(self, key, z, x, y):
+        try:
+            with open(self.path(key, z, x, y), "rb") as f:
+                return f.read()
+        except OSError:
+            # Нет тайла или каталог версии удален — это промах кэша
+            return None
+
+    def put(self, key, z, x, y, data):
+        """Сохраняет тайл; False — не удалось (например, каталог версии удален), тайл просто не кэшируется."""
+        path = self.path(key, z, x, y)
+        # Параллельные запросы одного тайла пишут во временные файлы, на место встает целый тайл
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            print(f"Tile {key}/{z}/{x}/{y} is not cached: {e}")
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            return False
+
+    def get_or_render(self, key, z, x, y, render):
+        data = self.get(key, z, x, y)
+        with self._lock:
+            if data is not None:
+                self.hits += 1
+                return data
+            self.misses += 1
+            self._rendering[key] = self._rendering.get(key, 0) + 1
+        try:
+            data = render(z, x, y)
+            self.put(key, z, x, y, data)
+            return data
+        finally:
+            with self._lock:
+                self._rendering[key] -= 1
+                if not self._rendering[key]:
+                    del self._rendering[key]
+                # Версия устарела, пока шел рендер: prune ее пропустил, каталог удаляет последний рендер
+                stale = key not in self._rendering and self._keep is not None and key != self._keep
+            if stale:
+                shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+
+    def prune(self, keep):
+        """
+        Удаляет тайлы всех версий данных, кроме keep. Возвращает число удаленных версий.
+        Каталоги версий, для которых еще идет рендер, удаляются по его окончании.
+        """
+        with self._lock:
+            self._keep = keep
+            names = [name for name in os.listdir(self.directory) if name != keep and name not in self._rendering]
+        for name in names:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        return len(names)
+
+    def stats(self):
+        with self._lock:
+            return {"directory": self.directory, "hits": self.hits, "misses": self.misses}
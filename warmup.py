@@ -0,0 +1,73 @@
+"""Фазы запуска приложения с замером времени.
+
+Быстрые фазы выполняются прямо в обработчике startup, тяжелые (перенос данных,
+конвертация шейп-файла, загрузка репозитория) — в фоновом потоке, чтобы приложение
+сразу начинало принимать запросы. Состояние фаз отдается эндпоинтом /ready.
+"""
+import threading
+import time
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Warmup:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._background = []
+        self._thread = None
+        self.started_at = time.time()
+
+    def _set(self, name, **values):
+        with self._lock:
+            self._phases.setdefault(name, {"status": PENDING, "seconds": None, "error": None}).update(values)
+
+    def run_phase(self, name, func):
+        """Выполняет фазу, записывает ее статус и длительность. Ошибка фазы не прерывает запуск."""
+        self._set(name, status=RUNNING)
+        started = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            seconds = time.perf_counter() - started
+            self._set(name, status=FAILED, seconds=seconds, error=str(e))
+            print(f"Startup phase '{name}' failed after {seconds:.3f}s: {e}")
+            return False
+        seconds = time.perf_counter() - started
+        self._set(name, status=DONE, seconds=seconds)
+        print(f"Startup phase '{name}' finished in {seconds:.3f}s")
+        return True
+
+    def start_background(self, phases):
+        """Запускает фазы [(название, функция)] по порядку в фоновом потоке."""
+        for name, _ in phases:
+            self._set(name)
+            self._background.append(name)
+
+        def run():
+            started = time.perf_counter()
+            for name, func in phases:
+                self.run_phase(name, func)
+            print(f"Background warm-up finished in {time.perf_counter() - started:.3f}s")
+
+        self._thread = threading.Thread(target=run, name="startup-warmup", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def ready(self):
+        with self._lock:
+            return all(self._phases[name]["status"] == DONE for name in self._background) and \
+                (self._thread is None or not self._thread.is_alive())
+
+    def status(self):
+        with self._lock:
+            phases = {name: dict(phase) for name, phase in self._phases.items()}
+        return {"ready": self.ready, "uptime": time.time() - self.started_at, "phases": phases}